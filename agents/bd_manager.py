@@ -1,88 +1,118 @@
 # agents/bd_manager.py
-import google.generativeai as genai
-from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
+from utils.api_utils import get_model
+from utils.prompts import AGENT_CONTEXT, PromptTemplate
+from utils.retrieval import RetrievalMixin
+from utils.retry_utils import model_retry
+from utils.structured import StructuredOutputMixin
+from utils.tracing import traced
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-class BDManager:
-    def __init__(self, model_name="gemini-pro", rfp_summary=None, rfp_analysis=None, rfp_assumptions=None):
-        self.model = genai.GenerativeModel(model_name)
+COST_BREAKDOWN = PromptTemplate("bd_manager.cost_breakdown", """
+    RFP Content:
+    {rfp_content}
+
+    You are the Business Development Manager responsible for creating a detailed cost breakdown for the Request for Proposal (RFP) above.
+    You have access to the RFP summary, key analysis points, and identified assumptions, as well as the proposed delivery plan and technical approach.
+
+    Proposed Delivery Plan:
+    {delivery_plan}
+
+    Technical Approach:
+    {technical_approach}
+
+    Based on all this information, provide a comprehensive breakdown of all potential costs associated with delivering the solution. Present this information in a clear cost table. The table should include columns for:
+    - Cost Item
+    - Description
+    - Quantity
+    - Unit Cost
+    - Total Cost
+
+    Include the following cost categories:
+    - Personnel costs: Detail the roles, number of resources, hourly/daily rates, and total cost per role, broken down by project phase.
+    - Software licenses: List all necessary software licenses, their costs, and licensing terms.
+    - Infrastructure costs: Detail cloud infrastructure costs (compute, storage, networking), including estimated usage and pricing models.
+    - Third-party services: Include costs for any external services required.
+    - Travel and expenses: Estimate any travel or other related expenses.
+    - Contingency costs: Include a line item for unforeseen expenses (typically a percentage of the total cost).
+
+    Provide a transparent and detailed cost breakdown table and suggest a competitive pricing strategy.
+    """, prefix=AGENT_CONTEXT)
+
+DETAILED_COST_BREAKDOWN = PromptTemplate("bd_manager.detailed_cost_breakdown", """
+    RFP Content:
+    {rfp_content}
+
+    You are the Business Development Manager. Provide a more detailed explanation of the cost breakdown for the RFP above, ensuring a clear cost table is included.
+
+    Proposed Delivery Plan:
+    {delivery_plan}
+
+    Technical Approach:
+    {technical_approach}
+    """, prefix=AGENT_CONTEXT)
+
+COST_NARRATIVE = PromptTemplate("bd_manager.cost_narrative", """
+    RFP Content:
+    {rfp_content}
+
+    You are the Business Development Manager responsible for the commercial proposal for the Request for Proposal (RFP) above.
+    The cost table below was computed from the delivery plan's phases and resources and the company rate card. Its figures are final: do not restate, recompute or change them.
+
+    Cost Table:
+    {cost_table}
+
+    Technical Approach:
+    {technical_approach}
+
+    Write the narrative that accompanies the table:
+    - Explain what drives the cost of each phase and which assumptions the figures rest on.
+    - Note any costs the RFP may require that the table does not cover (third-party services, travel and expenses), with how they would be priced.
+    - Suggest a competitive pricing strategy, including payment milestones and any options to reduce the price.
+    """, prefix=AGENT_CONTEXT)
+
+
+class BDManager(RetrievalMixin, StructuredOutputMixin):
+    agent_name = "BD Manager"
+
+    def __init__(self, model_name="gemini-pro", rfp_summary=None, rfp_analysis=None, rfp_assumptions=None, cached_content=None, retrieval_index=None):
+        self.model = get_model(model_name, cached_content=cached_content)
+        self.model_name = model_name
+        self.retrieval_index = retrieval_index
         self.rfp_summary = rfp_summary
         self.rfp_analysis = rfp_analysis
         self.rfp_assumptions = rfp_assumptions
         logging.info(f"BDManager initialized with model: {model_name}")
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential())
+    @traced
+    @model_retry
     def breakdown_costs(self, rfp_content, delivery_plan, technical_approach, rfp_summary=None, rfp_analysis=None, rfp_assumptions=None):
         logging.info("BDManager: Starting a detailed cost breakdown with cost table.")
-        prompt = f"""
-        You are the Business Development Manager responsible for creating a detailed cost breakdown for the following Request for Proposal (RFP).
-        You have access to the RFP summary, key analysis points, and identified assumptions, as well as the proposed delivery plan and technical approach.
-
-        RFP Summary:
-        {rfp_summary}
-
-        RFP Analysis:
-        {rfp_analysis}
-
-        RFP Assumptions:
-        {rfp_assumptions}
-
-        RFP Content:
-        {rfp_content}
-
-        Proposed Delivery Plan:
-        {delivery_plan}
-
-        Technical Approach:
-        {technical_approach}
-
-        Based on all this information, provide a comprehensive breakdown of all potential costs associated with delivering the solution. Present this information in a clear cost table. The table should include columns for:
-        - Cost Item
-        - Description
-        - Quantity
-        - Unit Cost
-        - Total Cost
-
-        Include the following cost categories:
-        - Personnel costs: Detail the roles, number of resources, hourly/daily rates, and total cost per role, broken down by project phase.
-        - Software licenses: List all necessary software licenses, their costs, and licensing terms.
-        - Infrastructure costs: Detail cloud infrastructure costs (compute, storage, networking), including estimated usage and pricing models.
-        - Third-party services: Include costs for any external services required.
-        - Travel and expenses: Estimate any travel or other related expenses.
-        - Contingency costs: Include a line item for unforeseen expenses (typically a percentage of the total cost).
-
-        Provide a transparent and detailed cost breakdown table and suggest a competitive pricing strategy.
-        """
-        logging.debug(f"BDManager: Cost breakdown prompt: {prompt}")
+        prompt = COST_BREAKDOWN.render(rfp_content=rfp_content, delivery_plan=delivery_plan,
+                                       technical_approach=technical_approach, rfp_summary=rfp_summary,
+                                       rfp_analysis=rfp_analysis, rfp_assumptions=rfp_assumptions)
         response = self.model.generate_content(prompt)
         logging.info("BDManager: Detailed cost breakdown complete, considering delivery plan and context.")
         return response.text
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential())
+    @traced
+    @model_retry
     def provide_detailed_cost_breakdown(self, rfp_content, delivery_plan, technical_approach, rfp_summary=None, rfp_analysis=None, rfp_assumptions=None):
         logging.info("BD Manager: Providing more details on the cost breakdown.")
-        prompt = f"""
-        You are the Business Development Manager. Provide a more detailed explanation of the cost breakdown for the following RFP, ensuring a clear cost table is included.
-
-        RFP Summary:
-        {rfp_summary}
-
-        RFP Analysis:
-        {rfp_analysis}
-
-        RFP Assumptions:
-        {rfp_assumptions}
-
-        RFP Content:
-        {rfp_content}
-
-        Proposed Delivery Plan:
-        {delivery_plan}
+        prompt = DETAILED_COST_BREAKDOWN.render(rfp_content=rfp_content, delivery_plan=delivery_plan,
+                                                technical_approach=technical_approach, rfp_summary=rfp_summary,
+                                                rfp_analysis=rfp_analysis, rfp_assumptions=rfp_assumptions)
+        response = self.model.generate_content(prompt)
+        return response.text
 
-        Technical Approach:
-        {technical_approach}
-        """
+    @traced
+    @model_retry
+    def price_delivery_plan(self, rfp_content, cost_table, technical_approach, rfp_summary=None, rfp_analysis=None, rfp_assumptions=None):
+        """Returns the cost breakdown for a table computed by utils.cost_model; the model writes only the narrative."""
+        logging.info("BDManager: Writing the cost narrative for the computed cost table.")
+        prompt = COST_NARRATIVE.render(rfp_content=rfp_content, cost_table=cost_table,
+                                       technical_approach=technical_approach, rfp_summary=rfp_summary,
+                                       rfp_analysis=rfp_analysis, rfp_assumptions=rfp_assumptions)
         response = self.model.generate_content(prompt)
-        return response.text
\ No newline at end of file
+        logging.info("BDManager: Cost narrative complete.")
+        return f"## Cost Breakdown\n\n{cost_table}\n\n{response.text}"
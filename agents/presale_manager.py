@@ -1,150 +1,366 @@
 # agents/presale_manager.py
-import google.generativeai as genai
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from utils.api_utils import get_model
+from utils.fragments import repair_fragments
+from utils.prompts import AGENT_CONTEXT, PromptTemplate
+from utils.quality_gate import append_parts, rubric_gaps, rubric_model, structural_gaps
+from utils.retry_utils import model_retry
+from utils.structured import SCHEMAS, describe
+from utils.tracing import annotate, traced
+from utils.scheduler import map_with_context
+
+
+# Sections of the technical proposal, the agent responses each one is written from, and whether it
+# also needs the RFP text. Sections listed in SUMMARY_SECTIONS are written last from the finished sections.
+PROPOSAL_SECTIONS = [
+    (1, "Executive Summary", ["Overview of the Proposal", "Objectives and Goals", "Key Deliverables"], [], False),
+    (2, "Background and Context", ["Current Challenges or Needs", "Existing Systems or Processes", "Stakeholder Insights"], ["Internet Researcher"], True),
+    (3, "Proposal Objectives", ["High-Level Goals", "Specific and Measurable Outcomes", "Alignment with Business Strategy"], [], True),
+    (4, "Scope of Work", ["In-Scope Items", "Out-of-Scope Items", "Assumptions and Constraints"], ["Delivery Lead"], True),
+    (5, "Technical Approach", ["System Architecture Overview (Include Mermaid Diagram)", "Technology Stack (Include Table)", "Integration Strategy (Include Mermaid Sequence Diagram if applicable)", "Key Functional Components"], ["Tech Lead"], False),
+    (6, "Implementation Plan", ["Phases and Milestones", "Resource Allocation", "Tools and Platforms to be Used", "Risk Management Plan"], ["Delivery Lead"], False),
+    (7, "Detailed Deliverables", ["Technical Specifications", "Code Modules/Features", "Testing and QA Artifacts", "Documentation"], ["Delivery Lead", "Tech Lead", "Test Lead"], False),
+    (8, "Timeline and Schedule", ["Project Roadmap", "Detailed Gantt Chart (using Mermaid syntax)", "Contingency Plans for Delays"], ["Delivery Lead"], False),
+    (9, "Resource Requirements", ["Team Structure and Roles", "Hardware and Software Needs", "Budget Allocation"], ["Delivery Lead", "BD Manager"], False),
+    (10, "Risk Analysis and Mitigation", ["Potential Risks and Impacts", "Mitigation Strategies", "Dependencies and Assumptions"], ["Delivery Lead", "Tech Lead"], False),
+    (11, "Quality Assurance Plan", ["Testing Strategy and Framework", "Metrics for Success", "Post-Implementation Validation"], ["Test Lead"], False),
+    (12, "Monitoring and Evaluation", ["KPIs and Metrics to Track Progress", "Reporting Mechanisms", "Feedback Loop"], ["SRE Lead", "Delivery Lead"], False),
+    (13, "Maintenance and Support", ["Support Model", "SLAs and Response Times", "Post-Launch Enhancements"], ["SRE Lead"], False),
+    (14, "Cost Estimate and Budget", ["Detailed Cost Breakdown (Include Cost Table)", "ROI Analysis", "Funding Sources"], ["BD Manager"], False),
+    (15, "Conclusion and Recommendations", ["Summary of Key Points", "Why This Proposal Should Be Accepted", "Next Steps"], [], False),
+    (16, "Appendices", ["Glossary of Terms", "Reference Documents", "Supporting Data"], ["Internet Researcher", "Tech Lead"], False),
+    (17, "References and Citations", ["Technical Sources", "Standards and Guidelines Followed"], ["Internet Researcher", "Tech Lead"], False),
+]
+SUMMARY_SECTIONS = {1, 15}
+# RFP passages retrieved for a follow-up asking an agent for the parts its response is missing.
+MISSING_PARTS_PASSAGES = 3
+
+MISSING_PARTS = PromptTemplate("presale_manager.missing_parts", """
+    RFP Summary:
+    {rfp_summary}
+
+    RFP Passages Relevant to the Missing Parts:
+    {passages}
+
+    You are the {agent_name}. Your response below to the Request for Proposal (RFP) summarised above is missing the following parts:
+    {missing}
+
+    Write only these missing parts, as Markdown ready to be appended to the response. Keep them consistent with
+    the response and the RFP summary, use Mermaid syntax for any diagrams, and do not repeat what is already there.
+
+    Response:
+    {response}
+    """)
+
+FRAGMENT_FIX = PromptTemplate("presale_manager.fragment_fix", """
+    You are the {agent_name}. The following {label} from your response does not parse:
+
+    {fragment}
+
+    Problems found:
+    {errors}
+
+    Reply with only the corrected {label}, keeping its content and meaning. Do not add any explanation.
+    """)
+
+# Warm start from the semantic cache: the prior response stands in for the agent's slice of the RFP,
+# which is usually most of its prompt; the shared summary, analysis and assumptions describe the new RFP.
+ADAPT_RESPONSE = PromptTemplate("presale_manager.adapt_response", """
+    You are the {agent_name}. Below is the response you wrote for an earlier RFP ({rfp}) that closely resembles this one ({overlap} of its text overlaps).
+
+    Earlier Response:
+    {prior_response}
+
+    Rewrite it as your response to the RFP analysed above. Keep everything that still applies, and update every client name, date, figure, requirement and regulation that differs in this RFP.
+    Return the complete response in the same structure, including its tables and Mermaid diagrams.
+    """, prefix=AGENT_CONTEXT)
+
+FINAL_RESPONSE = PromptTemplate("presale_manager.final_response", """
+    RFP Content:
+    {rfp_content}
+
+    Responses from Expert Agents:
+    {responses}
+    {structured}
+    You are the Presale Manager responsible for crafting the final, highly detailed and comprehensive response to the Request for Proposal (RFP) above.
+    You have received information from various expert agents. Synthesize this information into a well-structured, persuasive, and thorough proposal that addresses all requirements. Ensure all diagrams and tables are included using Mermaid syntax where applicable.
+
+    Based on the RFP content and the detailed expert agent responses, generate the complete RFP response. The technical proposal should include the following items extensively:
+
+    1. Executive Summary
+        - Overview of the Proposal
+        - Objectives and Goals
+        - Key Deliverables
+
+    2. Background and Context
+        - Current Challenges or Needs
+        - Existing Systems or Processes
+        - Stakeholder Insights
+
+    3. Proposal Objectives
+        - High-Level Goals
+        - Specific and Measurable Outcomes
+        - Alignment with Business Strategy
+
+    4. Scope of Work
+        - In-Scope Items
+        - Out-of-Scope Items
+        - Assumptions and Constraints
+
+    5. Technical Approach
+        - System Architecture Overview (Include Mermaid Diagram)
+        - Technology Stack (Include Table)
+        - Integration Strategy (Include Mermaid Sequence Diagram if applicable)
+        - Key Functional Components
+
+    6. Implementation Plan
+        - Phases and Milestones
+        - Resource Allocation
+        - Tools and Platforms to be Used
+        - Risk Management Plan
+
+    7. Detailed Deliverables
+        - Technical Specifications
+        - Code Modules/Features
+        - Testing and QA Artifacts
+        - Documentation
+
+    8. Timeline and Schedule
+        - Project Roadmap
+        - Detailed Gantt Chart (using Mermaid syntax)
+        - Contingency Plans for Delays
+
+    9. Resource Requirements
+        - Team Structure and Roles
+        - Hardware and Software Needs
+        - Budget Allocation
+
+    10. Risk Analysis and Mitigation
+        - Potential Risks and Impacts
+        - Mitigation Strategies
+        - Dependencies and Assumptions
+
+    11. Quality Assurance Plan
+        - Testing Strategy and Framework
+        - Metrics for Success
+        - Post-Implementation Validation
+
+    12. Monitoring and Evaluation
+        - KPIs and Metrics to Track Progress
+        - Reporting Mechanisms
+        - Feedback Loop
+
+    13. Maintenance and Support
+        - Support Model
+        - SLAs and Response Times
+        - Post-Launch Enhancements
+
+    14. Cost Estimate and Budget
+        - Detailed Cost Breakdown (Include Cost Table)
+        - ROI Analysis
+        - Funding Sources
+
+    15. Conclusion and Recommendations
+        - Summary of Key Points
+        - Why This Proposal Should Be Accepted
+        - Next Steps
+
+    16. Appendices
+        - Glossary of Terms
+        - Reference Documents
+        - Supporting Data
+
+    17. References and Citations
+        - Technical Sources
+        - Standards and Guidelines Followed
+
+    Focus on providing specific details, clear explanations, and strong justifications for all proposed solutions and approaches. Ensure the proposal is persuasive and addresses all aspects of the RFP comprehensively. Include all generated Mermaid diagrams and tables within the relevant sections.
+    """, prefix=AGENT_CONTEXT)
+
+SECTION = PromptTemplate("presale_manager.section", """
+    {rfp_block}
+
+    {source_text}
+
+    You are the Presale Manager writing one section of the final, highly detailed and comprehensive response to the Request for Proposal (RFP) above.
+    Write only section {number}, "{title}", of the technical proposal. Do not write any other section. Ensure all diagrams and tables are included using Mermaid syntax where applicable.
+
+    Section {number}. {title} should cover the following items extensively:
+    {item_list}
+
+    Start with the heading "## {number}. {title}". Focus on providing specific details, clear explanations, and strong justifications, and keep every figure consistent with the material above.
+    """, prefix=AGENT_CONTEXT)
+
+
+def format_passages(passages):
+    """Formats retrieved RFP passages with their section titles and page ranges for a prompt."""
+    if not passages:
+        return "None available."
+    return "\n\n".join(f"[{passage.title}, pages {passage.first_page + 1}-{passage.last_page + 1}]\n{passage.text.strip()}"
+                        for passage in passages)
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class PresaleManager:
-    def __init__(self, model_name="gemini-pro", rfp_summary=None, rfp_analysis=None, rfp_assumptions=None):
-        self.model = genai.GenerativeModel(model_name)
+    agent_name = "Presale Manager"
+
+    def __init__(self, model_name="gemini-pro", rfp_summary=None, rfp_analysis=None, rfp_assumptions=None, cached_content=None):
+        self.model = get_model(model_name, cached_content=cached_content)
         self.responses = {}
+        self.structured = {}
         self.rfp_summary = rfp_summary
         self.rfp_analysis = rfp_analysis
         self.rfp_assumptions = rfp_assumptions
+        self.rubric_model = rubric_model()
+        self.regenerate_fragments = os.environ.get("RFP_FRAGMENT_REGENERATE", "1") == "1"
         logging.info(f"PresaleManager initialized with model: {model_name}")
 
+    @traced
     def evaluate_response(self, agent_name, response):
-        """Evaluates the response from an agent and returns feedback if needed."""
-        if not response or len(response) < 100:  # Example criteria for insufficient response
-            return f"The response from {agent_name} is too short and lacks detail. Please provide more comprehensive information."
-        return None
+        """
+        Evaluates the response from an agent and returns the gaps found, or None if it passes.
+        The free local structural check runs first; the optional small-model rubric (RFP_RUBRIC_MODEL)
+        only scores responses that pass it.
+        """
+        gaps = structural_gaps(agent_name, response)
+        if not gaps and self.rubric_model is not None:
+            gaps = rubric_gaps(self.rubric_model, agent_name, response)
+        if gaps:
+            logging.info(f"PresaleManager: {agent_name} response is missing: {', '.join(gap.name for gap in gaps)}")
+        return gaps or None
 
     def request_more_details(self, agent, method_name, rfp_content, **kwargs):
         """Requests more details from a specific agent."""
         logging.info(f"PresaleManager requesting more details from {agent.__class__.__name__} using {method_name}")
         method = getattr(agent, method_name)
-        return method(rfp_content, self.rfp_summary, self.rfp_analysis, self.rfp_assumptions, **kwargs)
+        return method(rfp_content, rfp_summary=self.rfp_summary, rfp_analysis=self.rfp_analysis,
+                      rfp_assumptions=self.rfp_assumptions, **kwargs)
+
+    @traced
+    @model_retry
+    def request_missing_parts(self, agent, agent_name, response, gaps):
+        """
+        Asks an agent's model for only the parts its response is missing and appends them. Instead of
+        the agent's full RFP context, the prompt carries the response, the RFP summary and the agent's
+        top passages from the retrieval index for what is missing.
+        """
+        annotate(agent=agent_name)  # The call runs on, and is billed to, the agent's model.
+        logging.info(f"PresaleManager requesting {len(gaps)} missing parts from {agent_name}")
+        missing = "\n".join(f"- {gap.instruction}" for gap in gaps)
+        passages = agent.relevant_passages(" ".join(f"{gap.name} {gap.instruction}" for gap in gaps), k=MISSING_PARTS_PASSAGES)
+        prompt = MISSING_PARTS.render(rfp_summary=self.rfp_summary, agent_name=agent_name, missing=missing,
+                                      passages=format_passages(passages), response=response)
+        parts = agent.model.generate_content(prompt)
+        return append_parts(response, parts.text)
+
+    @traced
+    @model_retry
+    def adapt_response(self, agent, agent_name, match):
+        """Asks an agent's model to adapt its response to a similar earlier RFP (a semantic cache match) to this one."""
+        annotate(agent=agent_name)
+        logging.info(f"PresaleManager asking {agent_name} to adapt its response to {match.rfp} "
+                     f"({match.similarity:.0%} similar)")
+        prompt = ADAPT_RESPONSE.render(agent_name=agent_name, rfp=match.rfp or "unnamed", overlap=f"{match.similarity:.0%}",
+                                       prior_response=match.output, rfp_summary=self.rfp_summary,
+                                       rfp_analysis=self.rfp_analysis, rfp_assumptions=self.rfp_assumptions)
+        return agent.model.generate_content(prompt).text
 
+    @traced
+    def check_fragments(self, agent, agent_name, response):
+        """
+        Validates the Mermaid diagrams and Markdown tables in a response locally. Broken ones are
+        repaired deterministically where possible; only a fragment that still fails is sent back to
+        the agent's model (unless RFP_FRAGMENT_REGENERATE=0), never the whole response.
+        """
+        regenerate = None
+        if self.regenerate_fragments:
+            regenerate = lambda fragment, errors: self.request_fragment_fix(agent, agent_name, fragment, errors)
+        return repair_fragments(response, regenerate=regenerate, source=agent_name)
+
+    @traced
+    @model_retry
+    def request_fragment_fix(self, agent, agent_name, fragment, errors):
+        """Asks an agent's model to correct one broken diagram or table, given the parser's errors."""
+        annotate(agent=agent_name)
+        logging.info(f"PresaleManager requesting a corrected {fragment.label} from {agent_name}")
+        prompt = FRAGMENT_FIX.render(agent_name=agent_name, label=fragment.label, fragment=fragment.render(),
+                                     errors="\n".join(f"- {error}" for error in errors))
+        return agent.model.generate_content(prompt).text
+
+    @traced
+    @model_retry
     def orchestrate_responses(self, rfp_content):
         """
         Orchestrates the responses from all agents and generates the final comprehensive RFP response.
         """
-        prompt = f"""
-        You are the Presale Manager responsible for crafting the final, highly detailed and comprehensive response to the following Request for Proposal (RFP).
-        You have received information from various expert agents. Synthesize this information into a well-structured, persuasive, and thorough proposal that addresses all requirements. Ensure all diagrams and tables are included using Mermaid syntax where applicable.
-
-        RFP Summary:
-        {self.rfp_summary}
-
-        RFP Analysis:
-        {self.rfp_analysis}
-
-        RFP Assumptions:
-        {self.rfp_assumptions}
-
-        RFP Content:
-        {rfp_content}
-
-        Responses from Expert Agents:
-        {self.responses}
-
-        Based on the RFP content and the detailed expert agent responses, generate the complete RFP response. The technical proposal should include the following items extensively:
-
-        1. Executive Summary
-            - Overview of the Proposal
-            - Objectives and Goals
-            - Key Deliverables
-
-        2. Background and Context
-            - Current Challenges or Needs
-            - Existing Systems or Processes
-            - Stakeholder Insights
-
-        3. Proposal Objectives
-            - High-Level Goals
-            - Specific and Measurable Outcomes
-            - Alignment with Business Strategy
-
-        4. Scope of Work
-            - In-Scope Items
-            - Out-of-Scope Items
-            - Assumptions and Constraints
-
-        5. Technical Approach
-            - System Architecture Overview (Include Mermaid Diagram)
-            - Technology Stack (Include Table)
-            - Integration Strategy (Include Mermaid Sequence Diagram if applicable)
-            - Key Functional Components
-
-        6. Implementation Plan
-            - Phases and Milestones
-            - Resource Allocation
-            - Tools and Platforms to be Used
-            - Risk Management Plan
-
-        7. Detailed Deliverables
-            - Technical Specifications
-            - Code Modules/Features
-            - Testing and QA Artifacts
-            - Documentation
-
-        8. Timeline and Schedule
-            - Project Roadmap
-            - Detailed Gantt Chart (using Mermaid syntax)
-            - Contingency Plans for Delays
-
-        9. Resource Requirements
-            - Team Structure and Roles
-            - Hardware and Software Needs
-            - Budget Allocation
-
-        10. Risk Analysis and Mitigation
-            - Potential Risks and Impacts
-            - Mitigation Strategies
-            - Dependencies and Assumptions
-
-        11. Quality Assurance Plan
-            - Testing Strategy and Framework
-            - Metrics for Success
-            - Post-Implementation Validation
-
-        12. Monitoring and Evaluation
-            - KPIs and Metrics to Track Progress
-            - Reporting Mechanisms
-            - Feedback Loop
-
-        13. Maintenance and Support
-            - Support Model
-            - SLAs and Response Times
-            - Post-Launch Enhancements
-
-        14. Cost Estimate and Budget
-            - Detailed Cost Breakdown (Include Cost Table)
-            - ROI Analysis
-            - Funding Sources
-
-        15. Conclusion and Recommendations
-            - Summary of Key Points
-            - Why This Proposal Should Be Accepted
-            - Next Steps
-
-        16. Appendices
-            - Glossary of Terms
-            - Reference Documents
-            - Supporting Data
-
-        17. References and Citations
-            - Technical Sources
-            - Standards and Guidelines Followed
-
-        Focus on providing specific details, clear explanations, and strong justifications for all proposed solutions and approaches. Ensure the proposal is persuasive and addresses all aspects of the RFP comprehensively. Include all generated Mermaid diagrams and tables within the relevant sections.
-        """
+        prompt = FINAL_RESPONSE.render(rfp_content=rfp_content, responses=self.format_responses(),
+                                       structured=self.format_structured(), rfp_summary=self.rfp_summary,
+                                       rfp_analysis=self.rfp_analysis, rfp_assumptions=self.rfp_assumptions)
+        response = self.model.generate_content(prompt)
+        return response.text
+
+    @traced
+    @model_retry
+    def write_section(self, section, rfp_content=None, finished_sections=None):
+        """Writes one proposal section from only the agent responses (or finished sections) it depends on."""
+        number, title, items, sources, needs_rfp = section
+        logging.info(f"PresaleManager: Writing section {number}. {title}.")
+        source_text = "\n\n".join(f"{name}:\n{self.responses[name]}" for name in sources if name in self.responses)
+        structured = self.format_structured(sources)
+        if structured:
+            source_text = f"{source_text}\n\n{structured.strip()}"
+        if finished_sections:
+            source_text = f"Completed Proposal Sections:\n{finished_sections}"
+        rfp_block = f"RFP Content:\n{rfp_content}" if needs_rfp and rfp_content else ""
+        item_list = "\n".join(f"- {item}" for item in items)
+        prompt = SECTION.render(rfp_block=rfp_block, source_text=source_text, number=number, title=title, item_list=item_list,
+                                rfp_summary=self.rfp_summary, rfp_analysis=self.rfp_analysis,
+                                rfp_assumptions=self.rfp_assumptions)
         response = self.model.generate_content(prompt)
         return response.text
 
+    def orchestrate_sections(self, rfp_content, max_workers=4):
+        """
+        Generates the final proposal section by section. Body sections are written concurrently, each
+        from the agent responses it needs; the Executive Summary and Conclusion are then written from
+        the finished body, and all sections are assembled in order.
+        """
+        body = [section for section in PROPOSAL_SECTIONS if section[0] not in SUMMARY_SECTIONS]
+        summaries = [section for section in PROPOSAL_SECTIONS if section[0] in SUMMARY_SECTIONS]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            written = dict(zip((section[0] for section in body),
+                               map_with_context(executor, lambda section: self.write_section(section, rfp_content), body)))
+            finished = "\n\n".join(written[number] for number in sorted(written))
+            written.update(zip((section[0] for section in summaries),
+                               map_with_context(executor, lambda section: self.write_section(section, finished_sections=finished), summaries)))
+        logging.info(f"PresaleManager: Assembled {len(written)} proposal sections.")
+        return "\n\n".join(written[number] for number in sorted(written))
+
     def receive_response(self, agent_name, response):
         """
         Receives and stores the response from an individual agent.
         """
         self.responses[agent_name] = response
-        logging.info(f"PresaleManager received response from {agent_name}")
\ No newline at end of file
+        logging.info(f"PresaleManager received response from {agent_name}")
+
+    def receive_structured(self, kind, value):
+        """Stores validated structured data (see utils.structured); None means extraction failed and is ignored."""
+        if value is not None:
+            self.structured[kind] = value
+            logging.info(f"PresaleManager received structured {kind}")
+
+    def format_responses(self):
+        """Formats the agent responses as one titled block each, in the order they were received."""
+        return "\n\n".join(f"### {name}\n{response}" for name, response in self.responses.items())
+
+    def format_structured(self, agents=None):
+        """
+        Formats the structured data (of the given agents' responses, or all) with locally computed cost
+        totals and Gantt chart, or returns an empty string when there is none.
+        """
+        blocks = [describe(kind, value) for kind, value in self.structured.items()
+                  if agents is None or SCHEMAS[kind].agent_name in agents]
+        if not blocks:
+            return ""
+        return "\nStructured Data (validated; prefer these figures and dates over the prose above):\n" + "\n\n".join(blocks) + "\n"
\ No newline at end of file
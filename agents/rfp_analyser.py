@@ -1,106 +1,207 @@
 # agents/rfp_analyser.py
-import google.generativeai as genai
-from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from utils.api_utils import get_model
+from utils.prompts import PromptTemplate
+from utils.retry_utils import model_retry
+from utils.structured import StructuredOutputMixin
+from utils.tracing import traced
+from utils.chunking import chunk_spans, estimate_tokens
+from utils.scheduler import map_with_context
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-class RFPanalyser:
-    def __init__(self, model_name="gemini-pro"):
-        self.model = genai.GenerativeModel(model_name)
+# Documents above this many (estimated) tokens are condensed with map-reduce before prompting.
+MAP_REDUCE_THRESHOLD_TOKENS = 60000
+CHUNK_TOKENS = 12000
+
+SUMMARY_FOCUS = "the client, project objectives, scope of work, deliverables, key technical and regulatory requirements, evaluation criteria, budget, timeline and local partner preferences"
+ANALYSIS_FOCUS = "the client's background and IT landscape, Oman-specific regulations, requested services, deliverables, timelines, technical and regulatory requirements, and evaluation criteria with their weighting"
+ASSUMPTIONS_FOCUS = "details that are missing, vague or ambiguous about the current IT environment, technical requirements, regulatory compliance, timeline and budget"
+
+MAP_CHUNK = PromptTemplate("rfp_analyser.map_chunk", """
+    You are an expert RFP analyst. The following text is one part of a large Request for Proposal (RFP).
+    Extract every detail from this part about {focus}.
+    Keep exact figures, dates, clause and section numbers. Use concise bullet points and omit anything unrelated.
+
+    RFP Part:
+    {chunk}
+    """)
+
+REDUCE_NOTES = PromptTemplate("rfp_analyser.reduce_notes", """
+    You are an expert RFP analyst. The following notes were extracted from consecutive parts of a large Request for Proposal (RFP).
+    Merge them into a single set of notes about {focus}.
+    Remove duplicates, keep exact figures, dates, clause and section numbers, and preserve the order of the RFP.
+
+    Notes:
+    {notes}
+    """)
+
+# The summary, analysis and assumptions prompts start with the RFP text, so when it is small enough
+# not to be condensed the three prompts share a prefix the provider can cache.
+SUMMARY = PromptTemplate("rfp_analyser.summary", """
+    RFP Content:
+    {rfp_content}
+
+    You are an expert RFP analyst tasked with summarizing the Request for Proposal (RFP) above.
+    Your summary should capture the following key details:
+
+    Step 1: Summarize the RFP
+    Carefully read the RFP and create a concise summary capturing the following key details:
+    Client:
+    - Name of the client organization
+    - Industry or sector they operate in
+    - Approximate size or scale of their operations
+    - Current IT infrastructure and any specific challenges they face in Oman
+    Project Objectives:
+    - Clearly state the client's primary goals and desired outcomes for the cloud migration project (e.g., cost reduction, improved scalability, enhanced security, compliance with Oman regulations).
+    Scope of Work:
+    - Outline the specific services requested:
+        - Cloud migration (which applications or workloads)
+        - Managed services (e.g., monitoring, security, optimization)
+        - Specific cloud technologies or platforms preferred
+    - List any deliverables expected (e.g., migration plan, documentation, training)
+    Key Requirements:
+    - Identify any critical technical requirements (e.g., performance benchmarks, integration needs)
+    - Highlight any regulatory or compliance requirements specific to Oman
+    - Note any other client priorities (e.g., data residency, local support)
+    Evaluation Criteria:
+    - List the criteria the client will use to evaluate proposals (e.g., experience, technical expertise, cost, understanding of the Oman market)
+    - Note any specific weighting or priorities assigned to different criteria
+    Other Relevant Information:
+    - Summarize any additional details that could be crucial to winning the project:
+        - Client's pain points or challenges
+        - Budget constraints or expectations
+        - Timeline or project schedule preferences
+        - Any specific preferences for local partners or resources
+    """)
+
+ANALYSIS = PromptTemplate("rfp_analyser.analysis", """
+    RFP Content:
+    {rfp_content}
+
+    You are an expert RFP analyst tasked with analyzing the Request for Proposal (RFP) above and its summary below.
+    Extract the following key information to guide proposal content generation:
+
+    Step 2: Analyze the RFP and Extract Key Information
+    Thoroughly analyze the RFP and extract the following key information to guide proposal content generation:
+    Client Background and Needs:
+    - Refine your understanding of the client's industry, current IT landscape, and challenges based on the RFP summary.
+    - Identify any specific Oman-specific regulations or considerations mentioned in the RFP.
+    Project Scope and Deliverables:
+    - Refine your understanding of the specific services requested, expected deliverables, and timelines based on the RFP summary.
+    - Pay close attention to any specific technical, regulatory, or Oman-specific requirements mentioned.
+    Evaluation Criteria:
+    - Ensure you have a clear understanding of the criteria the client will use to evaluate proposals and any assigned weighting or priorities.
+
+    RFP Summary:
+    {rfp_summary}
+    """)
+
+ASSUMPTIONS = PromptTemplate("rfp_analyser.assumptions", """
+    RFP Content:
+    {rfp_content}
+
+    You are an expert RFP analyst tasked with identifying assumptions based on the Request for Proposal (RFP) above.
+
+    Step 3: Identify Assumptions
+    Based on your RFP analysis, list any assumptions you are making in your proposal due to points not being fully detailed in the RFP. These could include:
+    Current IT Environment: Assumptions about the client's existing infrastructure, applications, data volumes, etc., that will impact the migration strategy.
+    Technical Requirements: Any assumptions about specific technical needs or performance expectations that are not explicitly stated.
+    Regulatory Compliance: Assumptions about specific Oman regulations or compliance standards that may apply to the project but are not fully outlined in the RFP.
+    Timeline & Budget: Any assumptions about project timelines or budget constraints that might influence the proposed solution.
+    Other: Any other relevant assumptions made due to ambiguities or gaps in the RFP.
+    """)
+
+
+class RFPanalyser(StructuredOutputMixin):
+    agent_name = "RFP Analyser"
+
+    def __init__(self, model_name="gemini-pro", map_reduce_threshold=MAP_REDUCE_THRESHOLD_TOKENS, chunk_tokens=CHUNK_TOKENS, max_workers=4):
+        self.model = get_model(model_name)
+        self.model_name = model_name
+        self.map_reduce_threshold = map_reduce_threshold
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max_workers
         logging.info(f"RFPanalyser initialized with model: {model_name}")
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential())
+    @traced
+    @model_retry
+    def _map_chunk(self, chunk, focus):
+        # The prompt depends only on the chunk, not on its position, so unchanged chunks of a revised
+        # RFP are answered from the response cache.
+        prompt = MAP_CHUNK.render(focus=focus, chunk=chunk)
+        response = self.model.generate_content(prompt)
+        return response.text
+
+    @traced
+    @model_retry
+    def _reduce_notes(self, notes, focus):
+        prompt = REDUCE_NOTES.render(focus=focus, notes="\n\n".join(notes))
+        response = self.model.generate_content(prompt)
+        return response.text
+
+    @model_retry
+    def _generate(self, prompt):
+        # Retries wrap only the model calls themselves; the public methods also run condense(), whose
+        # chunk calls retry on their own, so retrying them as well would multiply attempts per 429.
+        return self.model.generate_content(prompt).text
+
+    def _group_notes(self, notes):
+        groups, current, size = [], [], 0
+        for note in notes:
+            tokens = estimate_tokens(note)
+            if len(current) >= 2 and size + tokens > self.chunk_tokens:
+                groups.append(current)
+                current, size = [], 0
+            current.append(note)
+            size += tokens
+        groups.append(current)
+        return groups
+
+    def condense(self, rfp_content, focus):
+        """
+        Returns the RFP content unchanged when it fits under the map-reduce threshold. Larger documents
+        are split into section-aligned chunks, each chunk is condensed concurrently, and the partial
+        notes are merged hierarchically until they fit in a single prompt.
+        """
+        if estimate_tokens(rfp_content) <= self.map_reduce_threshold:
+            return rfp_content
+        # Chunks are sliced from the document as they are sent, so only the ones in flight are held.
+        spans = chunk_spans(rfp_content, self.chunk_tokens)
+        logging.info(f"RFPanalyser: Map-reduce over {len(spans)} chunks (~{estimate_tokens(rfp_content)} tokens).")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            notes = list(map_with_context(executor, lambda span: self._map_chunk(rfp_content[span[0]:span[1]], focus), spans))
+            while len(notes) > 1 and sum(estimate_tokens(note) for note in notes) > self.chunk_tokens:
+                groups = self._group_notes(notes)
+                if len(groups) == len(notes):
+                    break
+                logging.info(f"RFPanalyser: Reducing {len(notes)} partial notes into {len(groups)}.")
+                notes = list(map_with_context(executor, lambda group: self._reduce_notes(group, focus) if len(group) > 1 else group[0], groups))
+        return "\n\n".join(notes)
+
+    @traced
     def summarize_rfp(self, rfp_content):
         logging.info("RFPanalyser: Starting to summarize RFP.")
-        prompt = f"""
-        You are an expert RFP analyst tasked with summarizing the following Request for Proposal (RFP).
-        Your summary should capture the following key details:
-
-        Step 1: Summarize the RFP
-        Carefully read the RFP and create a concise summary capturing the following key details:
-        Client:
-        - Name of the client organization
-        - Industry or sector they operate in
-        - Approximate size or scale of their operations
-        - Current IT infrastructure and any specific challenges they face in Oman
-        Project Objectives:
-        - Clearly state the client's primary goals and desired outcomes for the cloud migration project (e.g., cost reduction, improved scalability, enhanced security, compliance with Oman regulations).
-        Scope of Work:
-        - Outline the specific services requested:
-            - Cloud migration (which applications or workloads)
-            - Managed services (e.g., monitoring, security, optimization)
-            - Specific cloud technologies or platforms preferred
-        - List any deliverables expected (e.g., migration plan, documentation, training)
-        Key Requirements:
-        - Identify any critical technical requirements (e.g., performance benchmarks, integration needs)
-        - Highlight any regulatory or compliance requirements specific to Oman
-        - Note any other client priorities (e.g., data residency, local support)
-        Evaluation Criteria:
-        - List the criteria the client will use to evaluate proposals (e.g., experience, technical expertise, cost, understanding of the Oman market)
-        - Note any specific weighting or priorities assigned to different criteria
-        Other Relevant Information:
-        - Summarize any additional details that could be crucial to winning the project:
-            - Client's pain points or challenges
-            - Budget constraints or expectations
-            - Timeline or project schedule preferences
-            - Any specific preferences for local partners or resources
-
-        RFP Content:
-        {rfp_content}
-        """
-        logging.debug(f"RFPanalyser: Summary prompt: {prompt}")
-        response = self.model.generate_content(prompt)
+        rfp_content = self.condense(rfp_content, SUMMARY_FOCUS)
+        prompt = SUMMARY.render(rfp_content=rfp_content)
+        response = self._generate(prompt)
         logging.info("RFPanalyser: RFP summarization complete.")
-        return response.text
+        return response
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential())
+    @traced
     def analyse_rfp(self, rfp_content, rfp_summary):
         logging.info("RFPanalyser: Starting to analyse RFP and extract key information.")
-        prompt = f"""
-        You are an expert RFP analyst tasked with analyzing the following Request for Proposal (RFP) and its summary.
-        Extract the following key information to guide proposal content generation:
-
-        Step 2: Analyze the RFP and Extract Key Information
-        Thoroughly analyze the RFP and extract the following key information to guide proposal content generation:
-        Client Background and Needs:
-        - Refine your understanding of the client's industry, current IT landscape, and challenges based on the RFP summary.
-        - Identify any specific Oman-specific regulations or considerations mentioned in the RFP.
-        Project Scope and Deliverables:
-        - Refine your understanding of the specific services requested, expected deliverables, and timelines based on the RFP summary.
-        - Pay close attention to any specific technical, regulatory, or Oman-specific requirements mentioned.
-        Evaluation Criteria:
-        - Ensure you have a clear understanding of the criteria the client will use to evaluate proposals and any assigned weighting or priorities.
-
-        RFP Content:
-        {rfp_content}
-
-        RFP Summary:
-        {rfp_summary}
-        """
-        logging.debug(f"RFPanalyser: Analysis prompt: {prompt}")
-        response = self.model.generate_content(prompt)
+        rfp_content = self.condense(rfp_content, ANALYSIS_FOCUS)
+        prompt = ANALYSIS.render(rfp_content=rfp_content, rfp_summary=rfp_summary)
+        response = self._generate(prompt)
         logging.info("RFPanalyser: RFP analysis and key information extraction complete.")
-        return response.text
+        return response
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential())
+    @traced
     def identify_assumptions(self, rfp_content):
         logging.info("RFPanalyser: Starting to identify assumptions.")
-        prompt = f"""
-        You are an expert RFP analyst tasked with identifying assumptions based on the following Request for Proposal (RFP).
-
-        Step 3: Identify Assumptions
-        Based on your RFP analysis, list any assumptions you are making in your proposal due to points not being fully detailed in the RFP. These could include:
-        Current IT Environment: Assumptions about the client's existing infrastructure, applications, data volumes, etc., that will impact the migration strategy.
-        Technical Requirements: Any assumptions about specific technical needs or performance expectations that are not explicitly stated.
-        Regulatory Compliance: Assumptions about specific Oman regulations or compliance standards that may apply to the project but are not fully outlined in the RFP.
-        Timeline & Budget: Any assumptions about project timelines or budget constraints that might influence the proposed solution.
-        Other: Any other relevant assumptions made due to ambiguities or gaps in the RFP.
-
-        RFP Content:
-        {rfp_content}
-        """
-        logging.debug(f"RFPanalyser: Assumptions prompt: {prompt}")
-        response = self.model.generate_content(prompt)
+        rfp_content = self.condense(rfp_content, ASSUMPTIONS_FOCUS)
+        prompt = ASSUMPTIONS.render(rfp_content=rfp_content)
+        response = self._generate(prompt)
         logging.info("RFPanalyser: Assumption identification complete.")
-        return response.text
\ No newline at end of file
+        return response
\ No newline at end of file
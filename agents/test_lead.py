@@ -1,52 +1,54 @@
 # agents/test_lead.py
-import google.generativeai as genai
-from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
-
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-class TestLead:
-    def __init__(self, model_name="gemini-pro", rfp_summary=None, rfp_analysis=None, rfp_assumptions=None):
-        self.model = genai.GenerativeModel(model_name)
+from utils.api_utils import get_model
+from utils.prompts import AGENT_CONTEXT, PromptTemplate
+from utils.retrieval import RetrievalMixin
+from utils.retry_utils import model_retry
+from utils.structured import StructuredOutputMixin
+from utils.tracing import traced
+
+
+TESTING_APPROACH = PromptTemplate("test_lead.testing_approach", """
+    RFP Content:
+    {rfp_content}
+
+    You are the Test Lead responsible for creating a detailed testing approach for the project described in the Request for Proposal (RFP) above.
+
+    Outline a comprehensive testing approach, including:
+    - Different levels of testing to be performed (e.g., unit, integration, system, acceptance).
+    - Specific testing methodologies and techniques to be used for each level.
+    - Test environment setup and requirements.
+    - Test data strategy and management.
+    - Test case design and coverage strategy.
+    - Defect tracking and management process.
+    - Performance testing approach and tools.
+    - Security testing approach and tools.
+    - Automation strategy for testing.
+    - Roles and responsibilities within the testing team.
+    - Entry and exit criteria for each testing phase.
+
+    Provide a thorough and detailed testing approach that ensures the quality and reliability of the proposed solution.
+    """, prefix=AGENT_CONTEXT)
+
+
+class TestLead(RetrievalMixin, StructuredOutputMixin):
+    agent_name = "Test Lead"
+
+    def __init__(self, model_name="gemini-pro", rfp_summary=None, rfp_analysis=None, rfp_assumptions=None, cached_content=None, retrieval_index=None):
+        self.model = get_model(model_name, cached_content=cached_content)
+        self.model_name = model_name
+        self.retrieval_index = retrieval_index
         self.rfp_summary = rfp_summary
         self.rfp_analysis = rfp_analysis
         self.rfp_assumptions = rfp_assumptions
         logging.info(f"TestLead initialized with model: {model_name}")
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential())
+    @traced
+    @model_retry
     def create_testing_approach(self, rfp_content, rfp_summary=None, rfp_analysis=None, rfp_assumptions=None):
         logging.info("Test Lead: Starting to create a comprehensive testing approach.")
-        prompt = f"""
-        You are the Test Lead responsible for creating a detailed testing approach for the project described in the following Request for Proposal (RFP).
-
-        RFP Summary:
-        {rfp_summary}
-
-        RFP Analysis:
-        {rfp_analysis}
-
-        RFP Assumptions:
-        {rfp_assumptions}
-
-        RFP Content:
-        {rfp_content}
-
-        Outline a comprehensive testing approach, including:
-        - Different levels of testing to be performed (e.g., unit, integration, system, acceptance).
-        - Specific testing methodologies and techniques to be used for each level.
-        - Test environment setup and requirements.
-        - Test data strategy and management.
-        - Test case design and coverage strategy.
-        - Defect tracking and management process.
-        - Performance testing approach and tools.
-        - Security testing approach and tools.
-        - Automation strategy for testing.
-        - Roles and responsibilities within the testing team.
-        - Entry and exit criteria for each testing phase.
-
-        Provide a thorough and detailed testing approach that ensures the quality and reliability of the proposed solution.
-        """
-        logging.debug(f"Test Lead: Testing approach prompt: {prompt}")
+        prompt = TESTING_APPROACH.render(rfp_content=rfp_content, rfp_summary=rfp_summary, rfp_analysis=rfp_analysis,
+                                         rfp_assumptions=rfp_assumptions)
         response = self.model.generate_content(prompt)
         logging.info("Test Lead: Comprehensive testing approach creation complete.")
         return response.text
\ No newline at end of file
@@ -0,0 +1,64 @@
+# benchmarks/bench_cost_model.py
+"""
+Prices a synthetic delivery plan with the local cost model: the base breakdown, the cost items
+record, and what-if runs over increasing numbers of rate, scope and contingency variations, with
+the time per run and per scenario.
+
+Usage: python -m benchmarks.bench_cost_model [--phases 6] [--roles 8] [--scenarios 1000 10000 100000]
+"""
+import argparse
+import datetime
+import logging
+import os
+import time
+
+from utils.cost_model import CostModel, load_rate_card
+
+ROLES = ["Project Manager", "Solution Architect", "Senior Developer", "Developer", "Test Engineer",
+         "DevOps Engineer", "Business Analyst", "Security Specialist", "Data Engineer", "Trainer"]
+
+
+def synthetic_phases(phases, roles):
+    start = datetime.date(2025, 1, 6)
+    plan = []
+    for index in range(phases):
+        end = start + datetime.timedelta(days=30 + 15 * (index % 4))
+        plan.append({"name": f"Phase {index + 1}", "start": start.isoformat(), "end": end.isoformat(),
+                     "deliverables": [], "depends_on": [f"Phase {index}"] if index else [],
+                     "resources": [{"role": ROLES[(index + offset) % len(ROLES)], "count": 1 + offset % 3,
+                                    "days": 10 + 5 * offset} for offset in range(roles)],
+                     "milestones": []})
+        start = end
+    return {"phases": plan}
+
+
+def timed(func, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = func()
+    return result, (time.perf_counter() - start) * 1000 / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phases", type=int, default=6)
+    parser.add_argument("--roles", type=int, default=8)
+    parser.add_argument("--scenarios", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--rate-card", default=os.path.join("data", "rate_card.json"))
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    cost_model = CostModel(load_rate_card(args.rate_card), synthetic_phases(args.phases, args.roles))
+    breakdown, breakdown_ms = timed(cost_model.breakdown, 100)
+    items, items_ms = timed(cost_model.cost_items, 100)
+    print(f"{args.phases} phases x {args.roles} roles: total {breakdown['total']:,.2f} {breakdown['currency']}")
+    print(f"  breakdown: {breakdown_ms:.3f} ms; cost items ({len(items['items'])} lines): {items_ms:.3f} ms")
+    print(f"  {'scenarios':>10} {'ms':>10} {'us/scenario':>12}   percentiles")
+    for scenarios in args.scenarios:
+        what_if, elapsed_ms = timed(lambda: cost_model.what_if(scenarios), 3)
+        percentiles = ", ".join(f"{name} {value:,.0f}" for name, value in what_if["percentiles"].items())
+        print(f"  {scenarios:>10} {elapsed_ms:>10.1f} {elapsed_ms * 1000 / scenarios:>12.2f}   {percentiles}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_memory.py
+"""
+Peak-memory benchmark of batch mode with the RFP text held in memory (RFP_TEXT_STORE=memory) and
+in the memory-mapped text store (RFP_TEXT_STORE=mmap), using the offline stub backend. Each run is
+a fresh interpreter processing several synthetic RFPs, `--documents` at a time. Resident memory
+is sampled while the batch runs and split into anonymous memory (private heap, which the text
+store is meant to shrink) and file-backed pages (the mapped text, which the kernel can drop and
+re-read at will).
+
+Usage: python -m benchmarks.bench_memory [--pages 200 1000] [--rfps 4] [--documents 2] [--modes memory mmap]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_pipeline import BENCH_ENV, ROOT
+
+SAMPLE_SECONDS = 0.02
+
+
+def rss_kb():
+    """Returns (anonymous, file-backed) resident memory of this process in kB, from /proc/self/status."""
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                key, value = line.split(":", 1)
+                values[key] = int(value.split()[0])
+    return values.get("RssAnon", 0), values.get("RssFile", 0)
+
+
+def measure(pages, rfps, documents):
+    """Runs one batch in this process and returns its peak memory figures."""
+    import main
+    from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+    peak = {"anon": 0, "file": 0, "total": 0}
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            anon, mapped = rss_kb()
+            peak["anon"] = max(peak["anon"], anon)
+            peak["file"] = max(peak["file"], mapped)
+            peak["total"] = max(peak["total"], anon + mapped)
+            done.wait(SAMPLE_SECONDS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = os.path.join(tmp, "rfps")
+        os.makedirs(inputs)
+        for seed in range(rfps):
+            write_synthetic_pdf(os.path.join(inputs, f"rfp_{seed}.pdf"), pages, seed=seed)
+        # Batch mode keeps each RFP's state directory under .state in the working directory.
+        os.chdir(tmp)
+        baseline_anon, _ = rss_kb()
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            main.main(["batch", inputs, "--output-dir", os.path.join(tmp, "out"), "--documents", str(documents)])
+        finally:
+            done.set()
+            sampler.join()
+        seconds = time.perf_counter() - start
+    return {
+        "mode": os.environ.get("RFP_TEXT_STORE", "mmap"),
+        "pages": pages,
+        "seconds": round(seconds, 2),
+        "start_anon_mb": round(baseline_anon / 1024, 1),
+        "peak_anon_mb": round(peak["anon"] / 1024, 1),
+        "peak_file_mb": round(peak["file"] / 1024, 1),
+        "peak_rss_mb": round(peak["total"] / 1024, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def measure_in_subprocess(mode, pages, rfps, documents):
+    env = {**os.environ, **BENCH_ENV, "RFP_TEXT_STORE": mode}
+    with tempfile.TemporaryDirectory() as tmp:
+        env["RFP_CACHE_PATH"] = os.path.join(tmp, "responses.sqlite")
+        output = subprocess.check_output(
+            [sys.executable, "-m", "benchmarks.bench_memory", "--measure", str(pages),
+             "--rfps", str(rfps), "--documents", str(documents)],
+            cwd=ROOT, env={**env, "PYTHONPATH": ROOT}, stderr=subprocess.DEVNULL,
+        )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[200, 1000], help="Pages per synthetic RFP.")
+    parser.add_argument("--rfps", type=int, default=4, help="RFPs in each batch.")
+    parser.add_argument("--documents", type=int, default=2, help="RFPs processed at the same time.")
+    parser.add_argument("--modes", nargs="+", default=["memory", "mmap"], choices=["memory", "mmap"])
+    parser.add_argument("--measure", type=int, metavar="PAGES", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.rfps, args.documents)))
+        return 0
+
+    print(f"{args.rfps} RFPs per batch, {args.documents} at a time")
+    print(f"{'pages':>6} {'mode':>7} {'seconds':>8} {'peak anon MB':>13} {'peak file MB':>13} {'peak RSS MB':>12} {'ru_maxrss MB':>13}")
+    for pages in args.pages:
+        for mode in args.modes:
+            result = measure_in_subprocess(mode, pages, args.rfps, args.documents)
+            print(f"{pages:>6} {mode:>7} {result['seconds']:>8.2f} {result['peak_anon_mb']:>13.1f} "
+                  f"{result['peak_file_mb']:>13.1f} {result['peak_rss_mb']:>12.1f} {result['max_rss_mb']:>13.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
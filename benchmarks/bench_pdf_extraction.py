@@ -0,0 +1,97 @@
+# benchmarks/bench_pdf_extraction.py
+"""
+Compares the original string-concatenating read_pdf with utils.pdf_utils on synthetic PDFs.
+Each measurement runs in a fresh interpreter so peak RSS figures do not leak between runs.
+
+Usage: python -m benchmarks.bench_pdf_extraction [--pages 100 300 600] [--workers N]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import PyPDF2
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from utils.pdf_utils import extract_document, iter_pages
+
+VARIANTS = ["legacy", "streaming", "parallel"]
+
+
+def legacy_read_pdf(file_path):
+    """The read_pdf implementation main.py used before utils.pdf_utils existed."""
+    with open(file_path, 'rb') as pdf_file:
+        reader = PyPDF2.PdfReader(pdf_file)
+        text = ""
+        for page_num in range(len(reader.pages)):
+            page = reader.pages[page_num]
+            text += page.extract_text()
+    return text
+
+
+def run_variant(variant, path, workers):
+    if variant == "legacy":
+        return legacy_read_pdf(path)
+    if variant == "streaming":
+        return extract_document(path, max_workers=1).text
+    return extract_document(path, max_workers=workers).text
+
+
+def measure(variant, path, workers):
+    """Runs one variant in this process and returns timing and memory figures."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    text = run_variant(variant, path, workers)
+    seconds = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        "variant": variant,
+        "seconds": round(seconds, 3),
+        "characters": len(text),
+        "traced_peak_mb": round(traced_peak / 2**20, 1),
+        "peak_rss_mb": round(own / 1024, 1),
+        "worker_peak_rss_mb": round(children / 1024, 1),
+    }
+
+
+def measure_in_subprocess(variant, path, workers):
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.bench_pdf_extraction", "--measure", variant, path, "--workers", str(workers)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300, 600])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--measure", nargs=2, metavar=("VARIANT", "PDF"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure[0], args.measure[1], args.workers)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'pages':>6} {'variant':>10} {'seconds':>9} {'traced MB':>10} {'RSS MB':>8} {'worker RSS MB':>14}")
+        for pages in args.pages:
+            path = write_synthetic_pdf(os.path.join(tmp, f"rfp_{pages}.pdf"), pages)
+            reference = legacy_read_pdf(path)
+            assert "".join(iter_pages(path)) == reference, "Extracted text differs from the legacy reader."
+            for variant in VARIANTS:
+                result = measure_in_subprocess(variant, path, args.workers)
+                print(f"{pages:>6} {variant:>10} {result['seconds']:>9.3f} {result['traced_peak_mb']:>10.1f} "
+                      f"{result['peak_rss_mb']:>8.1f} {result['worker_peak_rss_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# benchmarks/bench_pipeline.py
+"""
+End-to-end benchmark of run_pipeline on synthetic RFPs of increasing size, using the offline stub
+backend so results do not depend on the network or on API quota. Each size runs in a fresh
+interpreter with an empty response cache and state directory, and reports extraction and indexing
+time, per-stage wall time, per-stage input/output tokens and peak RSS.
+
+Results can be written as JSON and compared with a stored baseline; any stage that is slower or
+uses more tokens than the baseline by more than the tolerance is reported and the exit status is 1.
+
+Usage: python -m benchmarks.bench_pipeline [--pages 20 100 400] [--output results.json]
+                                          [--baseline benchmarks/baselines/pipeline.json] [--save-baseline]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baselines", "pipeline.json")
+DEFAULT_TOLERANCE = 0.5
+# Differences below these are treated as noise whatever the relative change.
+MIN_SECONDS_DELTA = 0.25
+MIN_TOKENS_DELTA = 500
+
+BENCH_ENV = {
+    "RFP_MODEL_BACKEND": "stub",
+    "RFP_STUB_LATENCY": "fixed:0.8",
+    "RFP_STUB_TOKENS_PER_SECOND": "150",
+    "RFP_STUB_TIME_SCALE": "0.02",
+    "RFP_CACHE_BYPASS": "1",
+    "RFP_REQUESTS_PER_MINUTE": "100000",
+    "RFP_TOKENS_PER_MINUTE": "1000000000",
+}
+
+
+def measure(pages, workers):
+    """Runs the whole pipeline once in this process and returns its timings and token counts."""
+    import main
+    from benchmarks.synthetic_pdf import write_synthetic_pdf
+    from utils.backends import StubBackend, StubModel, set_backend
+    from utils.scheduler import current_stage
+
+    usage = {}
+    lock = threading.Lock()
+
+    class MeteredStubModel(StubModel):
+        """Stub model that attributes each call's prompt and completion tokens to the running stage."""
+
+        def generate_content(self, prompt, stream=False, **kwargs):
+            response = super().generate_content(prompt, stream=stream, **kwargs)
+            stage = current_stage.get() or "unattributed"
+            with lock:
+                record = usage.setdefault(stage, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+                record["calls"] += 1
+                record["input_tokens"] += response.usage_metadata.prompt_token_count
+                record["output_tokens"] += response.usage_metadata.candidates_token_count
+            return response
+
+    class MeteredStubBackend(StubBackend):
+        def create_model(self, model_name, generation_config=None, cached_content=None):
+            model = MeteredStubModel(self, model_name)
+            model._generation_config = dict(generation_config or {})
+            return model
+
+    set_backend(MeteredStubBackend.from_env())
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = write_synthetic_pdf(os.path.join(tmp, f"rfp_{pages}.pdf"), pages)
+        stats = {}
+        main.run_pipeline(pdf_path, os.path.join(tmp, "final_response.md"), max_workers=workers,
+                          state_dir=os.path.join(tmp, "state"), stats=stats)
+
+    stages = {
+        name: {"seconds": round(seconds, 3), **usage.get(name, {"calls": 0, "input_tokens": 0, "output_tokens": 0})}
+        for name, seconds in stats["stages"].items()
+    }
+    return {
+        "pages": pages,
+        "characters": stats["characters"],
+        "extract_seconds": round(stats["extract_seconds"], 3),
+        "index_seconds": round(stats["index_seconds"], 3),
+        "total_seconds": round(stats["total_seconds"], 3),
+        "input_tokens": sum(stage["input_tokens"] for stage in stages.values()),
+        "output_tokens": sum(stage["output_tokens"] for stage in stages.values()),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": stages,
+    }
+
+
+def measure_in_subprocess(pages, workers):
+    env = {**os.environ, **BENCH_ENV}
+    with tempfile.TemporaryDirectory() as tmp:
+        env["RFP_CACHE_PATH"] = os.path.join(tmp, "responses.sqlite")
+        output = subprocess.check_output(
+            [sys.executable, "-m", "benchmarks.bench_pipeline", "--measure", str(pages), "--workers", str(workers)],
+            cwd=ROOT, env=env, stderr=subprocess.DEVNULL,
+        )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def print_report(results):
+    for result in results:
+        print(f"\n{result['pages']} pages, {result['characters']} characters: total {result['total_seconds']:.2f}s, "
+              f"extract {result['extract_seconds']:.2f}s, index {result['index_seconds']:.2f}s, "
+              f"{result['input_tokens']} in / {result['output_tokens']} out tokens, peak RSS {result['peak_rss_mb']} MB")
+        print(f"  {'stage':<20} {'seconds':>8} {'calls':>6} {'in tokens':>10} {'out tokens':>11}")
+        for name, stage in sorted(result["stages"].items(), key=lambda item: -item[1]["seconds"]):
+            print(f"  {name:<20} {stage['seconds']:>8.2f} {stage['calls']:>6} "
+                  f"{stage['input_tokens']:>10} {stage['output_tokens']:>11}")
+
+
+def _exceeds(value, reference, tolerance, min_delta):
+    return value - reference > min_delta and value > reference * (1 + tolerance)
+
+
+def compare(results, baseline, tolerance):
+    """Returns a description of every metric that regressed relative to the baseline."""
+    regressions = []
+    reference_by_pages = {result["pages"]: result for result in baseline["results"]}
+    for result in results:
+        reference = reference_by_pages.get(result["pages"])
+        if reference is None:
+            continue
+        label = f"{result['pages']} pages"
+        checks = [
+            (f"{label} total_seconds", result["total_seconds"], reference["total_seconds"], MIN_SECONDS_DELTA),
+            (f"{label} extract_seconds", result["extract_seconds"], reference["extract_seconds"], MIN_SECONDS_DELTA),
+            (f"{label} index_seconds", result["index_seconds"], reference["index_seconds"], MIN_SECONDS_DELTA),
+        ]
+        for name, stage in result["stages"].items():
+            old = reference["stages"].get(name)
+            if old is None:
+                continue
+            checks.append((f"{label} {name} seconds", stage["seconds"], old["seconds"], MIN_SECONDS_DELTA))
+            for metric in ("input_tokens", "output_tokens"):
+                checks.append((f"{label} {name} {metric}", stage[metric], old[metric], MIN_TOKENS_DELTA))
+        for name, value, old, min_delta in checks:
+            if _exceeds(value, old, tolerance, min_delta):
+                regressions.append(f"{name}: {old} -> {value}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100, 400])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative increase over the baseline before a metric counts as a regression.")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with these results.")
+    parser.add_argument("--measure", type=int, metavar="PAGES", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.workers)))
+        return 0
+
+    results = [measure_in_subprocess(pages, args.workers) for pages in args.pages]
+    print_report(results)
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "env": BENCH_ENV, "results": results}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# benchmarks/bench_prompts.py
+"""
+Renders every agent prompt of one pipeline run on synthetic RFP text and reports, per template,
+the estimated prompt tokens and how many of them are in the shared context prefix, plus render
+time and peak memory for the whole set. It also reports the longest byte-identical prefix across
+the agents' prompts, which is what provider-side prefix caching can reuse, next to the same figure
+for the old layout that opened each prompt with the agent's role.
+
+Usage: python -m benchmarks.bench_prompts [--pages 20 100 400] [--runs 50]
+"""
+import argparse
+import logging
+import os
+import time
+import tracemalloc
+
+from agents.bd_manager import COST_BREAKDOWN
+from agents.delivery_lead import DELIVERY_PLAN
+from agents.internet_researcher import RFP_CONTEXT_RESEARCH
+from agents.presale_manager import FINAL_RESPONSE
+from agents.sre_lead import MAINTENANCE_SUPPORT_PLAN
+from agents.tech_lead import TECHNICAL_APPROACH
+from agents.test_lead import TESTING_APPROACH
+from benchmarks.bench_retrieval import synthetic_document
+from utils.chunking import estimate_tokens
+from utils.context_packer import ContextPacker
+
+TEMPLATES = {
+    "Delivery Lead": DELIVERY_PLAN,
+    "Tech Lead": TECHNICAL_APPROACH,
+    "BD Manager": COST_BREAKDOWN,
+    "SRE Lead": MAINTENANCE_SUPPORT_PLAN,
+    "Test Lead": TESTING_APPROACH,
+    "Internet Researcher": RFP_CONTEXT_RESEARCH,
+    "Presale Manager": FINAL_RESPONSE,
+}
+
+
+def agent_values(text):
+    """Returns the values each agent's prompt is rendered with, sized like a real run."""
+    packer = ContextPacker(text, mode="packed")
+    context = {
+        "rfp_summary": text[:6000],
+        "rfp_analysis": text[6000:14000],
+        "rfp_assumptions": text[14000:18000],
+    }
+    response = text[:12000]
+    values = {}
+    for agent in TEMPLATES:
+        values[agent] = {**context, "rfp_content": packer.context_for(agent), "delivery_plan": response,
+                         "technical_approach": response, "responses": {name: response for name in TEMPLATES}}
+    return values
+
+
+def legacy_prompt(agent, values):
+    # The layout before templates: role first, then the context, all indented inside the method body.
+    return (f"\n        You are the {agent} responding to the following Request for Proposal (RFP).\n\n"
+            f"        RFP Summary:\n        {values['rfp_summary']}\n\n"
+            f"        RFP Analysis:\n        {values['rfp_analysis']}\n\n"
+            f"        RFP Assumptions:\n        {values['rfp_assumptions']}\n\n"
+            f"        RFP Content:\n        {values['rfp_content']}\n        ")
+
+
+def common_prefix_tokens(prompts):
+    return estimate_tokens(os.path.commonprefix(prompts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100, 400])
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for pages in args.pages:
+        text, _ = synthetic_document(pages)
+        values = agent_values(text)
+        prompts = {agent: template.render(**values[agent]) for agent, template in TEMPLATES.items()}
+        print(f"\n{pages} pages")
+        print(f"  {'template':<36} {'tokens':>8} {'shared prefix':>14}")
+        for agent, template in TEMPLATES.items():
+            shared = template.prefix.shared(values[agent])[1]
+            print(f"  {template.name:<36} {estimate_tokens(prompts[agent]):>8} {shared:>14}")
+
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            for agent, template in TEMPLATES.items():
+                template.render(**values[agent])
+        render_ms = (time.perf_counter() - start) * 1000 / args.runs
+        tracemalloc.start()
+        for agent, template in TEMPLATES.items():
+            template.render(**values[agent])
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+        legacy = [legacy_prompt(agent, values[agent]) for agent in TEMPLATES]
+        print(f"  render all: {render_ms:.2f} ms, peak {peak_mb:.1f} MB; common prefix across agents: "
+              f"{common_prefix_tokens(list(prompts.values()))} tokens (role-first layout: {common_prefix_tokens(legacy)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_retrieval.py
+"""
+Measures retrieval index build, save, load and query times on synthetic RFP text.
+
+Usage: python -m benchmarks.bench_retrieval [--pages 1000 5000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.synthetic_pdf import page_lines
+from utils.context_packer import AGENT_PROFILES
+from utils.retrieval import RetrievalIndex
+
+
+def synthetic_document(pages, seed=0):
+    """Returns synthetic RFP text and its page offsets without going through a PDF."""
+    rng = random.Random(seed)
+    texts = ["\n".join(page_lines(page_num, rng)) for page_num in range(pages)]
+    offsets, offset = [], 0
+    for text in texts:
+        offsets.append(offset)
+        offset += len(text) + 1
+    return "\n".join(texts), offsets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    queries = [" ".join(keywords) for keywords in AGENT_PROFILES.values()]
+    print(f"{'pages':>6} {'passages':>9} {'build s':>8} {'save s':>7} {'load s':>7} {'bm25 ms':>8} {'vector ms':>10}")
+    for pages in args.pages:
+        text, offsets = synthetic_document(pages)
+        start = time.perf_counter()
+        index = RetrievalIndex.build(text, offsets)
+        build = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rfp.pdf.index.json")
+            start = time.perf_counter()
+            index.save(path)
+            save = time.perf_counter() - start
+            start = time.perf_counter()
+            RetrievalIndex.load(path, text)
+            load = time.perf_counter() - start
+
+        timings = {}
+        for mode in ("bm25", "vector"):
+            start = time.perf_counter()
+            for query in queries:
+                index.search(query, k=args.k, mode=mode)
+            timings[mode] = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{pages:>6} {len(index.spans):>9} {build:>8.2f} {save:>7.2f} {load:>7.2f} "
+              f"{timings['bm25']:>8.1f} {timings['vector']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
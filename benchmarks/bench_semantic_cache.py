@@ -0,0 +1,69 @@
+# benchmarks/bench_semantic_cache.py
+"""
+Indexes synthetic RFP slices (each the size of an agent's packed context) in a fresh semantic
+cache and reports signature, insert and lookup times, then how often lookups of edited copies
+find their original (near-duplicates) and how often lookups of unrelated RFPs match anything.
+
+Usage: python -m benchmarks.bench_semantic_cache [--entries 200 1000] [--pages 20] [--edits 0.01 0.05 0.2]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_retrieval import synthetic_document
+from utils.semantic_cache import SemanticCache
+
+STAGE = "sre_response"
+MODEL = "gemini-pro"
+
+
+def edited(text, fraction, rng):
+    """Returns `text` with `fraction` of its words replaced, as a revised or repeat-client RFP would be."""
+    words = text.split()
+    for index in rng.sample(range(len(words)), int(len(words) * fraction)):
+        words[index] = f"changed{rng.randint(0, 10 ** 6)}"
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--pages", type=int, default=20, help="Pages of RFP text per entry.")
+    parser.add_argument("--edits", type=float, nargs="+", default=[0.01, 0.05, 0.2])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(0)
+
+    for entries in args.entries:
+        texts = [synthetic_document(args.pages, seed=seed)[0] for seed in range(entries)]
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SemanticCache(os.path.join(tmp, "semantic.sqlite3"), max_entries=entries)
+            start = time.perf_counter()
+            for seed, text in enumerate(texts):
+                cache.put(STAGE, text, f"response {seed}", MODEL, rfp=f"rfp{seed}.pdf")
+            insert_ms = (time.perf_counter() - start) * 1000 / entries
+            start = time.perf_counter()
+            cache.hasher.signature(texts[0])
+            signature_ms = (time.perf_counter() - start) * 1000
+            print(f"\n{entries} entries of {args.pages} pages: signature {signature_ms:.1f} ms, insert {insert_ms:.1f} ms")
+            print(f"  {'edited':>7} {'lookup ms':>10} {'found':>6} {'mean similarity':>16}")
+            for fraction in args.edits:
+                samples = rng.sample(range(entries), min(args.queries, entries))
+                queries = [edited(texts[seed], fraction, rng) for seed in samples]
+                start = time.perf_counter()
+                matches = [cache.lookup(STAGE, query, MODEL) for query in queries]
+                lookup_ms = (time.perf_counter() - start) * 1000 / len(queries)
+                found = [match for seed, match in zip(samples, matches) if match and match.rfp == f"rfp{seed}.pdf"]
+                mean = sum(match.similarity for match in found) / len(found) if found else 0.0
+                print(f"  {fraction:>7.0%} {lookup_ms:>10.2f} {len(found) / len(queries):>6.0%} {mean:>16.2f}")
+            unrelated = [synthetic_document(args.pages, seed=entries + seed)[0] for seed in range(args.queries)]
+            false_matches = sum(cache.lookup(STAGE, text, MODEL) is not None for text in unrelated)
+            print(f"  unrelated RFPs matched: {false_matches}/{len(unrelated)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_startup.py
+"""
+Measures CLI startup time and checks it against a budget. Quick commands (--help, cache stats,
+extract) must stay within BUDGET_MS of a bare interpreter start and must not import the agents,
+numpy or the model SDK. For reference, the time to import everything main.py used to import at
+the top level is also reported.
+
+Usage: python -m benchmarks.bench_startup [--runs 7] [--budget-ms 150]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = 150
+HEAVY_MODULES = ["numpy", "PyPDF2", "google.generativeai", "tenacity", "agents.presale_manager", "utils.retrieval"]
+EAGER_IMPORTS = (
+    "import dotenv, google.generativeai, PyPDF2, agents.presale_manager, agents.bd_manager, agents.tech_lead, "
+    "agents.sre_lead, agents.test_lead, agents.internet_researcher, agents.delivery_lead, agents.rfp_analyser, "
+    "utils.batch, utils.checkpoint, utils.context_packer, utils.pdf_utils, utils.retrieval, utils.response_cache, "
+    "utils.scheduler, utils.streaming"
+)
+# Reports which heavy modules a command loaded, after running it in-process.
+PROBE = (
+    "import json, sys, main\n"
+    "try:\n    main.main(sys.argv[1:])\nexcept SystemExit:\n    pass\n"
+    "print(json.dumps([name for name in {heavy} if name in sys.modules]), file=sys.stderr)\n"
+)
+
+
+def wall_time(command, runs, env):
+    """Median wall time of `command` in milliseconds."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def loaded_heavy_modules(args, env):
+    result = subprocess.run([sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)] + args, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    return json.loads(result.stderr.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS,
+                        help="Allowed startup time of a quick command over a bare interpreter.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "RFP_CACHE_PATH": os.path.join(tmp, "responses.sqlite3")}
+        pdf_path = write_synthetic_pdf(os.path.join(tmp, "rfp.pdf"), 2)
+        quick = {
+            "--help": ["--help"],
+            "cache stats": ["cache", "stats"],
+            "extract": ["extract", pdf_path, "--output", os.path.join(tmp, "rfp.txt")],
+        }
+        baseline = wall_time([sys.executable, "-c", "pass"], args.runs, env)
+        eager = wall_time([sys.executable, "-c", EAGER_IMPORTS], args.runs, env)
+        print(f"{'command':<14} {'ms':>8} {'over python':>12}  heavy modules loaded")
+        print(f"{'python':<14} {baseline:>8.1f} {0:>12.1f}")
+        print(f"{'eager imports':<14} {eager:>8.1f} {eager - baseline:>12.1f}  (reference: old top-level imports)")
+
+        failures = []
+        for name, command in quick.items():
+            elapsed = wall_time([sys.executable, "main.py"] + command, args.runs, env)
+            heavy = loaded_heavy_modules(command, env)
+            print(f"{name:<14} {elapsed:>8.1f} {elapsed - baseline:>12.1f}  {', '.join(heavy) or '-'}")
+            # Extraction needs PyPDF2; nothing else heavy is allowed.
+            unexpected = [module for module in heavy if not (name == "extract" and module == "PyPDF2")]
+            if elapsed - baseline > args.budget_ms:
+                failures.append(f"{name} took {elapsed - baseline:.1f} ms over the interpreter (budget {args.budget_ms:.0f} ms)")
+            if unexpected:
+                failures.append(f"{name} imported {', '.join(unexpected)}")
+
+    if failures:
+        print("\nStartup budget exceeded:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print(f"\nAll quick commands within {args.budget_ms:.0f} ms of interpreter start.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# benchmarks/synthetic_pdf.py
+"""Writes synthetic, RFP-like PDF documents of arbitrary size for benchmarks."""
+import random
+
+SECTION_TITLES = [
+    "Introduction", "Background", "Scope of Work", "Technical Requirements", "Service Level Agreements",
+    "Security and Compliance", "Data Residency", "Project Timeline", "Commercial Terms", "Pricing Schedule",
+    "Evaluation Criteria", "Testing and Acceptance", "Support and Maintenance", "Training", "Annex",
+]
+
+WORDS = (
+    "the contractor shall provide cloud migration services for the ministry including managed services "
+    "monitoring security optimization availability of ninety nine point nine percent response time within "
+    "four hours data must remain within the sultanate of oman compliance with national regulations is "
+    "mandatory the bidder will submit a detailed pricing schedule with unit rates and licence costs "
+    "acceptance testing integration with existing erp systems disaster recovery backup retention of "
+    "seven years escalation matrix quarterly reporting penalties for missed service levels"
+).split()
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_lines(page_num, rng, lines_per_page=45):
+    """Returns the text lines of one synthetic page, starting a new numbered section every few pages."""
+    lines = []
+    if page_num % 4 == 0:
+        section = page_num // 4 + 1
+        lines.append(f"{section}. {SECTION_TITLES[(section - 1) % len(SECTION_TITLES)]}")
+    while len(lines) < lines_per_page:
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(14)))
+    return lines
+
+
+def write_synthetic_pdf(path, pages, seed=0, lines_per_page=45):
+    """Writes a PDF with `pages` pages of text to `path` using only the standard library."""
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, filled in once the page object numbers are known.
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page_num in range(pages):
+        body = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        body += [f"({_escape(line)}) '" for line in page_lines(page_num, rng, lines_per_page)]
+        body.append("ET")
+        stream = "\n".join(body).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    with open(path, "wb") as pdf_file:
+        pdf_file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, obj in enumerate(objects, start=1):
+            offsets.append(pdf_file.tell())
+            pdf_file.write(b"%d 0 obj\n" % number + obj + b"\nendobj\n")
+        xref = pdf_file.tell()
+        pdf_file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            pdf_file.write(b"%010d 00000 n \n" % offset)
+        pdf_file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return path
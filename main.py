@@ -1,128 +1,667 @@
+import argparse
 import os
-from dotenv import load_dotenv
-import google.generativeai as genai
-from agents.presale_manager import PresaleManager
-from agents.bd_manager import BDManager
-from agents.tech_lead import TechLead
-from agents.sre_lead import SRELead
-from agents.test_lead import TestLead
-from agents.internet_researcher import InternetResearcher
-from agents.delivery_lead import DeliveryLead
-from agents.rfp_analyser import RFPanalyser
-import PyPDF2
+import sys
+import time
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-load_dotenv()
-# Configure generative AI
-genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
-logging.info("Google Generative AI configured.")
+# Agents, PyPDF2, numpy and the model SDK are imported inside the functions that need them, so quick
+# commands such as `extract` and `cache stats` start without loading them. The model backend
+# (RFP_MODEL_BACKEND, default "gemini") is configured on the first model call.
+
+MODEL_NAME = "gemini-1.5-flash"
+MAX_WORKERS = 4
+ANALYSIS_STAGES = ["rfp_summary", "rfp_analysis", "rfp_assumptions"]
+# Stages that restate an agent response as validated JSON (RFP_STRUCTURED_OUTPUTS=1):
+# stage -> (the response it reads, the utils.structured schema, the team member that extracts it).
+STRUCTURED_STAGES = {
+    "assumption_data": ("rfp_assumptions", "assumptions", None),
+    "delivery_data": ("delivery_plan", "phases", "delivery_lead"),
+    "cost_data": ("bd_response", "cost_items", "bd_manager"),
+    "sla_data": ("sre_response", "slas", "sre_lead"),
+    "test_data": ("test_response", "test_levels", "test_lead"),
+}
+# Stages whose output may come from the semantic cache (RFP_SEMANTIC_CACHE=1), because their
+# research, support and testing content carries over between similar RFPs:
+# stage -> (agent name, team member, method that regenerates it).
+SEMANTIC_STAGES = {
+    "research_response": ("Internet Researcher", "internet_researcher", "research_rfp_context"),
+    "sre_response": ("SRE Lead", "sre_lead", "create_maintenance_support_plan"),
+    "test_response": ("Test Lead", "test_lead", "create_testing_approach"),
+}
+COMMANDS = ["extract", "analyse", "run", "resume", "revise", "batch", "serve", "cost", "check", "cache"]
 
 def read_pdf(file_path):
+    from utils.pdf_utils import extract_document
+
     logging.info(f"Reading PDF file: {file_path}")
-    with open(file_path, 'rb') as pdf_file:
-        reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page_num in range(len(reader.pages)):
-            page = reader.pages[page_num]
-            text += page.extract_text()
+    text = extract_document(file_path).text
     logging.info(f"PDF content read successfully. Length: {len(text)} characters.")
     return text
 
-if __name__ == "__main__":
-    rfp_path = "data/rfp.pdf"  # Replace with your RFP file path
+def checked_response(presale_manager, agent_name, response, agent, method_name, rfp_content, **kwargs):
+    """
+    Asks the Presale Manager to evaluate a response. Missing tables, diagrams or topics are requested
+    with a short targeted follow-up; only an empty or near-empty response is regenerated in full.
+    Diagrams and tables that do not parse are then repaired, or regenerated one fragment at a time.
+    """
+    gaps = presale_manager.evaluate_response(agent_name, response)
+    if gaps and any(gap.regenerate for gap in gaps):
+        response = presale_manager.request_more_details(agent, method_name, rfp_content, **kwargs)
+    elif gaps:
+        response = presale_manager.request_missing_parts(agent, agent_name, response, gaps)
+    response = presale_manager.check_fragments(agent, agent_name, response)
+    logging.info(f"{agent_name} response received. Length: {len(response)} characters.")
+    return response
+
+def default_state_dir(rfp_path, name=None):
+    """Returns `.state/<name>`; the name defaults to the RFP's file stem (batch mode passes a unique one)."""
+    return os.path.join(".state", name or os.path.splitext(os.path.basename(rfp_path))[0])
+
+def run_pipeline(rfp_path, output_path, model_name=MODEL_NAME, max_workers=MAX_WORKERS, resume=False, state_dir=None,
+                 stats=None, progress=None):
+    """
+    Runs every agent over the RFP and writes the final proposal to `output_path`.
+    Agent calls are declared as a dependency graph so independent calls run concurrently.
+    Each stage's output is checkpointed under `state_dir`; with `resume`, stages whose inputs
+    are unchanged are restored instead of re-run. If a `stats` dict is given it is filled with
+    extraction, indexing and per-stage timings.
+    The run is traced: a per-agent summary is logged at the end, and the spans and metrics are
+    written to trace.json and metrics.prom in the state directory.
+    `progress`, if given, is called as progress(event, stage, **details) for each stage event of the
+    DAGScheduler, with ("chunk", "final_response", text=...) as the proposal streams in, and with
+    ("reset", "final_response") when a retry restarts it.
+    """
+    state_dir = state_dir or default_state_dir(rfp_path)
+    results = traced_run(rfp_path, state_dir, lambda: _run_pipeline(
+        rfp_path, output_path, model_name, max_workers, resume, state_dir, {} if stats is None else stats,
+        progress=progress))
+    return results["final_response"]
+
+def analyse_rfp(rfp_path, output_path, model_name=MODEL_NAME, max_workers=MAX_WORKERS, resume=False, state_dir=None):
+    """
+    Runs only the RFP Analyser stages and writes the summary, analysis and assumptions to `output_path`.
+    They are checkpointed in the same state directory as a full run, so `resume` can pick them up.
+    """
+    state_dir = state_dir or default_state_dir(rfp_path)
+    results = traced_run(rfp_path, state_dir, lambda: _run_pipeline(
+        rfp_path, output_path, model_name, max_workers, resume, state_dir, {}, targets=ANALYSIS_STAGES))
+    titles = {"rfp_summary": "Summary", "rfp_analysis": "Analysis", "rfp_assumptions": "Assumptions"}
+    report = "\n\n".join(f"# {titles[stage]}\n\n{results[stage]}" for stage in ANALYSIS_STAGES)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as f:
+        f.write(report)
+    logging.info(f"RFP analysis saved to: {output_path}")
+    return report
+
+def describe_pages(pages):
+    """Formats zero-based page numbers as one-based ranges, e.g. [2, 3, 4, 9] -> "3-5, 10"."""
+    ranges, first = [], None
+    for index, page in enumerate(pages):
+        if first is None:
+            first = page
+        if index + 1 == len(pages) or pages[index + 1] != page + 1:
+            ranges.append(f"{first + 1}-{page + 1}" if page > first else f"{first + 1}")
+            first = None
+    return ", ".join(ranges)
+
+def changed_sections(document, pages):
+    """Returns the titles of the RFP sections that overlap the given pages."""
+    from utils.chunking import split_sections
+
+    spans = [document.page_span(page) for page in pages]
+    return [section.title for section in split_sections(document.text)
+            if any(start < section.end and section.start < end for start, end in spans)]
+
+def traced_run(rfp_path, state_dir, run):
+    """Calls `run` inside a pipeline span, then logs the per-agent summary and exports the trace."""
+    from utils.tracing import export_trace, get_tracer, summary_table
+
+    tracer = get_tracer()
+    try:
+        with tracer.span("pipeline", kind="server", rfp=os.path.basename(rfp_path)) as root:
+            return run()
+    finally:
+        spans = tracer.pop_trace(root.trace_id)
+        logging.info(f"Run summary for {rfp_path}:\n{summary_table(spans)}")
+        export_trace(spans, state_dir)
+
+def _run_pipeline(rfp_path, output_path, model_name, max_workers, resume, state_dir, stats, targets=None, progress=None):
+    from agents.presale_manager import PresaleManager
+    from agents.bd_manager import BDManager
+    from agents.tech_lead import TechLead
+    from agents.sre_lead import SRELead
+    from agents.test_lead import TestLead
+    from agents.internet_researcher import InternetResearcher
+    from agents.delivery_lead import DeliveryLead
+    from agents.rfp_analyser import RFPanalyser, MAP_REDUCE_THRESHOLD_TOKENS
+    from utils.api_utils import get_model_registry, model_namespace
+    from utils.checkpoint import RunState, hash_value
+    from utils.context_packer import ContextPacker
+    from utils.cost_model import CostModel, load_rate_card
+    from utils.pdf_utils import extract_document
+    from utils.prompts import prompt_stats
+    from utils.retrieval import RetrievalIndex
+    from utils.response_cache import get_response_cache
+    from utils.scheduler import DAGScheduler
+    from utils.semantic_cache import get_semantic_cache
+    from utils.streaming import stream_to
+    from utils.structured import SCHEMAS, compact_json, cost_summary, cost_table, describe
+
+    start = time.perf_counter()
     logging.info(f"Processing RFP file: {rfp_path}")
-    rfp_content = read_pdf(rfp_path)
-
-    rfp_analyser = RFPanalyser("gemini-1.5-flash")
-    logging.info("RFPanalyser initialized.")
-
-    logging.info("Calling RFPanalyser to summarize RFP.")
-    rfp_summary = rfp_analyser.summarize_rfp(rfp_content)
-    logging.info(f"RFPanalyser summary received. Length: {len(rfp_summary)} characters.")
-
-    logging.info("Calling RFPanalyser to analyse RFP and extract key information.")
-    rfp_analysis = rfp_analyser.analyse_rfp(rfp_content, rfp_summary)
-    logging.info(f"RFPanalyser analysis received. Length: {len(rfp_analysis)} characters.")
-
-    logging.info("Calling RFPanalyser to identify assumptions.")
-    rfp_assumptions = rfp_analyser.identify_assumptions(rfp_content)
-    logging.info(f"RFPanalyser assumptions received. Length: {len(rfp_assumptions)} characters.")
-
-    presale_manager = PresaleManager("gemini-1.5-flash", rfp_summary, rfp_analysis, rfp_assumptions)
-    bd_manager = BDManager("gemini-1.5-flash", rfp_summary, rfp_analysis, rfp_assumptions)
-    tech_lead = TechLead("gemini-1.5-flash", rfp_summary, rfp_analysis, rfp_assumptions)
-    sre_lead = SRELead("gemini-1.5-flash", rfp_summary, rfp_analysis, rfp_assumptions)
-    test_lead = TestLead("gemini-1.5-flash", rfp_summary, rfp_analysis, rfp_assumptions)
-    internet_researcher = InternetResearcher("gemini-1.5-flash", rfp_summary, rfp_analysis, rfp_assumptions)
-    delivery_lead = DeliveryLead("gemini-1.5-flash", rfp_summary, rfp_analysis, rfp_assumptions)
-    logging.info("Agents initialized.")
-
-    logging.info("Calling Delivery Lead to create delivery plan.")
-    delivery_plan = delivery_lead.create_delivery_plan(rfp_content, rfp_summary, rfp_analysis, rfp_assumptions)
-    presale_manager.receive_response("Delivery Lead", delivery_plan)
-    feedback = presale_manager.evaluate_response("Delivery Lead", delivery_plan)
-    if feedback:
-        delivery_plan = presale_manager.request_more_details(delivery_lead, "provide_detailed_resource_plan", rfp_content)
-        presale_manager.receive_response("Delivery Lead", delivery_plan)
-    logging.info(f"Delivery Lead response received. Length: {len(delivery_plan)} characters.")
-
-    logging.info("Calling Tech Lead to create technical approach.")
-    tech_response = tech_lead.create_technical_approach(rfp_content, rfp_summary, rfp_analysis, rfp_assumptions)
-    presale_manager.receive_response("Tech Lead", tech_response)
-    feedback = presale_manager.evaluate_response("Tech Lead", tech_response)
-    if feedback:
-        tech_response = presale_manager.request_more_details(tech_lead, "provide_detailed_architecture", rfp_content)
-        presale_manager.receive_response("Tech Lead", tech_response)
-    logging.info(f"Tech Lead response received. Length: {len(tech_response)} characters.")
-
-    logging.info("Calling BD Manager to breakdown costs based on delivery plan and technical approach.")
-    bd_response = bd_manager.breakdown_costs(rfp_content, delivery_plan, tech_response, rfp_summary, rfp_analysis, rfp_assumptions)
-    presale_manager.receive_response("BD Manager", bd_response)
-    feedback = presale_manager.evaluate_response("BD Manager", bd_response)
-    if feedback:
-        bd_response = presale_manager.request_more_details(bd_manager, "provide_detailed_cost_breakdown", rfp_content, delivery_plan=delivery_plan, technical_approach=tech_response)
-        presale_manager.receive_response("BD Manager", bd_response)
-    logging.info(f"BD Manager response received. Length: {len(bd_response)} characters.")
-
-    logging.info("Calling SRE Lead to create maintenance and support plan.")
-    sre_response = sre_lead.create_maintenance_support_plan(rfp_content, rfp_summary, rfp_analysis, rfp_assumptions)
-    presale_manager.receive_response("SRE Lead", sre_response)
-    logging.info(f"SRE Lead response received. Length: {len(sre_response)} characters.")
-
-    logging.info("Calling Test Lead to create testing approach.")
-    test_response = test_lead.create_testing_approach(rfp_content, rfp_summary, rfp_analysis, rfp_assumptions)
-    presale_manager.receive_response("Test Lead", test_response)
-    logging.info(f"Test Lead response received. Length: {len(test_response)} characters.")
-
-    logging.info("Calling Internet Researcher to research RFP context.")
-    research_response = internet_researcher.research_rfp_context(rfp_content, rfp_summary, rfp_analysis, rfp_assumptions)
-    presale_manager.receive_response("Internet Researcher", research_response)
-    logging.info(f"Internet Researcher response received. Length: {len(research_response)} characters.")
-
-    presale_manager.receive_response("RFP Summary", rfp_summary)
-    presale_manager.receive_response("RFP Analysis", rfp_analysis)
-    presale_manager.receive_response("RFP Assumptions", rfp_assumptions)
-
-    logging.info("Generating final response using Presale Manager.")
-    final_response = presale_manager.orchestrate_responses(rfp_content)
-    logging.info(f"Final response generated. Length: {len(final_response)} characters.")
-
-    # Create the 'temp' folder if it doesn't exist
-    temp_folder = "temp"
-    os.makedirs(temp_folder, exist_ok=True)
-
-    # Define the file path
-    file_path = os.path.join(temp_folder, "final_technical_proposal.md")
-
-    # Write the final response to the Markdown file
-    with open(file_path, "w") as f:
-        f.write(final_response)
-
-    logging.info(f"Final response saved to: {file_path}")
-
-    # Remove the print statement
-    # print("Final Response:\n", final_response)
-    logging.info("Final response printing to console removed.")
\ No newline at end of file
+    # With RFP_TEXT_STORE=mmap (the default) the text is kept in a memory-mapped file in the state
+    # directory and every stage slices the part it needs; "memory" keeps it as one string.
+    text_store = os.environ.get("RFP_TEXT_STORE", "mmap")
+    document = extract_document(rfp_path, store_path=os.path.join(state_dir, "rfp.text") if text_store == "mmap" else None)
+    try:
+        rfp_content = document.text
+        stats["pages"] = len(document)
+        stats["characters"] = len(rfp_content)
+        stats["extract_seconds"] = time.perf_counter() - start
+        retrieval_index = RetrievalIndex.for_document(document, rfp_path)
+        stats["index_seconds"] = time.perf_counter() - start - stats["extract_seconds"]
+
+        map_reduce_threshold = int(os.environ.get("RFP_MAP_REDUCE_THRESHOLD", MAP_REDUCE_THRESHOLD_TOKENS))
+        context_mode = os.environ.get("RFP_CONTEXT_MODE", "packed")
+        synthesis_mode = os.environ.get("RFP_SYNTHESIS_MODE", "single")
+        structured_outputs = os.environ.get("RFP_STRUCTURED_OUTPUTS", "0") == "1"
+        # With a rate card, costs are computed locally from the structured delivery phases.
+        rate_card = load_rate_card() if structured_outputs else None
+        semantic_cache = get_semantic_cache()
+        # The RFP text is not part of the run fingerprint: each stage's key includes only the text it reads,
+        # so a revised RFP (e.g. an addendum) re-runs just the stages whose inputs it changes.
+        state = RunState(state_dir, resume=resume, fingerprint={
+            "model": model_name,
+            "context_mode": context_mode,
+            "map_reduce_threshold": map_reduce_threshold,
+        })
+        rfp_hash = hash_value(rfp_content)
+        changed_pages = state.record_revision(document.page_hashes())
+        if changed_pages:
+            logging.info(f"Revision changes pages {describe_pages(changed_pages)} "
+                         f"in sections: {', '.join(changed_sections(document, changed_pages)) or 'none'}")
+        rfp_analyser = RFPanalyser(model_name, map_reduce_threshold=map_reduce_threshold, max_workers=max_workers)
+        logging.info("RFPanalyser initialized.")
+
+        # Downstream agents get a role-specific slice of the RFP (or a cached-context handle) instead of the full text.
+        packer = ContextPacker(rfp_content, mode=context_mode, model_name=model_name,
+                               index=retrieval_index)
+
+        def summarize():
+            logging.info("Calling RFPanalyser to summarize RFP.")
+            rfp_summary = rfp_analyser.summarize_rfp(rfp_content)
+            logging.info(f"RFPanalyser summary received. Length: {len(rfp_summary)} characters.")
+            return rfp_summary
+
+        def analyse(rfp_summary):
+            logging.info("Calling RFPanalyser to analyse RFP and extract key information.")
+            rfp_analysis = rfp_analyser.analyse_rfp(rfp_content, rfp_summary)
+            logging.info(f"RFPanalyser analysis received. Length: {len(rfp_analysis)} characters.")
+            return rfp_analysis
+
+        def identify_assumptions():
+            logging.info("Calling RFPanalyser to identify assumptions.")
+            rfp_assumptions = rfp_analyser.identify_assumptions(rfp_content)
+            logging.info(f"RFPanalyser assumptions received. Length: {len(rfp_assumptions)} characters.")
+            return rfp_assumptions
+
+        def build_team(rfp_summary, rfp_analysis, rfp_assumptions):
+            context = (rfp_summary, rfp_analysis, rfp_assumptions)
+            cached_content = packer.cached_content
+            team = {
+                "presale_manager": PresaleManager(model_name, *context, cached_content=cached_content),
+                "bd_manager": BDManager(model_name, *context, cached_content=cached_content, retrieval_index=retrieval_index),
+                "tech_lead": TechLead(model_name, *context, cached_content=cached_content, retrieval_index=retrieval_index),
+                "sre_lead": SRELead(model_name, *context, cached_content=cached_content, retrieval_index=retrieval_index),
+                "test_lead": TestLead(model_name, *context, cached_content=cached_content, retrieval_index=retrieval_index),
+                "internet_researcher": InternetResearcher(model_name, *context, cached_content=cached_content, retrieval_index=retrieval_index),
+                "delivery_lead": DeliveryLead(model_name, *context, cached_content=cached_content, retrieval_index=retrieval_index),
+            }
+            logging.info("Agents initialized.")
+            return team
+
+        def delivery_plan(team, rfp_summary, rfp_analysis, rfp_assumptions):
+            logging.info("Calling Delivery Lead to create delivery plan.")
+            agent_context = packer.context_for("Delivery Lead")
+            response = team["delivery_lead"].create_delivery_plan(agent_context, rfp_summary, rfp_analysis, rfp_assumptions)
+            return checked_response(team["presale_manager"], "Delivery Lead", response,
+                                    team["delivery_lead"], "provide_detailed_resource_plan", agent_context)
+
+        def tech_response(team, rfp_summary, rfp_analysis, rfp_assumptions):
+            logging.info("Calling Tech Lead to create technical approach.")
+            agent_context = packer.context_for("Tech Lead")
+            response = team["tech_lead"].create_technical_approach(agent_context, rfp_summary, rfp_analysis, rfp_assumptions)
+            return checked_response(team["presale_manager"], "Tech Lead", response,
+                                    team["tech_lead"], "provide_detailed_architecture", agent_context)
+
+        def bd_response(team, delivery_plan, tech_response, rfp_summary, rfp_analysis, rfp_assumptions, delivery_data=None):
+            logging.info("Calling BD Manager to breakdown costs based on delivery plan and technical approach.")
+            agent_context = packer.context_for("BD Manager")
+            if delivery_data is not None and rate_card is not None:
+                # The cost table is computed from the phases and the rate card; the model writes only the narrative.
+                table = cost_table(CostModel(rate_card, delivery_data).cost_items())
+                response = team["bd_manager"].price_delivery_plan(agent_context, table, tech_response, rfp_summary,
+                                                                  rfp_analysis, rfp_assumptions)
+                return checked_response(team["presale_manager"], "BD Manager", response,
+                                        team["bd_manager"], "price_delivery_plan", agent_context,
+                                        cost_table=table, technical_approach=tech_response)
+            if delivery_data is not None:
+                # The phases, resources and dates are all the costing needs from the delivery plan.
+                delivery_plan = describe("phases", delivery_data)
+            response = team["bd_manager"].breakdown_costs(agent_context, delivery_plan, tech_response, rfp_summary, rfp_analysis, rfp_assumptions)
+            return checked_response(team["presale_manager"], "BD Manager", response,
+                                    team["bd_manager"], "provide_detailed_cost_breakdown", agent_context,
+                                    delivery_plan=delivery_plan, technical_approach=tech_response)
+
+        def sre_response(team, rfp_summary, rfp_analysis, rfp_assumptions):
+            logging.info("Calling SRE Lead to create maintenance and support plan.")
+            agent_context = packer.context_for("SRE Lead")
+            response = team["sre_lead"].create_maintenance_support_plan(agent_context, rfp_summary, rfp_analysis, rfp_assumptions)
+            return checked_response(team["presale_manager"], "SRE Lead", response,
+                                    team["sre_lead"], "create_maintenance_support_plan", agent_context)
+
+        def test_response(team, rfp_summary, rfp_analysis, rfp_assumptions):
+            logging.info("Calling Test Lead to create testing approach.")
+            agent_context = packer.context_for("Test Lead")
+            response = team["test_lead"].create_testing_approach(agent_context, rfp_summary, rfp_analysis, rfp_assumptions)
+            return checked_response(team["presale_manager"], "Test Lead", response,
+                                    team["test_lead"], "create_testing_approach", agent_context)
+
+        def research_response(team, rfp_summary, rfp_analysis, rfp_assumptions):
+            logging.info("Calling Internet Researcher to research RFP context.")
+            agent_context = packer.context_for("Internet Researcher")
+            response = team["internet_researcher"].research_rfp_context(agent_context, rfp_summary, rfp_analysis, rfp_assumptions)
+            return checked_response(team["presale_manager"], "Internet Researcher", response,
+                                    team["internet_researcher"], "research_rfp_context", agent_context)
+
+        def final_response(team, delivery_plan, tech_response, bd_response, sre_response, test_response, research_response,
+                           **structured):
+            presale_manager = team["presale_manager"]
+            # Responses are recorded in a fixed order so the final prompt does not depend on task timing.
+            # The summary, analysis and assumptions are already part of the Presale Manager's prompt.
+            presale_manager.receive_response("Delivery Lead", delivery_plan)
+            presale_manager.receive_response("Tech Lead", tech_response)
+            presale_manager.receive_response("BD Manager", bd_response)
+            presale_manager.receive_response("SRE Lead", sre_response)
+            presale_manager.receive_response("Test Lead", test_response)
+            presale_manager.receive_response("Internet Researcher", research_response)
+            for stage, (_, kind, _) in STRUCTURED_STAGES.items():
+                if stage in structured:
+                    presale_manager.receive_structured(kind, structured[stage])
+
+            logging.info(f"Generating final response using Presale Manager ({synthesis_mode} synthesis).")
+            agent_context = packer.context_for("Presale Manager")
+            if synthesis_mode == "sections":
+                response = presale_manager.orchestrate_sections(agent_context, max_workers=max_workers)
+            else:
+                # Stream the proposal to disk as it is generated so partial output is visible straight away.
+                on_chunk = (lambda text: progress("chunk", "final_response", text=text) if text is not None
+                            else progress("reset", "final_response")) if progress else None
+                with stream_to(output_path, on_chunk=on_chunk):
+                    response = presale_manager.orchestrate_responses(agent_context)
+            response = presale_manager.check_fragments(presale_manager, "Presale Manager", response)
+            logging.info(f"Final response generated. Length: {len(response)} characters.")
+            return response
+
+        def structured_data(source, kind, member):
+            def extract(**deps):
+                agent = deps["team"][member] if member else rfp_analyser
+                logging.info(f"Calling {agent.agent_name} to restate its {kind} as structured data.")
+                return agent.extract_structured(kind, deps[source])
+
+            return extract
+
+        def priced_costs(delivery_data, **deps):
+            # The rate card prices the delivery phases directly; the BD Manager's costs are extracted
+            # only if the delivery plan could not be structured.
+            if delivery_data is not None:
+                logging.info("Pricing the delivery phases with the rate card.")
+                return CostModel(rate_card, delivery_data).cost_items()
+            return structured_data(*STRUCTURED_STAGES["cost_data"])(**deps)
+
+        def semantic_stage(stage, func):
+            """
+            Wraps an agent stage with the semantic cache. If a past RFP gave the agent a near-identical
+            input, its response is reused as it is; if a similar one, the agent adapts that response
+            instead of reading its slice of the RFP; otherwise `func` runs. The result is indexed for later RFPs.
+            """
+            agent_name, member, method_name = SEMANTIC_STAGES[stage]
+
+            def run(team, rfp_summary, rfp_analysis, rfp_assumptions):
+                agent_context = packer.context_for(agent_name)
+                # A TextStore is shingled and hashed a page at a time, never decoded whole.
+                text = rfp_content if packer.mode == "cached" else agent_context
+                # Outputs are only reused from the same model on the same backend.
+                model = model_namespace(team[member].model_name)
+                match = semantic_cache.lookup(stage, text, model)
+                if match is not None and match.similarity >= semantic_cache.reuse_threshold:
+                    logging.info(f"Reusing the {agent_name} response written for {match.rfp} ({match.similarity:.0%} similar).")
+                    return match.output
+                if match is None:
+                    response = func(team, rfp_summary, rfp_analysis, rfp_assumptions)
+                else:
+                    response = team["presale_manager"].adapt_response(team[member], agent_name, match)
+                    response = checked_response(team["presale_manager"], agent_name, response,
+                                                team[member], method_name, agent_context)
+                semantic_cache.put(stage, text, response, model, rfp=os.path.basename(rfp_path))
+                return response
+
+            return run if semantic_cache is not None else func
+
+        def context_key(agent_name):
+            # In packed mode an agent reads only its slice of the RFP, so a revision outside that slice
+            # leaves the agent's output valid; in the other modes every agent reads the whole document.
+            return hash_value(packer.context_for(agent_name)) if packer.mode == "packed" else rfp_hash
+
+        # Agent stages are keyed on their own RFP slice and on the agent responses they build on. The
+        # summary, analysis and assumptions are passed to them but left out of their keys, so rewording
+        # caused by an unrelated addendum does not re-run every agent.
+        analysis = ANALYSIS_STAGES
+        responses = ["delivery_plan", "tech_response", "bd_response", "sre_response", "test_response", "research_response"]
+        scheduler = DAGScheduler(max_workers=max_workers, state=state, listener=progress)
+        scheduler.add_task("rfp_summary", summarize, inputs={"rfp": rfp_hash})
+        scheduler.add_task("rfp_analysis", analyse, deps=["rfp_summary"], inputs={"rfp": rfp_hash})
+        scheduler.add_task("rfp_assumptions", identify_assumptions, inputs={"rfp": rfp_hash})
+        scheduler.add_task("team", build_team, deps=analysis, checkpoint=False)
+        scheduler.add_task("delivery_plan", delivery_plan, deps=["team"] + analysis, key_deps=[],
+                           inputs={"rfp": context_key("Delivery Lead")})
+        scheduler.add_task("tech_response", tech_response, deps=["team"] + analysis, key_deps=[],
+                           inputs={"rfp": context_key("Tech Lead")})
+        # With structured outputs the BD Manager costs the validated phases instead of the delivery plan prose,
+        # and the Presale Manager also gets every structured record, with cost totals and Gantt chart computed locally.
+        # The prose stays in the key: it is what the BD Manager costs whenever the phases could not be extracted.
+        plan = ["delivery_plan"] + (["delivery_data"] if structured_outputs else [])
+        costing = {"rate_card": hash_value(rate_card.to_dict())} if rate_card is not None else {}
+        scheduler.add_task("bd_response", bd_response, deps=["team", "tech_response"] + analysis + plan,
+                           key_deps=plan + ["tech_response"], inputs={"rfp": context_key("BD Manager"), **costing})
+        scheduler.add_task("sre_response", semantic_stage("sre_response", sre_response), deps=["team"] + analysis, key_deps=[],
+                           inputs={"rfp": context_key("SRE Lead")})
+        scheduler.add_task("test_response", semantic_stage("test_response", test_response), deps=["team"] + analysis, key_deps=[],
+                           inputs={"rfp": context_key("Test Lead")})
+        scheduler.add_task("research_response", semantic_stage("research_response", research_response), deps=["team"] + analysis, key_deps=[],
+                           inputs={"rfp": context_key("Internet Researcher")})
+        data_stages = list(STRUCTURED_STAGES) if structured_outputs else []
+        for stage in data_stages:
+            source, kind, member = STRUCTURED_STAGES[stage]
+            if stage == "cost_data" and rate_card is not None:
+                scheduler.add_task(stage, priced_costs, deps=[source, "team", "delivery_data"],
+                                   key_deps=[source, "delivery_data"],
+                                   inputs={"schema": hash_value(SCHEMAS[kind].schema), **costing})
+                continue
+            scheduler.add_task(stage, structured_data(source, kind, member), deps=[source] + (["team"] if member else []),
+                               key_deps=[source], inputs={"schema": hash_value(SCHEMAS[kind].schema)})
+        scheduler.add_task("final_response", final_response, deps=["team"] + responses + data_stages,
+                           key_deps=responses + data_stages,
+                           inputs={"synthesis_mode": synthesis_mode, "rfp": context_key("Presale Manager")})
+        results = scheduler.run(targets)
+        stats["stages"] = dict(scheduler.timings)
+        stats["restored"] = list(scheduler.restored)
+
+        if "final_response" in results:
+            # Create the output folder if it doesn't exist
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+            # Write the final response to the Markdown file
+            with open(output_path, "w") as f:
+                f.write(results["final_response"])
+
+            logging.info(f"Final response saved to: {output_path}")
+            data = {}
+            for stage in data_stages:
+                kind = STRUCTURED_STAGES[stage][1]
+                if results.get(stage) is not None:
+                    data[kind] = results[stage].get(kind, results[stage])
+            if data:
+                if "cost_items" in data:
+                    data["cost_summary"] = cost_summary(data["cost_items"])
+                data_path = f"{os.path.splitext(output_path)[0]}.data.json"
+                with open(data_path, "w") as f:
+                    f.write(compact_json(data))
+                logging.info(f"Structured data saved to: {data_path}")
+        if scheduler.restored:
+            logging.info(f"Restored from checkpoint: {', '.join(scheduler.restored)}")
+        logging.info(f"Response cache stats: {get_response_cache().stats()}")
+        logging.info(f"Model registry stats: {get_model_registry().stats()}")
+        logging.info(f"Prompt stats: {prompt_stats()}")
+        if semantic_cache is not None:
+            logging.info(f"Semantic cache stats: {semantic_cache.stats()}")
+        stats["total_seconds"] = time.perf_counter() - start
+        return results
+    finally:
+        # Release the mapped text even when a stage fails, since batch and serve runs share the process.
+        document.close()
+
+def extract_command(args):
+    from utils.pdf_utils import extract_document
+
+    document = extract_document(args.rfp_path)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(document.text)
+        logging.info(f"Extracted {len(document)} pages ({len(document.text)} characters) to {args.output}")
+    else:
+        sys.stdout.write(document.text)
+    if args.index:
+        from utils.retrieval import RetrievalIndex
+
+        RetrievalIndex.for_document(document, args.rfp_path)
+
+def analyse_command(args):
+    analyse_rfp(args.rfp_path, args.output, max_workers=args.workers, resume=args.resume, state_dir=args.state_dir)
+
+def run_command(args):
+    if args.batch:
+        # Legacy form: `main.py --batch DIR_OR_GLOB`.
+        args.inputs = args.batch
+        return batch_command(args)
+    run_pipeline(args.rfp_path, args.output, max_workers=args.workers, resume=args.resume, state_dir=args.state_dir)
+
+def resume_command(args):
+    args.resume = True
+    run_command(args)
+
+def revise_command(args):
+    # Reuse the base RFP's checkpoints; only stages whose part of the RFP changed are re-run.
+    args.state_dir = args.state_dir or default_state_dir(args.base)
+    args.resume = True
+    run_command(args)
+
+def batch_command(args):
+    from utils.batch import BatchRunner, resolve_inputs
+
+    rfp_paths = resolve_inputs(args.inputs)
+    logging.info(f"Batch mode: {len(rfp_paths)} RFP files found for {args.inputs}")
+    runner = BatchRunner(lambda rfp_path, output_path, name: run_pipeline(
+                             rfp_path, output_path, max_workers=args.workers, resume=args.resume,
+                             state_dir=default_state_dir(rfp_path, name)),
+                         output_dir=args.output_dir, max_documents=args.documents)
+    summary = runner.run(rfp_paths)
+    if summary["failed"]:
+        raise SystemExit(1)
+
+def serve_command(args):
+    import asyncio
+    from utils.service import RFPService
+
+    # Import the agents and model SDK now, so the first upload does not pay for it.
+    import agents.presale_manager  # noqa: F401
+    from utils.api_utils import get_model_registry  # noqa: F401
+
+    service = RFPService(lambda rfp_path, output_path, **kwargs: run_pipeline(rfp_path, output_path,
+                                                                              max_workers=args.workers, **kwargs),
+                         work_dir=args.work_dir, max_documents=args.documents, tenant_limit=args.tenant_limit,
+                         max_queued=args.max_queued, job_ttl=args.job_ttl, max_finished=args.max_finished)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logging.info("Service stopped.")
+
+def cost_command(args):
+    import json
+    from utils.cost_model import CostModel, load_rate_card
+
+    rate_card = load_rate_card(args.rate_card)
+    if rate_card is None:
+        raise SystemExit("No rate card found; pass --rate-card or set RFP_RATE_CARD.")
+    with open(args.data_path) as f:
+        phases = json.load(f).get("phases")
+    if not phases:
+        raise SystemExit(f"{args.data_path} has no delivery phases; run with RFP_STRUCTURED_OUTPUTS=1 first.")
+    cost_model = CostModel(rate_card, {"phases": phases})
+    breakdown = cost_model.breakdown()
+    print(f"{'phase':<32} {'personnel':>12} {'infra':>10} {'licences':>10} {'contingency':>12} {'total':>12}")
+    for phase in breakdown["phases"]:
+        print(f"{phase['phase'][:32]:<32} {phase['personnel']:>12,.0f} {phase['infrastructure']:>10,.0f} "
+              f"{phase['licences']:>10,.0f} {phase['contingency']:>12,.0f} {phase['total']:>12,.0f}")
+    print(f"{'Total (' + breakdown['currency'] + ')':<32} {breakdown['total']:>60,.0f}")
+    start = time.perf_counter()
+    what_if = cost_model.what_if(args.scenarios, rate_spread=args.rate_spread, scope_spread=args.scope_spread,
+                                 seed=args.seed)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"\nWhat-if over {args.scenarios} scenarios ({elapsed_ms:.1f} ms): "
+          + ", ".join(f"{name} {value:,.0f}" for name, value in what_if["percentiles"].items()))
+    print("Sensitivity of the total: " + ", ".join(f"{name} {value:+.2f}" for name, value in what_if["sensitivity"].items()))
+
+def check_command(args):
+    from utils.fragments import check_fragments, repair_fragments
+
+    with open(args.path) as f:
+        text = f.read()
+    broken = check_fragments(text)
+    for fragment, errors in broken:
+        line = text.count("\n", 0, fragment.start) + 1
+        print(f"{args.path}:{line}: {fragment.label}: " + "; ".join(errors))
+    if broken and args.fix:
+        text = repair_fragments(text, source=args.path)
+        with open(args.path, "w") as f:
+            f.write(text)
+        broken = check_fragments(text)
+        print(f"Repaired; {len(broken)} fragment(s) still need a manual fix.")
+    if broken:
+        raise SystemExit(1)
+
+def cache_command(args):
+    from utils.response_cache import get_response_cache
+
+    if args.semantic:
+        from utils.semantic_cache import DEFAULT_SEMANTIC_CACHE_PATH, SemanticCache
+
+        cache = SemanticCache(os.environ.get("RFP_SEMANTIC_CACHE_PATH", DEFAULT_SEMANTIC_CACHE_PATH))
+    else:
+        cache = get_response_cache()
+    if args.action == "clear":
+        cache.clear()
+    elif args.action == "evict":
+        cache.evict()
+    print("\n".join(f"{name}: {value}" for name, value in cache.stats().items()))
+
+def parse_args(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ("-h", "--help")):
+        # `main.py [rfp.pdf] [options]` without a command keeps meaning `run`.
+        argv.insert(0, "run")
+
+    parser = argparse.ArgumentParser(description="Generate a technical proposal for one RFP or a batch of RFPs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_rfp_arguments(command, output, output_help):
+        command.add_argument("rfp_path", nargs="?", default="data/rfp.pdf", help="RFP PDF to process.")
+        command.add_argument("--output", default=output, help=output_help)
+
+    def add_pipeline_arguments(command):
+        command.add_argument("--workers", type=int, default=MAX_WORKERS, help="Concurrent agent calls per RFP.")
+        command.add_argument("--resume", action="store_true", help="Reuse checkpointed stages whose inputs are unchanged.")
+
+    def add_state_argument(command):
+        command.add_argument("--state-dir", help="Checkpoint directory for a single RFP (default: .state/<rfp name>).")
+
+    command = commands.add_parser("extract", help="Extract the text of an RFP PDF without calling any model.")
+    add_rfp_arguments(command, None, "Write the text here instead of to standard output.")
+    command.add_argument("--index", action="store_true", help="Also build and save the retrieval index.")
+    command.set_defaults(handler=extract_command)
+
+    command = commands.add_parser("analyse", help="Summarise and analyse an RFP and list its assumptions.")
+    add_rfp_arguments(command, os.path.join("temp", "rfp_analysis.md"), "Where to write the analysis.")
+    add_pipeline_arguments(command)
+    add_state_argument(command)
+    command.set_defaults(handler=analyse_command)
+
+    for name, handler, help_text in [("run", run_command, "Generate the proposal for one RFP."),
+                                     ("resume", resume_command, "Like run, reusing checkpointed stages whose inputs are unchanged.")]:
+        command = commands.add_parser(name, help=help_text)
+        add_rfp_arguments(command, os.path.join("temp", "final_technical_proposal.md"),
+                          "Where to write the proposal for a single RFP.")
+        add_pipeline_arguments(command)
+        add_state_argument(command)
+        command.add_argument("--batch", help=argparse.SUPPRESS)
+        command.add_argument("--output-dir", default="temp", help=argparse.SUPPRESS)
+        command.add_argument("--documents", type=int, default=2, help=argparse.SUPPRESS)
+        command.set_defaults(handler=handler)
+
+    command = commands.add_parser("revise", help="Regenerate the proposal for a revised RFP or addendum, re-running "
+                                                 "only the stages affected by the changed pages.")
+    add_rfp_arguments(command, os.path.join("temp", "final_technical_proposal.md"),
+                      "Where to write the revised proposal.")
+    command.add_argument("--base", required=True, help="The RFP PDF this revision replaces.")
+    command.add_argument("--workers", type=int, default=MAX_WORKERS, help="Concurrent agent calls per RFP.")
+    add_state_argument(command)
+    command.set_defaults(handler=revise_command, batch=None)
+
+    command = commands.add_parser("batch", help="Generate proposals for every RFP PDF in a directory or matching a glob.")
+    command.add_argument("inputs", metavar="DIR_OR_GLOB", help="Directory of RFP PDFs or a glob pattern.")
+    command.add_argument("--output-dir", default="temp", help="Where to write the proposals.")
+    command.add_argument("--documents", type=int, default=2, help="How many RFPs to process at the same time.")
+    add_pipeline_arguments(command)
+    command.set_defaults(handler=batch_command)
+
+    command = commands.add_parser("serve", help="Run a local HTTP service that queues uploaded RFPs and streams "
+                                                "their progress.")
+    command.add_argument("--host", default="127.0.0.1")
+    command.add_argument("--port", type=int, default=8080)
+    command.add_argument("--documents", type=int, default=2, help="How many RFPs to process at the same time.")
+    command.add_argument("--tenant-limit", type=int, default=1, help="How many RFPs one tenant may have running.")
+    command.add_argument("--max-queued", type=int, default=32, help="Queued uploads before new ones are refused.")
+    command.add_argument("--work-dir", default=".service", help="Where uploads, checkpoints and proposals are kept.")
+    command.add_argument("--job-ttl", type=int, default=3600,
+                         help="Seconds a finished job and its proposal are kept before being deleted.")
+    command.add_argument("--max-finished", type=int, default=100, help="Finished jobs kept at most.")
+    command.add_argument("--workers", type=int, default=MAX_WORKERS, help="Concurrent agent calls per RFP.")
+    command.set_defaults(handler=serve_command)
+
+    command = commands.add_parser("cost", help="Price the delivery phases of a structured run with the rate card and "
+                                               "run what-if scenarios, without calling any model.")
+    command.add_argument("data_path", nargs="?", default=os.path.join("temp", "final_technical_proposal.data.json"),
+                         help="Structured data written next to a proposal (<output>.data.json).")
+    command.add_argument("--rate-card", help="Rate card JSON (default: RFP_RATE_CARD or data/rate_card.json).")
+    command.add_argument("--scenarios", type=int, default=5000, help="How many what-if variations to price.")
+    command.add_argument("--rate-spread", type=float, default=0.1, help="Day rates vary by up to this fraction.")
+    command.add_argument("--scope-spread", type=float, default=0.2, help="Phase effort and duration vary by up to this fraction.")
+    command.add_argument("--seed", type=int, default=0)
+    command.set_defaults(handler=cost_command)
+
+    command = commands.add_parser("check", help="Validate the Mermaid diagrams and Markdown tables in a proposal "
+                                                "without calling any model.")
+    command.add_argument("path", nargs="?", default=os.path.join("temp", "final_technical_proposal.md"))
+    command.add_argument("--fix", action="store_true", help="Apply the deterministic repairs in place.")
+    command.set_defaults(handler=check_command)
+
+    command = commands.add_parser("cache", help="Inspect or clean up the response cache.")
+    command.add_argument("action", nargs="?", choices=["stats", "evict", "clear"], default="stats")
+    command.add_argument("--semantic", action="store_true", help="Act on the semantic cache of past RFPs instead.")
+    command.set_defaults(handler=cache_command)
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    args = parse_args(argv)
+    load_dotenv()
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# tests/conftest.py
+import pytest
+
+from utils import backends, rate_limiter, response_cache
+from utils.api_utils import get_model_registry
+from utils.backends import StubBackend
+from utils.rate_limiter import RateLimiter
+from utils.response_cache import ResponseCache
+
+
+@pytest.fixture
+def stub_backend(tmp_path, monkeypatch):
+    """The offline stub backend with no latency, a private response cache and an effectively unlimited quota."""
+    backend = StubBackend(latency="fixed:0", time_scale=0)
+    monkeypatch.setattr(backends, "_backend", backend)
+    monkeypatch.setattr(response_cache, "_cache", ResponseCache(path=str(tmp_path / "responses.sqlite3")))
+    monkeypatch.setattr(rate_limiter, "_limiter", RateLimiter(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9))
+    yield backend
+    get_model_registry().clear()
@@ -0,0 +1,82 @@
+# tests/test_backends.py
+import json
+import random
+
+import pytest
+
+from utils import backends
+from utils.backends import StubAPIError, StubBackend, get_backend, stub_json
+
+
+def test_stub_responses_are_deterministic_per_prompt():
+    model = StubBackend(latency="fixed:0", time_scale=0).create_model("gemini-pro")
+    first = model.generate_content("Summarise the RFP.")
+    assert first.text == model.generate_content("Summarise the RFP.").text
+    assert first.text != model.generate_content("Analyse the RFP.").text
+    assert first.text.startswith("## Stub response (gemini-pro)")
+    assert first.usage_metadata.prompt_token_count > 0 and first.usage_metadata.candidates_token_count > 0
+
+
+def test_streamed_stub_response_matches_the_whole_response():
+    backend = StubBackend(latency="fixed:0", time_scale=0)
+    model = backend.create_model("gemini-pro")
+    stream = model.generate_content("Summarise the RFP.", stream=True)
+    chunks = [chunk.text for chunk in stream]
+    assert len(chunks) > 1
+    assert "".join(chunks) == model.generate_content("Summarise the RFP.").text
+    assert backend.calls == 2
+
+
+@pytest.mark.parametrize("latency, low, high", [
+    ("fixed:0.5", 0.5, 0.5), ("uniform:0.2,0.4", 0.2, 0.4), ("normal:1,0.1", 0.0, 2.0), ("lognormal:0,0.25", 0.0, 5.0),
+])
+def test_latency_follows_the_configured_distribution_and_time_scale(latency, low, high):
+    backend = StubBackend(latency=latency, time_scale=0.01)
+    samples = [backend.sample_latency() for _ in range(200)]
+    assert all(low * 0.01 <= sample <= high * 0.01 for sample in samples)
+
+
+def test_injected_errors_use_the_configured_codes():
+    backend = StubBackend(latency="fixed:0", time_scale=0, error_rate=1.0, error_codes=[503])
+    with pytest.raises(StubAPIError) as error:
+        backend.create_model("gemini-pro").generate_content("Summarise the RFP.")
+    assert error.value.code == 503
+    assert StubBackend(error_rate=0.0).sample_error() is None
+    assert "retry in 1s" in str(StubBackend(error_rate=1.0, error_codes=[429]).sample_error())
+
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "phases": {"type": "array", "items": {"type": "object", "properties": {
+            "status": {"type": "string", "enum": ["planned", "active"]},
+            "start": {"type": "string", "description": "Start date, YYYY-MM-DD."},
+            "days": {"type": "integer"},
+        }}},
+    },
+}
+
+
+def test_schema_responses_match_the_schema_with_increasing_dates():
+    phases = stub_json(SCHEMA, random.Random(1))["phases"]
+    assert 2 <= len(phases) <= 4
+    assert all(phase["status"] in ("planned", "active") and isinstance(phase["days"], int) for phase in phases)
+    starts = [phase["start"] for phase in phases]
+    assert starts == sorted(starts) and len(set(starts)) == len(starts)
+    model = StubBackend(latency="fixed:0", time_scale=0).create_model("gemini-pro", generation_config={"response_schema": SCHEMA})
+    assert json.loads(model.generate_content("Extract the phases.").text) == json.loads(
+        model.generate_content("Extract the phases.").text)
+
+
+def test_backend_is_chosen_from_the_environment(monkeypatch):
+    monkeypatch.setattr(backends, "_backend", None)
+    monkeypatch.setenv("RFP_MODEL_BACKEND", "stub")
+    monkeypatch.setenv("RFP_STUB_LATENCY", "uniform:1,2")
+    monkeypatch.setenv("RFP_STUB_ERROR_CODES", "500")
+    backend = get_backend()
+    assert isinstance(backend, StubBackend) and backend is get_backend()
+    assert (backend.distribution, backend.params, backend.error_codes) == ("uniform", [1.0, 2.0], [500])
+    monkeypatch.setattr(backends, "_backend", None)
+    monkeypatch.setenv("RFP_MODEL_BACKEND", "openai")
+    with pytest.raises(ValueError):
+        get_backend()
@@ -0,0 +1,59 @@
+# tests/test_batch.py
+import os
+import threading
+
+from main import default_state_dir
+from utils.batch import BatchRunner, batch_root, document_name, output_path_for, resolve_inputs
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+    return str(path)
+
+
+def test_inputs_resolve_from_a_directory_or_a_glob(tmp_path):
+    first, second = touch(tmp_path / "b.pdf"), touch(tmp_path / "a.PDF")
+    nested = touch(tmp_path / "lot2" / "rfp.pdf")
+    touch(tmp_path / "notes.txt")
+    assert resolve_inputs(str(tmp_path)) == sorted([first, second])
+    assert resolve_inputs(str(tmp_path / "**" / "*.pdf")) == sorted([first, nested])
+
+
+def test_documents_with_the_same_file_name_get_distinct_names_and_state(tmp_path):
+    paths = [touch(tmp_path / "lot1" / "rfp.pdf"), touch(tmp_path / "lot2" / "rfp.pdf")]
+    root = batch_root(paths)
+    assert root == str(tmp_path)
+    names = [document_name(path, root) for path in paths]
+    assert names == [os.path.join("lot1", "rfp"), os.path.join("lot2", "rfp")]
+    assert len({output_path_for(path, "out", root) for path in paths}) == 2
+    assert len({default_state_dir(path, name) for path, name in zip(paths, names)}) == 2
+
+
+def test_a_single_directory_batch_names_documents_by_file_stem(tmp_path):
+    paths = [touch(tmp_path / "tender.pdf"), touch(tmp_path / "renewal.pdf")]
+    root = batch_root(paths)
+    assert [document_name(path, root) for path in paths] == ["tender", "renewal"]
+    assert output_path_for(paths[0], "out", root) == os.path.join("out", "tender_technical_proposal.md")
+    assert default_state_dir(paths[0]) == os.path.join(".state", "tender")
+    assert batch_root([]) == "."
+
+
+def test_documents_overlap_and_a_failure_does_not_stop_the_batch(tmp_path):
+    paths = [touch(tmp_path / f"rfp{index}.pdf") for index in range(4)]
+    both_running = threading.Barrier(2, timeout=5)
+    calls = []
+
+    def pipeline(rfp_path, output_path, name):
+        calls.append((name, output_path))
+        if name in ("rfp0", "rfp1"):
+            # The first two documents only finish once they have run side by side.
+            both_running.wait()
+        if name == "rfp2":
+            raise RuntimeError("unreadable PDF")
+
+    summary = BatchRunner(pipeline, output_dir="out", max_documents=2).run(paths)
+    assert sorted(calls) == [(f"rfp{index}", os.path.join("out", f"rfp{index}_technical_proposal.md")) for index in range(4)]
+    assert summary["documents"] == 4 and summary["completed"] == 3
+    assert summary["failed"] == [paths[2]]
+    assert set(summary["durations"]) == {paths[0], paths[1], paths[3]}
@@ -0,0 +1,78 @@
+# tests/test_checkpoint.py
+import json
+import os
+
+import pytest
+
+from utils.checkpoint import MISSING, RunState, atomic_write, hash_value
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = str(tmp_path / "nested" / "stage.json")
+    atomic_write(path, "first")
+    atomic_write(path, "second")
+    with open(path) as f:
+        assert f.read() == "second"
+    assert os.listdir(tmp_path / "nested") == ["stage.json"]
+
+
+def test_failed_atomic_write_keeps_the_old_file(tmp_path):
+    path = str(tmp_path / "stage.json")
+    atomic_write(path, "old")
+    with pytest.raises(TypeError):
+        atomic_write(path, object())
+    with open(path) as f:
+        assert f.read() == "old"
+    assert os.listdir(tmp_path) == ["stage.json"]
+
+
+def test_hash_value_ignores_key_order():
+    assert hash_value({"a": 1, "b": [1, 2]}) == hash_value({"b": [1, 2], "a": 1})
+    assert hash_value({"a": 1}) != hash_value({"a": 2})
+
+
+def test_saved_stage_is_loaded_only_when_resuming_with_the_same_inputs(tmp_path):
+    state = RunState(str(tmp_path), fingerprint={"model": "gemini-pro"})
+    key = state.input_hash("summary", {"extract": "abc"})
+    state.save("summary", key, {"text": "summary"})
+    assert state.load("summary", key) is MISSING
+
+    resumed = RunState(str(tmp_path), fingerprint={"model": "gemini-pro"}, resume=True)
+    assert resumed.load("summary", key) == {"text": "summary"}
+    assert resumed.load("summary", resumed.input_hash("summary", {"extract": "abd"})) is MISSING
+    assert resumed.load("analysis", key) is MISSING
+
+
+def test_input_hash_covers_the_run_fingerprint(tmp_path):
+    inputs = {"extract": "abc"}
+    first = RunState(str(tmp_path / "a"), fingerprint={"model": "gemini-pro"}).input_hash("summary", inputs)
+    second = RunState(str(tmp_path / "b"), fingerprint={"model": "gemini-1.5-pro"}).input_hash("summary", inputs)
+    assert first != second
+
+
+def test_unreadable_checkpoint_is_missing(tmp_path):
+    state = RunState(str(tmp_path), resume=True)
+    with open(tmp_path / "summary.json", "w") as f:
+        f.write('{"stage": "summ')
+    assert state.load("summary", "key") is MISSING
+
+
+def test_first_revision_has_no_previous_pages(tmp_path):
+    state = RunState(str(tmp_path))
+    assert state.record_revision(["a", "b", "c"]) is None
+    with open(tmp_path / "pages.json") as f:
+        assert json.load(f) == {"pages": ["a", "b", "c"]}
+
+
+@pytest.mark.parametrize("previous, current, changed", [
+    (["a", "b", "c"], ["a", "b", "c"], []),
+    (["a", "b", "c"], ["a", "x", "c"], [1]),
+    # An inserted page shifts the later pages without marking them as changed.
+    (["a", "b", "c", "d"], ["a", "new", "b", "c", "d"], [1]),
+    (["a", "b", "c", "d"], ["a", "c", "d"], []),
+    (["a", "b"], ["a", "b", "c", "d"], [2, 3]),
+])
+def test_record_revision_aligns_pages_by_content(tmp_path, previous, current, changed):
+    state = RunState(str(tmp_path))
+    state.record_revision(previous)
+    assert state.record_revision(current) == changed
@@ -0,0 +1,47 @@
+# tests/test_chunking.py
+from utils.chunking import CHARS_PER_TOKEN, chunk_spans, split_sections
+
+SECTIONS = [
+    "1. Introduction\n" + "The Ministry invites proposals for a cloud migration.\n" * 3,
+    "2. Scope of Work\n" + "Workloads move to the Muscat region in three waves.\n" * 4,
+    "ANNEX A Pricing Schedule\n" + "Unit rates are quoted in OMR.\n" * 2,
+]
+TEXT = "Issued by the Ministry of Transport.\n" + "".join(SECTIONS)
+
+
+def section_starts(text):
+    return {section.start for section in split_sections(text)}
+
+
+def test_sections_start_at_headings_with_a_preamble_before_the_first():
+    sections = split_sections(TEXT)
+    assert [section.title for section in sections] == [
+        "Preamble", "1. Introduction", "2. Scope of Work", "ANNEX A Pricing Schedule"]
+    assert sections[0].start == 0 and sections[-1].end == len(TEXT)
+    assert all(section.end == following.start for section, following in zip(sections, sections[1:]))
+    assert sections[2].text == SECTIONS[1]
+
+
+def test_chunks_are_contiguous_and_fall_on_section_boundaries():
+    max_tokens = 70
+    spans = chunk_spans(TEXT, max_tokens)
+    assert len(spans) > 1
+    assert spans[0][0] == 0 and spans[-1][1] == len(TEXT)
+    assert all(end == following_start for (_, end), (following_start, _) in zip(spans, spans[1:]))
+    assert all(end - start <= max_tokens * CHARS_PER_TOKEN for start, end in spans)
+    # Every section fits the budget, so no section is split.
+    assert {start for start, _ in spans} <= section_starts(TEXT)
+
+
+def test_small_sections_share_a_chunk():
+    assert chunk_spans(TEXT, len(TEXT)) == [(0, len(TEXT))]
+
+
+def test_oversized_section_is_split_at_line_boundaries():
+    text = "1. Requirements\n" + "".join(f"Requirement {index} must be met in full.\n" for index in range(40))
+    max_tokens = 50
+    spans = chunk_spans(text, max_tokens)
+    assert len(spans) > 1
+    assert "".join(text[start:end] for start, end in spans) == text
+    assert all(end - start <= max_tokens * CHARS_PER_TOKEN for start, end in spans)
+    assert all(text[end - 1] == "\n" for _, end in spans)
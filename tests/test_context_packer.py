@@ -0,0 +1,81 @@
+# tests/test_context_packer.py
+from types import SimpleNamespace
+
+from utils.chunking import estimate_tokens, split_sections
+from utils.context_packer import CACHED_CONTEXT_NOTE, OMITTED_MARKER, ContextPacker
+from utils.response_cache import cached_content_key
+from utils.retrieval import RetrievalIndex
+
+SECTIONS = {
+    "Introduction": "The Ministry of Transport invites proposals for its new citizen portal.\n" * 8,
+    "Technical Architecture": "The platform runs on cloud infrastructure with API integration and a managed database.\n" * 8,
+    "Commercial Terms": "Pricing is a fixed fee per milestone; payment is due within thirty days of invoice.\n" * 8,
+    "Service Levels": "The SLA requires 99.9% availability and incident response within one hour.\n" * 8,
+    "Testing and Acceptance": "User acceptance testing and performance testing precede sign-off.\n" * 8,
+}
+DOCUMENT = "".join(f"{number}. {title}\n{body}" for number, (title, body) in enumerate(SECTIONS.items(), start=1))
+# Room for any one section but not two.
+SECTION_TOKENS = max(estimate_tokens(section.text) for section in split_sections(DOCUMENT)) + 10
+
+
+class CachingBackend:
+    def __init__(self):
+        self.uploads = []
+
+    def create_cached_content(self, model_name, contents, ttl):
+        self.uploads.append((model_name, contents))
+        return SimpleNamespace(name=f"cachedContents/{len(self.uploads)}")
+
+
+def packed_titles(context):
+    return [title for title in SECTIONS if title in context]
+
+
+def test_full_mode_and_documents_within_budget_are_passed_whole():
+    assert ContextPacker(DOCUMENT, mode="full").context_for("BD Manager") == DOCUMENT
+    assert ContextPacker(DOCUMENT, budgets={"BD Manager": estimate_tokens(DOCUMENT)}).context_for("BD Manager") == DOCUMENT
+
+
+def test_each_agent_receives_its_most_relevant_sections_within_budget():
+    packer = ContextPacker(DOCUMENT)
+    for agent_name, title in [("BD Manager", "Commercial Terms"), ("SRE Lead", "Service Levels"),
+                              ("Test Lead", "Testing and Acceptance"), ("Tech Lead", "Technical Architecture")]:
+        context = packer.pack(agent_name, budget_tokens=SECTION_TOKENS)
+        assert packed_titles(context) == [title]
+        assert estimate_tokens(context) <= SECTION_TOKENS
+
+
+def test_packed_sections_keep_document_order_and_mark_gaps():
+    packer = ContextPacker(DOCUMENT, budgets={"SRE Lead": 2 * SECTION_TOKENS})
+    context = packer.context_for("SRE Lead")
+    titles = packed_titles(context)
+    assert len(titles) == 2 and "Service Levels" in titles
+    assert titles == sorted(titles, key=list(SECTIONS).index)
+    first, second = (list(SECTIONS).index(title) for title in titles)
+    assert (OMITTED_MARKER in context) == (second != first + 1)
+
+
+def test_retrieval_index_ranking_replaces_keyword_density():
+    index = RetrievalIndex.build(DOCUMENT, with_vectors=False)
+    context = ContextPacker(DOCUMENT, index=index).pack("BD Manager", budget_tokens=SECTION_TOKENS)
+    assert "Pricing is a fixed fee" in context
+    assert estimate_tokens(context) <= SECTION_TOKENS
+
+
+def test_cached_mode_uploads_the_document_once_and_refers_to_it(stub_backend, monkeypatch):
+    from utils import backends
+
+    backend = CachingBackend()
+    monkeypatch.setattr(backends, "_backend", backend)
+    packer = ContextPacker(DOCUMENT, mode="cached", model_name="gemini-1.5-pro")
+    assert packer.mode == "cached"
+    assert backend.uploads == [("gemini-1.5-pro", [DOCUMENT])]
+    assert packer.context_for("Tech Lead") == packer.context_for("BD Manager") == CACHED_CONTEXT_NOTE
+    # The response cache keys calls made with the handle on the document, not on the per-upload name.
+    assert cached_content_key(packer.cached_content) != packer.cached_content.name
+
+
+def test_cached_mode_falls_back_to_packing_without_context_caching(stub_backend):
+    packer = ContextPacker(DOCUMENT, mode="cached", model_name="gemini-pro", budgets={"BD Manager": SECTION_TOKENS})
+    assert packer.mode == "packed" and packer.cached_content is None
+    assert packed_titles(packer.context_for("BD Manager")) == ["Commercial Terms"]
@@ -0,0 +1,102 @@
+# tests/test_cost_model.py
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.cost_model import CostModel, RateCard, load_rate_card  # noqa: E402
+from utils.structured import SCHEMAS, cost_summary, cost_table, describe  # noqa: E402
+
+RATE_CARD = RateCard(
+    "OMR",
+    [{"name": "Architect", "day_rate": 500, "match": ["architect"]},
+     {"name": "Engineer", "day_rate": 300, "match": ["engineer", "developer"]}],
+    default_day_rate=200,
+    infrastructure=[{"item": "Cloud environments", "monthly": 1000}],
+    licences=[{"item": "Monitoring", "monthly": 100, "monthly_per_person": 10}],
+    contingency_percent=10,
+)
+
+PHASES = {
+    "phases": [
+        # 30 days is quoted as 0.99 months and 58 days as 1.91.
+        {"name": "Design", "start": "2025-01-01", "end": "2025-01-31",
+         "resources": [{"role": "Lead Architect", "count": 1, "days": 20}]},
+        {"name": "Build", "start": "2025-02-01", "end": "2025-03-31",
+         "resources": [{"role": "Senior Developer", "count": 2, "days": 30},
+                       {"role": "Project Coordinator", "count": 1, "days": 10}]},
+    ],
+}
+
+
+def test_roles_map_to_the_first_matching_rate_card_role():
+    assert RATE_CARD.role_index("Lead Solution Architect") == 0
+    assert RATE_CARD.role_index("Cloud Engineer") == 1
+    assert RATE_CARD.role_index("Project Coordinator") == 2
+    assert RATE_CARD.role_names[2] == "Other"
+
+
+def test_breakdown_prices_each_phase():
+    breakdown = CostModel(RATE_CARD, PHASES).breakdown()
+    design, build = breakdown["phases"]
+    assert design == {"phase": "Design", "personnel": 10000.0, "infrastructure": 990.0, "licences": 108.9,
+                      "contingency": 1109.89, "total": 12208.79}
+    # 60 developer days at the engineer rate and 10 coordinator days at the default rate; three people licensed.
+    assert build == {"phase": "Build", "personnel": 20000.0, "infrastructure": 1910.0, "licences": 248.3,
+                     "contingency": 2215.83, "total": 24374.13}
+    assert breakdown["total"] == pytest.approx(36582.92)
+    assert breakdown["currency"] == "OMR"
+
+
+def test_cost_items_add_up_to_the_breakdown():
+    model = CostModel(RATE_CARD, PHASES)
+    items = SCHEMAS["cost_items"].validate(model.cost_items())
+    summary = cost_summary(items)
+    assert summary["total"] == pytest.approx(model.breakdown()["total"], abs=0.02)
+    assert summary["by_phase"]["Design"] == pytest.approx(12208.79, abs=0.01)
+    personnel = {(item["phase"], item["item"]): item["quantity"] for item in items["items"] if item["category"] == "personnel"}
+    assert personnel == {("Design", "Architect"): 20, ("Build", "Engineer"): 60, ("Build", "Other"): 10}
+
+
+def test_scenarios_are_priced_together():
+    model = CostModel(RATE_CARD, PHASES)
+    result = model.evaluate(rate_factors=[[1, 1, 1], [2, 2, 2]], scope_factors=[[1, 1], [1, 0.5]],
+                            infrastructure_factors=[1, 0], contingency_percent=[10, 0])
+    assert result["total"][0] == pytest.approx(model.breakdown()["total"], abs=0.02)
+    assert result["personnel"][1].tolist() == pytest.approx([20000.0, 20000.0])
+    assert result["infrastructure"][1].tolist() == [0.0, 0.0]
+    assert result["total"][1] == pytest.approx(40000.0)
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_what_if_without_spread_matches_the_base_price():
+    what_if = CostModel(RATE_CARD, PHASES).what_if(200, rate_spread=0, scope_spread=0, infrastructure_spread=0,
+                                                   contingency_range=(10, 10))
+    assert what_if["base"] == pytest.approx(36582.92)
+    assert list(what_if["percentiles"].values()) == pytest.approx([36582.92] * 3, abs=0.02)
+
+
+def test_what_if_percentiles_and_sensitivity():
+    model = CostModel(RATE_CARD, PHASES)
+    what_if = model.what_if(2000, seed=1)
+    p10, p50, p90 = (what_if["percentiles"][name] for name in ("p10", "p50", "p90"))
+    assert p10 < p50 < p90
+    assert p10 < what_if["base"] < p90
+    assert what_if == model.what_if(2000, seed=1)
+    # Scope varies the most (±20%) and scales every cost, so it moves the total most.
+    assert max(what_if["sensitivity"], key=what_if["sensitivity"].get) == "scope"
+
+
+def test_prompt_block_does_not_credit_the_rate_card_table_to_the_bd_manager():
+    items = CostModel(RATE_CARD, PHASES).cost_items()
+    block = describe("cost_items", items)
+    assert cost_table(items) in block
+    assert "BD Manager" not in block
+
+
+def test_shipped_rate_card_loads(tmp_path):
+    card = load_rate_card(os.path.join(os.path.dirname(__file__), "..", "data", "rate_card.json"))
+    assert card.currency == "OMR"
+    assert len(card.day_rates) == len(card.roles) + 1
+    assert load_rate_card(str(tmp_path / "rate_card.json")) is None
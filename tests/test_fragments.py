@@ -0,0 +1,134 @@
+# tests/test_fragments.py
+from utils.fragments import (
+    check_fragments, extract_fragments, repair_fragments, repair_mermaid, repair_table, validate_mermaid, validate_table,
+)
+
+BROKEN_FLOWCHART = """graph
+    A[Client (web)] -> B[Landing Zone]
+    subgraph Cloud
+    B --> C{Is “ready”?}"""
+
+BROKEN_GANTT = """gantt
+    title Plan
+    dateFormat YYYY-MM-DD
+    section Phases
+    Design: Review :d1, 2025/1/6, 30d
+    Build :d2, after d1, 60d"""
+
+BROKEN_TABLE = """Item | Cost
+| A | 1 |
+| B |
+|---|---|
+| C | 3 | |"""
+
+
+def test_fragments_are_found_in_order_and_tables_in_code_skipped():
+    text = ("Intro\n\n| A | B |\n|---|---|\n| 1 | 2 |\n\n```mermaid\ngraph TD\n    A --> B\n```\n\n"
+            "```\nflowchart LR\n    X --> Y\n```\n\n```python\nrow = '| a | b |'\nrule = '|---|---|'\n```\n")
+    fragments = extract_fragments(text)
+    assert [fragment.kind for fragment in fragments] == ["table", "mermaid", "mermaid"]
+    assert fragments[0].text == "| A | B |\n|---|---|\n| 1 | 2 |"
+    assert fragments[2].text == "flowchart LR\n    X --> Y"
+    assert text[fragments[1].start:fragments[1].end] == "```mermaid\ngraph TD\n    A --> B\n```"
+    assert check_fragments(text) == []
+
+
+def test_flowchart_mistakes_are_found():
+    assert validate_mermaid(BROKEN_FLOWCHART) == [
+        "1 block(s) are not closed with 'end'",
+        "'graph' must be followed by a direction (TB, TD, BT, RL, LR)",
+        "line 2 uses '->' instead of '-->': A[Client (web)] -> B[Landing Zone]",
+        "line 2 has a label with special characters that needs quotes: A[Client (web)]",
+    ]
+
+
+def test_flowchart_is_repaired():
+    repaired = repair_mermaid(BROKEN_FLOWCHART)
+    assert repaired == ('graph TD\n'
+                        '    A["Client (web)"] --> B[Landing Zone]\n'
+                        '    subgraph Cloud\n'
+                        '    B --> C{"Is #quot;ready#quot;?"}\n'
+                        'end')
+    assert validate_mermaid(repaired) == []
+
+
+def test_diagram_keyword_case_is_repaired():
+    assert validate_mermaid("Graph LR\n  A --> B") == ["the diagram type must be written 'graph'"]
+    assert repair_mermaid("Graph LR\n  A --> B") == "graph LR\n  A --> B"
+    assert validate_mermaid("diagram\n  A --> B") == ["'diagram' is not a Mermaid diagram type"]
+    assert validate_mermaid("") == ["the diagram is empty"]
+
+
+def test_gantt_dates_and_task_names_are_repaired():
+    assert validate_mermaid(BROKEN_GANTT) == [
+        "line 5 has a ':' in the task name: Design: Review :d1, 2025/1/6, 30d",
+        "line 5 has an invalid date '2025/1/6' (expected YYYY-MM-DD)",
+    ]
+    repaired = repair_mermaid(BROKEN_GANTT)
+    assert "    Design - Review :d1, 2025-01-06, 30d" in repaired.splitlines()
+    assert validate_mermaid(repaired) == []
+    assert validate_mermaid("gantt\n    Build :d1, 2025-02-30, 5d") == [
+        "line 2 has an invalid date '2025-02-30' (expected YYYY-MM-DD)"]
+
+
+def test_sequence_message_without_text_is_not_repairable():
+    diagram = "sequenceDiagram\n    Client->>API\n    API-->>Client: ok"
+    assert validate_mermaid(diagram) == ["line 2 is a message without ': text': Client->>API"]
+    assert validate_mermaid(repair_mermaid(diagram)) == validate_mermaid(diagram)
+
+
+def test_table_is_repaired():
+    assert validate_table(BROKEN_TABLE) == ["the header row is not followed by a separator row such as |---|---|"]
+    assert validate_table("| A | B |\n|---|---|\n| 1 |\n|---|---|") == [
+        "row 3 has 1 cells, the header 2", "row 4 is a second separator row"]
+    repaired = repair_table(BROKEN_TABLE)
+    assert repaired == "| Item | Cost |\n| --- | --- |\n| A | 1 |\n| B |  |\n| C | 3 |"
+    assert validate_table(repaired) == []
+
+
+def test_pipes_in_code_spans_do_not_split_cells():
+    assert validate_table("| Command | Purpose |\n|---|---|\n| `a | b` | pipe |") == []
+
+
+def test_response_is_repaired_in_place():
+    text = f"Before\n\n```mermaid\n{BROKEN_FLOWCHART}\n```\n\nBetween\n\n{BROKEN_TABLE}\n\nAfter"
+    repaired = repair_fragments(text)
+    assert repaired.startswith("Before\n\n```mermaid\ngraph TD\n")
+    assert "\n\nBetween\n\n| Item | Cost |\n| --- | --- |" in repaired
+    assert repaired.endswith("| C | 3 |\n\nAfter")
+    assert check_fragments(repaired) == []
+
+
+def test_fragment_still_broken_is_regenerated():
+    text = "Flow:\n\n```mermaid\nsequenceDiagram\n    Client->>API\n```\n"
+    requests = []
+
+    def regenerate(fragment, errors):
+        requests.append(errors)
+        return "```mermaid\nsequenceDiagram\n    Client->>API: request\n```"
+
+    repaired = repair_fragments(text, regenerate=regenerate)
+    assert requests == [["line 2 is a message without ': text': Client->>API"]]
+    assert repaired == "Flow:\n\n```mermaid\nsequenceDiagram\n    Client->>API: request\n```\n"
+
+
+def test_unusable_regeneration_leaves_the_fragment_as_it_was():
+    text = "```mermaid\nsequenceDiagram\n    Client->>API\n```"
+    assert repair_fragments(text, regenerate=lambda fragment, errors: "no diagram, sorry") == text
+
+    def fail(fragment, errors):
+        raise RuntimeError("quota")
+
+    assert repair_fragments(text, regenerate=fail) == text
+
+
+def test_regenerations_are_capped():
+    broken = "```mermaid\nsequenceDiagram\n    Client->>API\n```"
+    calls = []
+
+    def regenerate(fragment, errors):
+        calls.append(fragment)
+        return "```mermaid\nsequenceDiagram\n    Client->>API: request\n```"
+
+    repair_fragments("\n\n".join([broken] * 5), regenerate=regenerate, max_regenerations=2)
+    assert len(calls) == 2
@@ -0,0 +1,53 @@
+# tests/test_model_registry.py
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import backends
+from utils.api_utils import get_model, get_model_registry, model_namespace
+from utils.backends import StubBackend
+
+
+class CountingBackend(StubBackend):
+    def __init__(self):
+        super().__init__(latency="fixed:0", time_scale=0)
+        self.created = 0
+
+    def create_model(self, model_name, generation_config=None, cached_content=None):
+        self.created += 1
+        return super().create_model(model_name, generation_config, cached_content)
+
+
+def test_agents_asking_for_the_same_model_share_one(stub_backend):
+    registry = get_model_registry()
+    before = registry.stats()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        models = list(executor.map(lambda _: get_model("gemini-pro", {"temperature": 0.2}), range(16)))
+    assert all(model is models[0] for model in models)
+    assert get_model("gemini-pro", {"temperature": 0.2}) is models[0]
+    after = registry.stats()
+    assert after["models"] == 1
+    assert (after["created"] - before["created"], after["reused"] - before["reused"]) == (1, 16)
+
+
+def test_model_name_config_and_backend_each_get_their_own_model(stub_backend, monkeypatch):
+    model = get_model("gemini-pro")
+    assert get_model("gemini-1.5-flash") is not model
+    assert get_model("gemini-pro", {"temperature": 0}) is not model
+    # Config key order does not matter.
+    assert get_model("gemini-pro", {"temperature": 0, "top_p": 1}) is get_model("gemini-pro", {"top_p": 1, "temperature": 0})
+    monkeypatch.setattr(backends, "_backend", StubBackend(latency="fixed:0", time_scale=0))
+    assert get_model("gemini-pro") is not model
+
+
+def test_backend_model_is_created_on_first_call(stub_backend, monkeypatch):
+    backend = CountingBackend()
+    monkeypatch.setattr(backends, "_backend", backend)
+    model = get_model("gemini-pro")
+    assert backend.created == 0
+    model.generate_content("Summarise the RFP.")
+    model.generate_content("Analyse the RFP.")
+    assert backend.created == 1 and backend.calls == 2
+
+
+def test_only_gemini_models_are_named_without_their_backend(stub_backend):
+    assert model_namespace("gemini-pro") == "stub:gemini-pro"
+    assert model_namespace("gemini-pro", backends.GeminiBackend()) == "gemini-pro"
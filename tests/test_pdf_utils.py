@@ -0,0 +1,73 @@
+# tests/test_pdf_utils.py
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from utils import pdf_utils
+from utils.pdf_utils import PAGE_SEPARATOR, PARALLEL_MIN_PAGES, ExtractedDocument, extract_document, iter_pages
+
+PAGES = PARALLEL_MIN_PAGES + 8
+
+
+@pytest.fixture(scope="module")
+def pdf_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("pdf") / "rfp.pdf")
+    write_synthetic_pdf(path, PAGES, seed=1)
+    return path
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    """Records the worker counts of the process pools extraction starts."""
+    started = []
+
+    class RecordingPool(ProcessPoolExecutor):
+        def __init__(self, max_workers=None):
+            started.append(max_workers)
+            super().__init__(max_workers=max_workers)
+
+    monkeypatch.setattr(pdf_utils, "ProcessPoolExecutor", RecordingPool)
+    return started
+
+
+def test_parallel_extraction_keeps_pages_in_order(pdf_path, pools):
+    pages = list(pdf_utils.iter_pages_parallel(pdf_path, max_workers=2, batch_size=7))
+    assert pools == [2]
+    assert pages == list(iter_pages(pdf_path))
+    assert len(pages) == PAGES and pages[0].startswith("1. Introduction")
+
+
+def test_small_documents_and_a_single_worker_stay_in_process(tmp_path, pdf_path, pools):
+    small = str(tmp_path / "small.pdf")
+    write_synthetic_pdf(small, PARALLEL_MIN_PAGES - 1)
+    assert len(list(pdf_utils.iter_pages_parallel(small, max_workers=2))) == PARALLEL_MIN_PAGES - 1
+    assert len(list(pdf_utils.iter_pages_parallel(pdf_path, max_workers=1))) == PAGES
+    assert pools == []
+
+
+def test_page_offsets_map_back_to_pages(pdf_path):
+    document = extract_document(pdf_path, max_workers=2)
+    pages = list(iter_pages(pdf_path))
+    assert document.text == PAGE_SEPARATOR.join(pages)
+    assert [document.page_text(page_num) for page_num in range(len(document))] == pages
+    start, end = document.page_span(5)
+    assert document.page_at(start) == 5 and document.page_at(end - 1) == 5
+    assert document.page_at(end + len(PAGE_SEPARATOR)) == 6
+
+
+def test_mapped_extraction_matches_the_in_memory_document(tmp_path, pdf_path):
+    document = extract_document(pdf_path, max_workers=2)
+    mapped = extract_document(pdf_path, max_workers=2, store_path=str(tmp_path / "rfp.txt"))
+    try:
+        assert str(mapped.text) == document.text
+        assert mapped.page_offsets == document.page_offsets
+        assert mapped.page_hashes() == document.page_hashes()
+    finally:
+        mapped.close()
+
+
+def test_empty_pages_keep_their_place():
+    document = ExtractedDocument(["First page", "", "Third page"])
+    assert document.page_offsets == [0, 11, 12]
+    assert document.page_text(1) == "" and document.page_text(2) == "Third page"
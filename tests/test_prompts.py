@@ -0,0 +1,60 @@
+# tests/test_prompts.py
+import pytest
+
+from agents.sre_lead import MAINTENANCE_SUPPORT_PLAN
+from agents.tech_lead import TECHNICAL_APPROACH
+from utils import prompts
+from utils.chunking import estimate_tokens
+from utils.prompts import AGENT_CONTEXT, PromptStats, PromptTemplate
+
+CONTEXT = {"rfp_summary": "A cloud migration.", "rfp_analysis": "Three workloads.", "rfp_assumptions": "None."}
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = PromptStats()
+    monkeypatch.setattr(prompts, "_stats", stats)
+    return stats
+
+
+def test_template_is_dedented_and_filled(stats):
+    template = PromptTemplate("test.reply", """
+        Reply to {client} about {topic}.
+        Use JSON: {{"topic": "{topic}"}}
+        """)
+    assert template.fields == ("client", "topic")
+    assert template.render(client="the Ministry", topic="SLAs", unused=1) == (
+        'Reply to the Ministry about SLAs.\nUse JSON: {"topic": "SLAs"}')
+
+
+def test_missing_values_name_the_template_and_fields(stats):
+    with pytest.raises(KeyError, match="test.reply.*client, topic"):
+        PromptTemplate("test.reply", "Reply to {client} about {topic}.").render()
+
+
+def test_agent_prompts_start_with_the_same_shared_prefix(stats):
+    tech = TECHNICAL_APPROACH.render(rfp_content="Tech slice of the RFP.", **CONTEXT)
+    sre = MAINTENANCE_SUPPORT_PLAN.render(rfp_content="SRE slice of the RFP.", **CONTEXT)
+    prefix, prefix_tokens = AGENT_CONTEXT.shared(CONTEXT)
+    assert tech.startswith(prefix + "\n\n") and sre.startswith(prefix + "\n\n")
+    # The agent's own slice of the RFP comes after the shared part.
+    assert "Tech slice" not in prefix and tech.index("Tech slice") > len(prefix)
+    assert stats.stats()[TECHNICAL_APPROACH.name]["shared_prefix_tokens"] == prefix_tokens > 0
+
+
+def test_shared_prefix_is_rendered_once_per_distinct_values():
+    template = PromptTemplate("test.prefix", "Summary: {rfp_summary}")
+    first, _ = template.shared({"rfp_summary": "A cloud migration.", "rfp_content": "ignored"})
+    again, _ = template.shared({"rfp_summary": "A cloud migration."})
+    other, _ = template.shared({"rfp_summary": "A data centre exit."})
+    assert first is again and other != first
+    assert template._shared.cache_info().misses == 2
+
+
+def test_stats_count_prompts_and_tokens_per_template(stats):
+    template = PromptTemplate("test.count", "Summarise {text}")
+    template.render(text="a" * 400)
+    template.render(text="b" * 40)
+    totals = stats.stats()["test.count"]
+    assert totals["prompts"] == 2 and totals["shared_prefix_tokens"] == 0
+    assert totals["tokens"] == estimate_tokens("Summarise " + "a" * 400) + estimate_tokens("Summarise " + "b" * 40)
@@ -0,0 +1,151 @@
+# tests/test_quality_gate.py
+from types import SimpleNamespace
+
+import pytest
+
+from agents.presale_manager import PresaleManager
+from main import checked_response
+from utils.api_utils import get_model
+from utils.quality_gate import AGENT_REQUIREMENTS, parse_rubric, rubric_gaps, structural_gaps
+
+TECH_RESPONSE = """## Technical Approach
+The platform is migrated to a landing zone in the Muscat region, with workloads moved in waves.
+
+```mermaid
+graph TD
+    A[Users] --> B[Landing Zone]
+    B --> C[Workloads]
+```
+
+| Layer | Technology | Justification |
+|-------|------------|---------------|
+| Compute | Kubernetes | Portable across providers |
+"""
+WITHOUT_DIAGRAM = TECH_RESPONSE.split("```mermaid")[0] + TECH_RESPONSE.split("```\n", 1)[1]
+BD_RESPONSE = """## Commercial Proposal
+Our pricing strategy is a fixed price per phase, benchmarked against recent government awards.
+
+| Item | Description | Quantity | Unit Cost | Total Cost |
+|------|-------------|----------|-----------|------------|
+| Cloud Architect | Design | 1 | 900 | 18000 |
+"""
+
+
+class RubricModel:
+    """Answers rubric prompts with a canned reply and records the prompts it was sent."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return SimpleNamespace(text=self.reply)
+
+
+class RecordingModel:
+    def __init__(self, model):
+        self.model = model
+        self.prompts = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return self.model.generate_content(prompt, **kwargs)
+
+
+class Agent:
+    """A team member whose full response is canned and whose follow-ups go to the stub model."""
+
+    def __init__(self, response):
+        self.response = response
+        self.model = RecordingModel(get_model("gemini-pro"))
+        self.calls = 0
+
+    def relevant_passages(self, query, k=5):
+        return []
+
+    def write(self, rfp_content, **kwargs):
+        self.calls += 1
+        return self.response
+
+
+def check(agent_name, response, agent):
+    manager = PresaleManager(rfp_summary="A cloud migration for the Ministry.")
+    return checked_response(manager, agent_name, response, agent, "write", "RFP text")
+
+
+@pytest.mark.parametrize("agent_name, response", [("Tech Lead", TECH_RESPONSE), ("BD Manager", BD_RESPONSE)])
+def test_complete_response_has_no_structural_gaps(agent_name, response):
+    assert structural_gaps(agent_name, response) == []
+
+
+def test_each_missing_part_is_reported_with_its_instruction():
+    gaps = structural_gaps("Tech Lead", WITHOUT_DIAGRAM)
+    assert [gap.name for gap in gaps] == ["architecture diagram"]
+    assert gaps[0].instruction == AGENT_REQUIREMENTS["Tech Lead"][0].instruction
+    assert not gaps[0].regenerate
+    # A table without a cost column is not a cost table, and "price" is matched as a word prefix.
+    without_costs = BD_RESPONSE.replace("Unit Cost", "Unit").replace("Total Cost", "Total")
+    assert [gap.name for gap in structural_gaps("BD Manager", without_costs)] == ["cost table"]
+    assert [gap.name for gap in structural_gaps("BD Manager", BD_RESPONSE.replace("pricing", "commercial"))] == []
+
+
+def test_near_empty_response_needs_full_regeneration():
+    gaps = structural_gaps("Tech Lead", "  TBD  ")
+    assert len(gaps) == 1 and gaps[0].regenerate
+
+
+def test_passing_response_is_returned_without_model_calls(stub_backend):
+    agent = Agent(TECH_RESPONSE)
+    assert check("Tech Lead", TECH_RESPONSE, agent) == TECH_RESPONSE
+    assert agent.calls == 0 and agent.model.prompts == []
+    assert stub_backend.calls == 0
+
+
+def test_missing_parts_are_requested_with_one_targeted_follow_up(stub_backend):
+    agent = Agent(TECH_RESPONSE)
+    response = check("Tech Lead", WITHOUT_DIAGRAM, agent)
+    assert agent.calls == 0
+    assert len(agent.model.prompts) == 1
+    prompt = agent.model.prompts[0]
+    assert AGENT_REQUIREMENTS["Tech Lead"][0].instruction in prompt
+    assert AGENT_REQUIREMENTS["Tech Lead"][1].instruction not in prompt
+    assert response.startswith(WITHOUT_DIAGRAM.rstrip())
+    assert "## Stub response" in response
+
+
+def test_near_empty_response_is_regenerated_in_full(stub_backend):
+    agent = Agent(TECH_RESPONSE)
+    assert check("Tech Lead", "TBD", agent) == TECH_RESPONSE
+    assert agent.calls == 1 and agent.model.prompts == []
+
+
+def test_parse_rubric_tolerates_fences_and_rejects_garbage():
+    assert parse_rubric('```json\n{"score": "2", "missing": ["Add SLAs", " "]}\n```') == (2, ["Add SLAs"])
+    assert parse_rubric("Looks good to me.") is None
+    assert parse_rubric('{"missing": []}') is None
+
+
+def test_low_rubric_score_turns_missing_items_into_gaps():
+    model = RubricModel('{"score": 2, "missing": ["Name the backup retention period."]}')
+    gaps = rubric_gaps(model, "SRE Lead", "A response.", min_score=3)
+    assert [gap.instruction for gap in gaps] == ["Name the backup retention period."]
+    assert AGENT_REQUIREMENTS["SRE Lead"][0].instruction in model.prompts[0]
+    # A low score with nothing listed still asks for the weakest parts to be expanded.
+    assert [gap.name for gap in rubric_gaps(RubricModel('{"score": 1}'), "SRE Lead", "A response.", min_score=3)] == ["rubric"]
+
+
+@pytest.mark.parametrize("reply", ['{"score": 3, "missing": ["More detail."]}', "not json", RuntimeError("offline")])
+def test_rubric_passes_the_response_when_it_scores_well_or_cannot_be_read(reply):
+    assert rubric_gaps(RubricModel(reply), "SRE Lead", "A response.", min_score=3) == []
+
+
+def test_rubric_only_scores_responses_that_pass_the_structural_check(stub_backend):
+    manager = PresaleManager()
+    manager.rubric_model = RubricModel('{"score": 1, "missing": ["Justify the Kubernetes choice."]}')
+    assert [gap.name for gap in manager.evaluate_response("Tech Lead", WITHOUT_DIAGRAM)] == ["architecture diagram"]
+    assert manager.rubric_model.prompts == []
+    assert [gap.instruction for gap in manager.evaluate_response("Tech Lead", TECH_RESPONSE)] == [
+        "Justify the Kubernetes choice."]
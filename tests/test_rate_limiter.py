@@ -0,0 +1,129 @@
+# tests/test_rate_limiter.py
+from types import SimpleNamespace
+
+import pytest
+
+from utils import rate_limiter
+from utils.rate_limiter import RateLimitedModel, RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping advances the clock instead of blocking."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+class StreamedAnswer:
+    def __init__(self, chunks, usage_metadata):
+        self.chunks = chunks
+        self.usage_metadata = usage_metadata
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+
+class UsageModel:
+    """Answers with fixed text and usage metadata, streamed in two chunks when asked to."""
+
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.usage_metadata = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=completion_tokens)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if stream:
+            return StreamedAnswer([SimpleNamespace(text="four "), SimpleNamespace(text="words")], self.usage_metadata)
+        return SimpleNamespace(text="four words", usage_metadata=self.usage_metadata)
+
+
+def test_bucket_starts_full_and_refills_at_its_rate(clock):
+    bucket = TokenBucket(60)
+    assert bucket.acquire(60) == 0.0
+    assert bucket.acquire(1) == pytest.approx(1.0)
+    clock.now += 30
+    assert bucket.acquire(30) == 0.0
+    assert bucket.acquire(1) == pytest.approx(1.0)
+
+
+def test_bucket_never_refills_beyond_capacity(clock):
+    bucket = TokenBucket(60, capacity=10)
+    clock.now += 3600
+    assert bucket.acquire(10) == 0.0
+    assert bucket.acquire(10) == pytest.approx(10.0)
+
+
+def test_request_larger_than_capacity_waits_for_a_full_bucket(clock):
+    bucket = TokenBucket(60)
+    assert bucket.acquire(500) == 0.0
+    assert bucket.tokens == pytest.approx(0.0)
+
+
+def test_charge_can_overdraw_the_bucket(clock):
+    bucket = TokenBucket(60)
+    bucket.charge(90)
+    assert bucket.tokens == pytest.approx(-30.0)
+    assert bucket.acquire(1) == pytest.approx(31.0)
+
+
+def test_limiter_enforces_requests_per_minute(clock):
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=1000000)
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == pytest.approx(30.0)
+
+
+def test_limiter_enforces_tokens_per_minute(clock):
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=600)
+    assert limiter.acquire(600) == 0.0
+    assert limiter.acquire(100) == pytest.approx(10.0)
+
+
+def test_pause_holds_back_every_caller(clock):
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=1000000)
+    limiter.pause(5)
+    limiter.pause(2)
+    assert limiter.acquire() == pytest.approx(5.0)
+    assert limiter.acquire() == 0.0
+
+
+def test_model_call_is_charged_for_its_actual_usage(clock):
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=100000)
+    model = RateLimitedModel(UsageModel(prompt_tokens=500, completion_tokens=200), limiter)
+    prompt = "word " * 40
+    estimated = rate_limiter.estimate_tokens(prompt)
+    model.generate_content(prompt)
+    # The estimate is taken up front; the completion and any underestimate of the prompt are charged after.
+    assert limiter.tokens.tokens == pytest.approx(100000 - estimated - 200 - (500 - estimated))
+    assert limiter.requests.tokens == pytest.approx(999)
+
+
+def test_completion_is_estimated_without_usage_metadata(clock):
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=100000)
+    model = RateLimitedModel(UsageModel(prompt_tokens=None, completion_tokens=None), limiter)
+    model.generate_content("prompt")
+    expected = rate_limiter.estimate_tokens("prompt") + rate_limiter.estimate_tokens("four words")
+    assert limiter.tokens.tokens == pytest.approx(100000 - expected)
+
+
+def test_streamed_call_is_charged_once_read(clock):
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=100000)
+    model = RateLimitedModel(UsageModel(prompt_tokens=None, completion_tokens=None), limiter)
+    stream = model.generate_content("prompt", stream=True)
+    before = limiter.tokens.tokens
+    assert "".join(chunk.text for chunk in stream) == "four words"
+    assert limiter.tokens.tokens == pytest.approx(before - rate_limiter.estimate_tokens("four words"))
+    assert stream.usage_metadata is not None
@@ -0,0 +1,125 @@
+# tests/test_response_cache.py
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils.response_cache import CachedModel, ResponseCache, cached_content_key, register_cached_content
+
+
+class CountingModel:
+    """Answers each prompt with a canned text and counts the calls that reach it."""
+
+    def __init__(self):
+        self.calls = 0
+        self._generation_config = {"temperature": 0.2}
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return [SimpleNamespace(text=part) for part in ("answer to ", prompt)]
+        return SimpleNamespace(text=f"answer to {prompt}")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(path=str(tmp_path / "responses.sqlite3"))
+
+
+def test_key_covers_model_prompt_and_config():
+    key = ResponseCache.make_key("gemini-pro", "prompt", {"temperature": 0.2})
+    assert key == ResponseCache.make_key("gemini-pro", "prompt", {"temperature": 0.2})
+    assert key != ResponseCache.make_key("gemini-1.5-pro", "prompt", {"temperature": 0.2})
+    assert key != ResponseCache.make_key("gemini-pro", "prompt!", {"temperature": 0.2})
+    assert key != ResponseCache.make_key("gemini-pro", "prompt", {"temperature": 0.3})
+    assert ResponseCache.make_key("gemini-pro", "prompt") == ResponseCache.make_key("gemini-pro", "prompt", {})
+
+
+def test_repeated_prompt_is_answered_from_the_cache(cache):
+    inner = CountingModel()
+    model = CachedModel(inner, "gemini-pro", cache)
+    assert model.generate_content("summarise").text == "answer to summarise"
+    assert model.generate_content("summarise").text == "answer to summarise"
+    assert inner.calls == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_call_options_are_part_of_the_key(cache):
+    inner = CountingModel()
+    model = CachedModel(inner, "gemini-pro", cache)
+    model.generate_content("summarise")
+    model.generate_content("summarise", generation_config={"temperature": 0.9})
+    assert inner.calls == 2
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    CachedModel(CountingModel(), "gemini-pro", ResponseCache(path=path)).generate_content("summarise")
+    inner = CountingModel()
+    CachedModel(inner, "gemini-pro", ResponseCache(path=path)).generate_content("summarise")
+    assert inner.calls == 0
+
+
+def test_streamed_response_is_stored_once_read(cache):
+    inner = CountingModel()
+    model = CachedModel(inner, "gemini-pro", cache)
+    stream = model.generate_content("plan", stream=True)
+    assert "".join(chunk.text for chunk in stream) == "answer to plan"
+    hit = model.generate_content("plan", stream=True)
+    assert [chunk.text for chunk in hit] == ["answer to plan"]
+    assert inner.calls == 1
+
+
+def test_bypass_skips_lookups_but_still_writes(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    inner = CountingModel()
+    model = CachedModel(inner, "gemini-pro", ResponseCache(path=path, bypass=True))
+    model.generate_content("summarise")
+    model.generate_content("summarise")
+    assert inner.calls == 2
+
+    fresh = CountingModel()
+    CachedModel(fresh, "gemini-pro", ResponseCache(path=path)).generate_content("summarise")
+    assert fresh.calls == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite3"), max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, "gemini-pro", key)
+        time.sleep(0.01)
+    cache.get("a")
+    assert cache.evict() == 1
+    assert cache.get("a") == "a"
+    assert cache.get("b") is None
+    assert cache.get("c") == "c"
+
+
+def test_entries_are_evicted_by_size_and_age(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite3"), max_bytes=10)
+    cache.put("a", "gemini-pro", "x" * 8)
+    time.sleep(0.01)
+    cache.put("b", "gemini-pro", "y" * 8)
+    cache.evict()
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 8
+
+    cache = ResponseCache(path=str(tmp_path / "aged.sqlite3"), max_age=0.01)
+    cache.put("a", "gemini-pro", "old")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.evict() == 1
+
+
+def test_cached_content_is_keyed_on_its_contents():
+    first = SimpleNamespace(name="cachedContents/first-upload")
+    second = SimpleNamespace(name="cachedContents/second-upload")
+    other = SimpleNamespace(name="cachedContents/other-rfp")
+    register_cached_content(first, "RFP text")
+    register_cached_content(second, "RFP text")
+    register_cached_content(other, "Another RFP")
+    assert cached_content_key(first) == cached_content_key(second)
+    assert cached_content_key(first) != cached_content_key(other)
+    unknown = SimpleNamespace(name="cachedContents/unregistered")
+    assert cached_content_key(unknown) == "cachedContents/unregistered"
@@ -0,0 +1,38 @@
+# tests/test_retrieval.py
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.retrieval import VECTOR_DIMENSIONS, RetrievalIndex  # noqa: E402
+
+DOCUMENT = (
+    "1. Introduction\n"
+    "The council invites proposals for a new citizen services portal.\n\n"
+    "2. Security Requirements\n"
+    "The supplier must hold ISO 27001 certification and encrypt all data at rest.\n\n"
+    "3. Commercial Terms\n"
+    "Payment is made monthly in arrears against agreed milestones.\n"
+)
+
+
+@pytest.mark.parametrize("mode", ["bm25", "vector", "hybrid"])
+def test_search_finds_the_relevant_section(mode):
+    index = RetrievalIndex.build(DOCUMENT)
+    passages = index.search("encryption certification", k=1, mode=mode)
+    assert len(passages) == 1
+    assert "ISO 27001" in passages[0].text
+
+
+@pytest.mark.parametrize("text", ["", "   \n\n  "])
+@pytest.mark.parametrize("mode", ["bm25", "vector", "hybrid"])
+def test_index_without_passages_returns_nothing(text, mode):
+    index = RetrievalIndex.build(text)
+    assert index.search("security requirements", mode=mode) == []
+
+
+def test_vector_scores_without_passages_do_not_touch_the_matrix():
+    # A vocabulary with no passages gives the query a non-zero vector over an empty matrix.
+    index = RetrievalIndex("", [], {"security": {}}, [], RetrievalIndex.hash_text(""),
+                           np.zeros((0, VECTOR_DIMENSIONS), dtype=np.float32))
+    assert index.vector_scores("security") == {}
+    assert index.search("security", mode="hybrid") == []
@@ -0,0 +1,113 @@
+# tests/test_retry_utils.py
+from types import SimpleNamespace
+
+import pytest
+
+from utils import retry_utils
+from utils.backends import StubAPIError
+from utils.retry_utils import MAX_ATTEMPTS, is_retryable, model_retry, retry_hint
+
+
+class APIError(Exception):
+    def __init__(self, code, message="failed"):
+        super().__init__(message)
+        self.code = code
+
+
+class PausedLimiter:
+    def __init__(self):
+        self.pauses = []
+
+    def pause(self, seconds):
+        self.pauses.append(seconds)
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    # No backoff between attempts, and quota pauses recorded instead of applied to the shared limiter.
+    limiter = PausedLimiter()
+    monkeypatch.setattr(retry_utils, "BASE_DELAY", 0.0)
+    monkeypatch.setattr(retry_utils, "get_rate_limiter", lambda: limiter)
+    return limiter
+
+
+@pytest.mark.parametrize("exc, retryable", [
+    (StubAPIError(429, "Resource has been exhausted"), True),
+    (StubAPIError(503, "Injected failure"), True),
+    (APIError(408), True),
+    (APIError(500), True),
+    (APIError(504), True),
+    (APIError(400), False),
+    (APIError(403), False),
+    (APIError(404), False),
+    (APIError("not a status"), False),
+    (ConnectionError("reset"), True),
+    (TimeoutError("timed out"), True),
+    (ValueError("blocked prompt"), False),
+])
+def test_only_transient_errors_are_retryable(exc, retryable):
+    assert is_retryable(exc) is retryable
+
+
+def test_retry_hint_is_read_from_message_details_and_headers():
+    assert retry_hint(APIError(429, "Quota exceeded. Please retry in 7.5s")) == 7.5
+    assert retry_hint(SimpleNamespace(details="retry_delay { seconds: 12 }")) == 12.0
+    error = APIError(429)
+    error.response = SimpleNamespace(headers={"Retry-After": "3"})
+    assert retry_hint(error) == 3.0
+    assert retry_hint(APIError(503)) is None
+
+
+def test_transient_failures_are_retried_until_success(limiter):
+    calls = []
+
+    @model_retry
+    def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise APIError(503)
+        return "ok"
+
+    assert call() == "ok"
+    assert len(calls) == 3
+    assert limiter.pauses == []
+
+
+def test_permanent_failures_are_not_retried(limiter):
+    calls = []
+
+    @model_retry
+    def call():
+        calls.append(1)
+        raise APIError(400, "invalid argument")
+
+    with pytest.raises(APIError, match="invalid argument"):
+        call()
+    assert len(calls) == 1
+
+
+def test_retries_stop_after_max_attempts(limiter):
+    calls = []
+
+    @model_retry
+    def call():
+        calls.append(1)
+        raise APIError(500)
+
+    with pytest.raises(APIError):
+        call()
+    assert len(calls) == MAX_ATTEMPTS
+
+
+def test_quota_errors_pause_the_shared_limiter(limiter):
+    calls = []
+
+    @model_retry
+    def call():
+        calls.append(1)
+        if len(calls) == 1:
+            raise APIError(429, "quota exhausted")
+        return "ok"
+
+    assert call() == "ok"
+    assert len(limiter.pauses) == 1
@@ -0,0 +1,55 @@
+# tests/test_revise.py
+import os
+
+import main
+from benchmarks import synthetic_pdf
+from utils.pdf_utils import ExtractedDocument
+
+PAGES = [
+    "1. Introduction\nThe Ministry invites proposals.",
+    "More background on the Ministry.\n2. Scope\nThree workloads move to the cloud.",
+    "The scope continues onto this page.",
+    "3. Commercial Terms\nPayment is monthly in arrears.",
+]
+
+
+def test_changed_pages_name_the_sections_they_touch():
+    document = ExtractedDocument(PAGES)
+    assert main.changed_sections(document, [0]) == ["1. Introduction"]
+    # A page that ends one section and starts the next touches both.
+    assert main.changed_sections(document, [1]) == ["1. Introduction", "2. Scope"]
+    assert main.changed_sections(document, [2, 3]) == ["2. Scope", "3. Commercial Terms"]
+    assert main.changed_sections(document, []) == []
+
+
+def test_changed_pages_are_described_as_one_based_ranges():
+    assert main.describe_pages([2, 3, 4, 9]) == "3-5, 10"
+    assert main.describe_pages([0]) == "1"
+
+
+def test_revision_reuses_the_base_runs_state_and_cached_answers(stub_backend, tmp_path, monkeypatch, caplog):
+    monkeypatch.chdir(tmp_path)
+    # Low enough that the RFP is condensed chunk by chunk, so unchanged chunks are answered from the cache.
+    monkeypatch.setenv("RFP_MAP_REDUCE_THRESHOLD", "2000")
+    synthetic_pdf.write_synthetic_pdf("base.pdf", 24, seed=1)
+    page_lines = synthetic_pdf.page_lines
+
+    def addendum(page_num, rng, lines_per_page=45):
+        lines = page_lines(page_num, rng, lines_per_page)
+        if page_num == 21:
+            lines[-1] = "addendum the bidder shall quote pricing in omani rials"
+        return lines
+
+    monkeypatch.setattr(synthetic_pdf, "page_lines", addendum)
+    synthetic_pdf.write_synthetic_pdf("revised.pdf", 24, seed=1)
+
+    main.main(["run", "base.pdf", "--output", "base.md"])
+    base_calls = stub_backend.calls
+    caplog.set_level("INFO")
+    main.main(["revise", "revised.pdf", "--base", "base.pdf", "--output", "revised.md"])
+    revise_calls = stub_backend.calls - base_calls
+
+    assert os.path.exists("revised.md")
+    assert not os.path.exists(main.default_state_dir("revised.pdf"))
+    assert "Revision changes pages 22 in sections: 6. Security and Compliance" in caplog.text
+    assert 0 < revise_calls < base_calls
@@ -0,0 +1,62 @@
+# tests/test_rfp_analyser.py
+import re
+import threading
+from types import SimpleNamespace
+
+from agents.rfp_analyser import SUMMARY_FOCUS, RFPanalyser
+from utils.chunking import chunk_spans
+
+SECTIONS = 12
+DOCUMENT = "".join(f"{index}. Requirement Area {index}\n" + f"Clause {index} applies to every workload.\n" * 6
+                   for index in range(1, SECTIONS + 1))
+
+
+class NotesModel:
+    """Answers map prompts with one note per section heading in the chunk, and reduce prompts by joining the notes."""
+
+    def __init__(self, note_words=1):
+        self.note_words = note_words
+        self.map_prompts = []
+        self.reduce_prompts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            if "RFP Part:" in prompt:
+                self.map_prompts.append(prompt)
+                areas = re.findall(r"^\d+\. Requirement Area (\d+)$", prompt, re.MULTILINE)
+                text = "\n".join(f"- area {area}" + " detail" * self.note_words for area in areas)
+            else:
+                self.reduce_prompts.append(prompt)
+                areas = re.findall(r"- area (\d+)", prompt)
+                text = "- areas " + " ".join(areas)
+        return SimpleNamespace(text=text)
+
+
+def analyser(model, **kwargs):
+    analyser = RFPanalyser(**kwargs)
+    analyser.model = model
+    return analyser
+
+
+def test_documents_under_the_threshold_are_not_condensed(stub_backend):
+    model = NotesModel()
+    assert analyser(model).condense(DOCUMENT, SUMMARY_FOCUS) == DOCUMENT
+    assert model.map_prompts == [] and model.reduce_prompts == []
+
+
+def test_each_chunk_is_mapped_once_and_notes_keep_document_order(stub_backend):
+    model = NotesModel()
+    condensed = analyser(model, map_reduce_threshold=100, chunk_tokens=150, max_workers=4).condense(DOCUMENT, SUMMARY_FOCUS)
+    assert len(model.map_prompts) == len(chunk_spans(DOCUMENT, 150)) > 1
+    assert model.reduce_prompts == []
+    assert len(condensed.split("\n\n")) == len(model.map_prompts)
+    assert [int(area) for area in re.findall(r"area (\d+)", condensed)] == list(range(1, SECTIONS + 1))
+
+
+def test_notes_too_large_for_one_prompt_are_reduced_hierarchically(stub_backend):
+    model = NotesModel(note_words=60)
+    condensed = analyser(model, map_reduce_threshold=100, chunk_tokens=150, max_workers=4).condense(DOCUMENT, SUMMARY_FOCUS)
+    assert len(model.reduce_prompts) > 1
+    # Every area survives the reduction, in order.
+    assert [int(area) for area in re.findall(r"\d+", condensed)] == list(range(1, SECTIONS + 1))
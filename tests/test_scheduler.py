@@ -0,0 +1,158 @@
+# tests/test_scheduler.py
+import threading
+
+import pytest
+
+from utils.checkpoint import RunState
+from utils.scheduler import DAGScheduler, current_stage
+
+
+def test_tasks_receive_dependency_results_as_keyword_arguments():
+    scheduler = DAGScheduler(max_workers=2)
+    scheduler.add_task("a", lambda: 1)
+    scheduler.add_task("b", lambda a: a + 1, deps=["a"])
+    scheduler.add_task("c", lambda a, b: a * 10 + b, deps=["a", "b"])
+    assert scheduler.run() == {"a": 1, "b": 2, "c": 12}
+
+
+def test_tasks_start_only_after_their_dependencies_finish():
+    order = []
+    lock = threading.Lock()
+
+    def task(name):
+        def run(**deps):
+            with lock:
+                order.append(name)
+            return name
+        return run
+
+    scheduler = DAGScheduler(max_workers=4)
+    scheduler.add_task("extract", task("extract"))
+    scheduler.add_task("summary", task("summary"), deps=["extract"])
+    scheduler.add_task("analysis", task("analysis"), deps=["extract"])
+    scheduler.add_task("response", task("response"), deps=["summary", "analysis"])
+    scheduler.run()
+    assert order[0] == "extract"
+    assert order[-1] == "response"
+    assert set(order[1:3]) == {"summary", "analysis"}
+
+
+def test_independent_tasks_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    scheduler = DAGScheduler(max_workers=2)
+    scheduler.add_task("left", lambda: barrier.wait())
+    scheduler.add_task("right", lambda: barrier.wait())
+    scheduler.run()
+
+
+def test_run_targets_only_their_dependencies():
+    scheduler = DAGScheduler()
+    scheduler.add_task("a", lambda: 1)
+    scheduler.add_task("b", lambda a: a + 1, deps=["a"])
+    scheduler.add_task("unrelated", lambda: pytest.fail("should not run"))
+    assert scheduler.run(targets=["b"]) == {"a": 1, "b": 2}
+
+
+def test_tasks_run_with_their_stage_as_current_stage():
+    scheduler = DAGScheduler()
+    scheduler.add_task("summary", lambda: current_stage.get())
+    assert scheduler.run() == {"summary": "summary"}
+
+
+def test_invalid_graphs_are_rejected():
+    scheduler = DAGScheduler()
+    scheduler.add_task("a", lambda b: b, deps=["b"])
+    scheduler.add_task("b", lambda a: a, deps=["a"])
+    with pytest.raises(ValueError, match="cycle"):
+        scheduler.run()
+
+    scheduler = DAGScheduler()
+    scheduler.add_task("a", lambda missing: missing, deps=["missing"])
+    with pytest.raises(ValueError, match="unknown task"):
+        scheduler.run()
+
+    scheduler = DAGScheduler()
+    scheduler.add_task("a", lambda: 1)
+    scheduler.add_task("b", lambda a: a, deps=["a"], key_deps=["c"])
+    with pytest.raises(ValueError, match="not one of its dependencies"):
+        scheduler.run()
+
+    with pytest.raises(ValueError, match="already registered"):
+        scheduler.add_task("a", lambda: 2)
+
+
+def test_failed_task_raises():
+    def fail():
+        raise RuntimeError("boom")
+
+    scheduler = DAGScheduler()
+    scheduler.add_task("a", fail)
+    scheduler.add_task("b", lambda a: a, deps=["a"])
+    with pytest.raises(RuntimeError, match="boom"):
+        scheduler.run()
+
+
+def build(state, calls, source="rfp text", setting="packed"):
+    def record(name, value):
+        def run(**deps):
+            calls.append(name)
+            return value(**deps)
+        return run
+
+    scheduler = DAGScheduler(state=state)
+    scheduler.add_task("extract", record("extract", lambda: source))
+    scheduler.add_task("team", record("team", lambda extract: object()), deps=["extract"], checkpoint=False)
+    scheduler.add_task("summary", record("summary", lambda extract: extract.upper()), deps=["extract"])
+    scheduler.add_task("plan", record("plan", lambda summary, team: f"plan for {summary}"),
+                       deps=["summary", "team"], inputs={"mode": setting})
+    return scheduler
+
+
+def test_resume_restores_unchanged_tasks(tmp_path):
+    calls = []
+    build(RunState(str(tmp_path)), calls).run()
+    assert sorted(calls) == ["extract", "plan", "summary", "team"]
+
+    calls.clear()
+    scheduler = build(RunState(str(tmp_path), resume=True), calls)
+    results = scheduler.run()
+    assert results["plan"] == "plan for RFP TEXT"
+    # Tasks that are not checkpointed always run; the rest come from disk.
+    assert calls == ["team"]
+    assert sorted(scheduler.restored) == ["extract", "plan", "summary"]
+
+
+def test_resume_recomputes_when_inputs_change(tmp_path):
+    build(RunState(str(tmp_path)), []).run()
+
+    calls = []
+    scheduler = build(RunState(str(tmp_path), resume=True), calls, setting="full")
+    scheduler.run()
+    assert "plan" in calls
+    assert "summary" not in calls
+
+
+def test_without_resume_nothing_is_restored(tmp_path):
+    build(RunState(str(tmp_path)), []).run()
+
+    calls = []
+    scheduler = build(RunState(str(tmp_path)), calls)
+    scheduler.run()
+    assert sorted(calls) == ["extract", "plan", "summary", "team"]
+    assert scheduler.restored == []
+
+
+def test_key_deps_limit_what_invalidates_a_checkpoint(tmp_path):
+    def run(resume, draft, calls):
+        scheduler = DAGScheduler(state=RunState(str(tmp_path), resume=resume))
+        scheduler.add_task("rfp", lambda: "rfp")
+        scheduler.add_task("draft", lambda: draft)
+        scheduler.add_task("review", lambda rfp, draft: calls.append("review") or f"review of {rfp}",
+                           deps=["rfp", "draft"], key_deps=["rfp"])
+        return scheduler.run()
+
+    run(False, "first draft", [])
+    calls = []
+    results = run(True, "second draft", calls)
+    assert calls == []
+    assert results["review"] == "review of rfp"
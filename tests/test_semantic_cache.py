@@ -0,0 +1,129 @@
+# tests/test_semantic_cache.py
+import random
+import sqlite3
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.semantic_cache import MinHasher, SemanticCache, band_keys, shingles, similarity  # noqa: E402
+
+
+def words(count, seed):
+    rng = random.Random(seed)
+    return [f"term{rng.randrange(100000)}" for _ in range(count)]
+
+
+BASE = words(2000, seed=1)
+# The same RFP with one word in five hundred changed (each change touches five shingles).
+NEAR_DUPLICATE = [word if index % 500 else "amended" for index, word in enumerate(BASE)]
+# The first 1700 words of the RFP followed by 300 new ones: about three quarters of the shingles are shared.
+SIMILAR = BASE[:1700] + words(300, seed=2)
+UNRELATED = words(2000, seed=3)
+MODEL = "gemini-pro"
+
+
+def jaccard(first, second):
+    first, second = set(shingles(" ".join(first)).tolist()), set(shingles(" ".join(second)).tolist())
+    return len(first & second) / len(first | second)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SemanticCache(path=str(tmp_path / "semantic.sqlite3"))
+    cache.put("summary", " ".join(BASE), "summary of the base RFP", MODEL, rfp="base.pdf")
+    return cache
+
+
+def test_shingles_are_overlapping_word_sequences():
+    assert len(shingles("one two three four five six seven")) == 3
+    assert len(shingles("one two three")) == 1
+    assert len(shingles("")) == 0
+    assert np.array_equal(shingles("One, two; THREE four five"), shingles("one two three four five"))
+
+
+def test_signature_estimates_jaccard_similarity():
+    hasher = MinHasher()
+    base = hasher.signature(" ".join(BASE))
+    assert similarity(base, hasher.signature(" ".join(BASE))) == 1.0
+    for other in (NEAR_DUPLICATE, SIMILAR, UNRELATED):
+        estimate = similarity(base, hasher.signature(" ".join(other)))
+        assert estimate == pytest.approx(jaccard(BASE, other), abs=0.1)
+
+
+def test_identical_signatures_share_every_band():
+    signature = MinHasher().signature(" ".join(BASE))
+    keys = band_keys(signature)
+    assert len(set(keys)) == len(keys) == 32
+    assert keys == band_keys(MinHasher().signature(" ".join(BASE)))
+
+
+def test_near_duplicate_is_reused(cache):
+    match = cache.lookup("summary", " ".join(NEAR_DUPLICATE), MODEL)
+    assert match.output == "summary of the base RFP"
+    assert match.rfp == "base.pdf"
+    assert match.similarity >= cache.reuse_threshold
+    assert cache.counts == {"reused": 1, "warm_starts": 0, "misses": 0}
+
+
+def test_similar_input_is_a_warm_start(cache):
+    match = cache.lookup("summary", " ".join(SIMILAR), MODEL)
+    assert cache.warm_start_threshold <= match.similarity < cache.reuse_threshold
+    assert cache.counts == {"reused": 0, "warm_starts": 1, "misses": 0}
+
+
+def test_unrelated_input_and_other_stages_miss(cache):
+    assert cache.lookup("summary", " ".join(UNRELATED), MODEL) is None
+    assert cache.lookup("analysis", " ".join(BASE), MODEL) is None
+    assert cache.counts["misses"] == 2
+
+
+def test_thresholds_decide_what_matches(tmp_path):
+    cache = SemanticCache(path=str(tmp_path / "semantic.sqlite3"), reuse_threshold=0.5, warm_start_threshold=0.9)
+    cache.put("summary", " ".join(BASE), "summary", MODEL)
+    assert cache.lookup("summary", " ".join(SIMILAR), MODEL) is None
+    assert cache.lookup("summary", " ".join(NEAR_DUPLICATE), MODEL).output == "summary"
+    assert cache.counts == {"reused": 1, "warm_starts": 0, "misses": 1}
+
+
+def test_most_similar_entry_wins(cache):
+    cache.put("summary", " ".join(SIMILAR), "summary of the similar RFP", MODEL)
+    assert cache.lookup("summary", " ".join(NEAR_DUPLICATE), MODEL).output == "summary of the base RFP"
+    assert cache.lookup("summary", " ".join(SIMILAR), MODEL).output == "summary of the similar RFP"
+
+
+def test_same_input_replaces_its_entry(cache):
+    cache.put("summary", " ".join(BASE), "revised summary", MODEL)
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup("summary", " ".join(BASE), MODEL).output == "revised summary"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SemanticCache(path=str(tmp_path / "semantic.sqlite3"), max_entries=1)
+    cache.put("summary", " ".join(BASE), "old", MODEL)
+    cache.put("summary", " ".join(UNRELATED), "new", MODEL)
+    assert cache.evict() == 1
+    assert cache.lookup("summary", " ".join(BASE), MODEL) is None
+    assert cache.lookup("summary", " ".join(UNRELATED), MODEL).output == "new"
+
+
+def test_outputs_are_only_reused_for_the_model_that_wrote_them(cache):
+    assert cache.lookup("summary", " ".join(BASE), "stub:gemini-pro") is None
+    assert cache.lookup("summary", " ".join(BASE), "gemini-1.5-pro") is None
+    cache.put("summary", " ".join(BASE), "stub summary", "stub:gemini-pro")
+    assert cache.lookup("summary", " ".join(BASE), "stub:gemini-pro").output == "stub summary"
+    assert cache.lookup("summary", " ".join(BASE), MODEL).output == "summary of the base RFP"
+    assert cache.stats()["entries"] == 2
+
+
+def test_entries_from_before_per_model_keys_are_dropped(tmp_path):
+    path = str(tmp_path / "semantic.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entries (id INTEGER PRIMARY KEY, stage TEXT NOT NULL, input_hash TEXT NOT NULL)")
+    conn.execute("INSERT INTO entries (stage, input_hash) VALUES ('summary', 'abc')")
+    conn.commit()
+    conn.close()
+    cache = SemanticCache(path=path)
+    assert cache.stats()["entries"] == 0
+    cache.put("summary", " ".join(BASE), "summary", MODEL)
+    assert cache.lookup("summary", " ".join(BASE), MODEL).output == "summary"
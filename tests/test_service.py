@@ -0,0 +1,273 @@
+# tests/test_service.py
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from utils.service import RETRY_AFTER_SECONDS, RFPService
+
+PDF = b"%PDF-1.4\n% test upload\n"
+
+
+class GatedPipeline:
+    """Stands in for run_pipeline: records the order jobs start in, and holds each one until it is released."""
+
+    def __init__(self, events=(), fail=False):
+        self.started = []
+        self.events = events
+        self.fail = fail
+        self._gates = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, rfp_path, output_path, state_dir=None, progress=None):
+        job_id = os.path.basename(os.path.dirname(rfp_path))
+        gate = threading.Event()
+        with self._lock:
+            self._gates[job_id] = gate
+            self.started.append(job_id)
+        gate.wait(10)
+        for event, stage, details in self.events:
+            progress(event, stage, **details)
+        if self.fail:
+            raise RuntimeError("extraction failed")
+        with open(output_path, "w") as f:
+            f.write(f"Proposal for {job_id}")
+
+    def release(self, job_id=None):
+        with self._lock:
+            gates = [self._gates[job_id]] if job_id else list(self._gates.values())
+        for gate in gates:
+            gate.set()
+
+
+@asynccontextmanager
+async def running(tmp_path, pipeline, **options):
+    service = RFPService(pipeline, work_dir=str(tmp_path / "service"), **options)
+    await service.start(port=0)
+    try:
+        yield service
+    finally:
+        if isinstance(pipeline, GatedPipeline):
+            pipeline.release()
+        service.close()
+
+
+async def request(service, method, path, body=b"", headers=None):
+    """Sends one request and returns (status, headers, body); the service closes every connection after replying."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", service.port)
+    headers = dict(headers or {})
+    if method == "POST":
+        headers.setdefault("Content-Length", str(len(body)))
+    head = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1"] + [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    reply_headers = {name.strip().lower(): value.strip() for name, value in (line.split(":", 1) for line in lines[1:])}
+    return int(lines[0].split()[1]), reply_headers, payload
+
+
+async def submit(service, tenant="acme", priority=0):
+    status, _, body = await request(service, "POST", f"/jobs?tenant={tenant}&priority={priority}", PDF)
+    assert status == 202
+    return json.loads(body)["id"]
+
+
+async def until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_queued_jobs_run_by_priority_then_arrival(tmp_path):
+    async def scenario():
+        pipeline = GatedPipeline()
+        async with running(tmp_path, pipeline, max_documents=1, tenant_limit=4) as service:
+            blocker = await submit(service)
+            await until(lambda: pipeline.started == [blocker])
+            low = await submit(service, "a", 0)
+            high = await submit(service, "b", 5)
+            also_high = await submit(service, "c", 5)
+            middle = await submit(service, "d", 1)
+            for expected in (high, also_high, middle, low):
+                pipeline.release()
+                await until(lambda: pipeline.started[-1] == expected)
+            pipeline.release()
+            await until(lambda: service.jobs[low].state == "completed")
+
+    asyncio.run(scenario())
+
+
+def test_a_tenant_at_its_limit_does_not_block_others(tmp_path):
+    async def scenario():
+        pipeline = GatedPipeline()
+        async with running(tmp_path, pipeline, max_documents=2, tenant_limit=1) as service:
+            first = await submit(service, "acme")
+            second = await submit(service, "acme")
+            other = await submit(service, "globex")
+            await until(lambda: len(pipeline.started) == 2)
+            assert set(pipeline.started) == {first, other}
+            status, _, body = await request(service, "GET", "/health")
+            assert status == 200
+            assert json.loads(body) == {"queued": 1, "running": 2, "running_by_tenant": {"acme": 1, "globex": 1},
+                                        "jobs": 3}
+            pipeline.release(first)
+            await until(lambda: second in pipeline.started)
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_refused_with_retry_after(tmp_path):
+    async def scenario():
+        pipeline = GatedPipeline()
+        async with running(tmp_path, pipeline, max_documents=1, max_queued=2, max_queued_per_tenant=1) as service:
+            await submit(service, "acme")
+            await until(lambda: len(pipeline.started) == 1)
+            await submit(service, "acme")
+            status, headers, body = await request(service, "POST", "/jobs?tenant=acme", PDF)
+            assert status == 429
+            assert headers["retry-after"] == str(RETRY_AFTER_SECONDS)
+            assert "too many queued jobs" in json.loads(body)["error"]
+            await submit(service, "globex")
+            status, headers, body = await request(service, "POST", "/jobs?tenant=initech", PDF)
+            assert status == 429
+            assert headers["retry-after"] == str(RETRY_AFTER_SECONDS)
+            assert json.loads(body)["error"] == "The queue is full."
+
+    asyncio.run(scenario())
+
+
+def test_bad_requests_are_refused(tmp_path):
+    async def scenario():
+        async with running(tmp_path, GatedPipeline(), max_upload_bytes=1024) as service:
+            cases = [
+                ("POST", "/jobs", b"plain text", {}, 400),
+                ("POST", "/jobs?priority=high", PDF, {}, 400),
+                ("POST", "/jobs", PDF, {"Content-Length": "abc"}, 400),
+                ("POST", "/jobs", PDF, {"Content-Length": "-5"}, 400),
+                ("POST", "/jobs", PDF, {"Content-Length": "4096"}, 413),
+                ("GET", "/jobs/unknown", b"", {}, 404),
+                ("DELETE", "/jobs", b"", {}, 405),
+                ("GET", "/elsewhere", b"", {}, 404),
+            ]
+            for method, path, body, headers, expected in cases:
+                status, _, _ = await request(service, method, path, body, headers)
+                assert status == expected, (method, path, headers)
+            # A POST without Content-Length.
+            reader, writer = await asyncio.open_connection("127.0.0.1", service.port)
+            writer.write(b"POST /jobs HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+            assert (await reader.read()).startswith(b"HTTP/1.1 411")
+            writer.close()
+            assert service.jobs == {}
+
+    asyncio.run(scenario())
+
+
+def test_events_stream_progress_chunks_and_resets(tmp_path):
+    events = [
+        ("started", "rfp_summary", {}),
+        ("finished", "rfp_summary", {"seconds": 1.5}),
+        ("chunk", "final_response", {"text": "Draft "}),
+        ("reset", "final_response", {}),
+        ("chunk", "final_response", {"text": "Proposal"}),
+    ]
+
+    async def scenario():
+        pipeline = GatedPipeline(events)
+        async with running(tmp_path, pipeline) as service:
+            job_id = await submit(service)
+            status, _, _ = await request(service, "GET", f"/jobs/{job_id}/result")
+            assert status == 409
+            stream = asyncio.ensure_future(request(service, "GET", f"/jobs/{job_id}/events"))
+            await until(lambda: pipeline.started == [job_id])
+            pipeline.release()
+            status, headers, body = await stream
+            assert headers["content-type"] == "text/event-stream"
+            received = [json.loads(line[len("data: "):]) for line in body.decode().splitlines() if line.startswith("data: ")]
+            assert [event["event"] for event in received] == [
+                "queued", "started", "stage_started", "stage_finished", "chunk", "reset", "chunk", "completed"]
+            assert [event.get("text") for event in received if event["event"] == "chunk"] == ["Draft ", "Proposal"]
+
+            status, _, body = await request(service, "GET", f"/jobs/{job_id}")
+            job = json.loads(body)
+            assert job["state"] == "completed"
+            assert job["stages"]["rfp_summary"] == {"state": "finished", "seconds": 1.5}
+            status, headers, body = await request(service, "GET", f"/jobs/{job_id}/result")
+            assert status == 200
+            assert body.decode() == f"Proposal for {job_id}"
+            # The upload is deleted once the proposal is written.
+            assert not os.path.exists(service.jobs[job_id].rfp_path)
+
+    asyncio.run(scenario())
+
+
+def test_failed_job_reports_its_error(tmp_path):
+    async def scenario():
+        pipeline = GatedPipeline(fail=True)
+        async with running(tmp_path, pipeline) as service:
+            job_id = await submit(service)
+            pipeline.release()
+            await until(lambda: service.jobs[job_id].state == "failed")
+            status, _, body = await request(service, "GET", f"/jobs/{job_id}")
+            assert json.loads(body)["error"] == "RuntimeError: extraction failed"
+            status, _, _ = await request(service, "GET", f"/jobs/{job_id}/result")
+            assert status == 409
+
+    asyncio.run(scenario())
+
+
+def test_finished_jobs_are_evicted_by_count_and_age(tmp_path):
+    async def scenario():
+        pipeline = GatedPipeline()
+        async with running(tmp_path, pipeline, max_documents=1, job_ttl=60, max_finished=1) as service:
+            first = await submit(service)
+            second = await submit(service)
+            directory = service.jobs[first].directory
+            pipeline.release()
+            await until(lambda: len(pipeline.started) == 2)
+            pipeline.release()
+            await until(lambda: first not in service.jobs and service.jobs[second].state == "completed")
+            assert not os.path.exists(directory)
+            status, _, _ = await request(service, "GET", f"/jobs/{first}")
+            assert status == 404
+
+            assert service.evict(now=time.time() + 30) == 0
+            directory = service.jobs[second].directory
+            assert service.evict(now=time.time() + 61) == 1
+            assert service.jobs == {}
+            assert not os.path.exists(directory)
+
+    asyncio.run(scenario())
+
+
+def test_pipeline_runs_on_the_stub_backend(tmp_path, stub_backend, monkeypatch):
+    import main
+    from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+    monkeypatch.chdir(tmp_path)
+    write_synthetic_pdf(str(tmp_path / "rfp.pdf"), 8)
+    with open(tmp_path / "rfp.pdf", "rb") as f:
+        pdf = f.read()
+
+    async def scenario():
+        async with running(tmp_path, lambda rfp_path, output_path, **kwargs: main.run_pipeline(
+                rfp_path, output_path, max_workers=4, **kwargs)) as service:
+            status, _, body = await request(service, "POST", "/jobs?tenant=acme", pdf)
+            assert status == 202
+            job_id = json.loads(body)["id"]
+            status, _, body = await request(service, "GET", f"/jobs/{job_id}/events")
+            names = [line[len("event: "):] for line in body.decode().splitlines() if line.startswith("event: ")]
+            assert names[-1] == "completed"
+            assert "chunk" in names
+            status, _, body = await request(service, "GET", f"/jobs/{job_id}/result")
+            assert status == 200
+            assert "Stub response" in body.decode()
+            assert json.loads((await request(service, "GET", f"/jobs/{job_id}"))[2])["stages"]["final_response"]["state"] \
+                == "finished"
+
+    asyncio.run(scenario())
@@ -0,0 +1,111 @@
+# tests/test_streaming.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import retry_utils
+from utils.api_utils import get_model
+from utils.backends import StubAPIError
+from utils.retry_utils import model_retry
+from utils.scheduler import map_with_context
+from utils.streaming import StreamingModel, stream_to
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+class FailsMidStream:
+    """Wraps a stub model so that the first streamed call breaks off after its first chunk."""
+
+    def __init__(self, model):
+        self.model = model
+        self.failed = False
+
+    def generate_content(self, prompt, **kwargs):
+        stream = self.model.generate_content(prompt, **kwargs)
+        if self.failed:
+            return stream
+        self.failed = True
+
+        def broken():
+            yield next(iter(stream))
+            raise StubAPIError(503, "Injected failure")
+
+        return broken()
+
+
+def test_response_streams_into_the_partial_file_and_is_renamed_when_complete(stub_backend, tmp_path):
+    path = str(tmp_path / "out" / "plan.md")
+    seen = []
+
+    def on_chunk(text):
+        # While chunks arrive only the partial file exists.
+        seen.append((text, os.path.exists(f"{path}.partial"), os.path.exists(path)))
+
+    model = get_model("gemini-pro")
+    with stream_to(path, on_chunk) as sink:
+        response = model.generate_content("Write the delivery plan.")
+    assert sink.chunks > 1
+    assert all(partial and not final for _, partial, final in seen)
+    assert "".join(text for text, _, _ in seen) == response.text
+    assert read(path) == response.text
+    assert not os.path.exists(f"{path}.partial")
+
+
+def test_each_call_starts_the_file_over(stub_backend, tmp_path):
+    path = str(tmp_path / "plan.md")
+    seen = []
+    model = get_model("gemini-pro")
+    with stream_to(path, seen.append):
+        first = model.generate_content("First draft.").text
+        second = model.generate_content("Second draft.").text
+    assert seen.count(None) == 1
+    assert "".join(seen[:seen.index(None)]) == first
+    assert "".join(seen[seen.index(None) + 1:]) == second
+    assert read(path) == second
+
+
+def test_pool_threads_stream_only_with_the_callers_context(stub_backend, tmp_path):
+    path = str(tmp_path / "plan.md")
+    model = get_model("gemini-pro")
+    with ThreadPoolExecutor(max_workers=2) as executor, stream_to(path) as sink:
+        executor.submit(model.generate_content, "Without the context.").result()
+        assert sink.chunks == 0 and not os.path.exists(path)
+        texts = list(map_with_context(executor, lambda prompt: model.generate_content(prompt).text, ["With the context."]))
+    assert sink.chunks > 0
+    assert read(path) == texts[0]
+
+
+def test_calls_alongside_a_streaming_call_are_not_streamed(stub_backend, tmp_path):
+    path = str(tmp_path / "plan.md")
+    seen = []
+    model = get_model("gemini-pro")
+    with ThreadPoolExecutor(max_workers=1) as executor, stream_to(path, seen.append) as sink:
+        # Holding the sink stands in for a call already streaming into it on another thread.
+        assert sink.claim()
+        try:
+            text = list(map_with_context(executor, lambda prompt: model.generate_content(prompt).text, ["Alongside."]))[0]
+        finally:
+            sink.release()
+    assert text.startswith("## Stub response")
+    assert seen == [] and not os.path.exists(path)
+
+
+def test_a_retry_tells_the_listener_to_discard_the_broken_response(stub_backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(retry_utils, "BASE_DELAY", 0.0)
+    path = str(tmp_path / "plan.md")
+    seen = []
+    model = StreamingModel(FailsMidStream(stub_backend.create_model("gemini-pro")))
+
+    @model_retry
+    def ask():
+        return model.generate_content("Write the delivery plan.").text
+
+    with stream_to(path, seen.append):
+        text = ask()
+    assert seen.count(None) == 1
+    reset = seen.index(None)
+    assert reset == 1 and text.startswith(seen[0])
+    assert "".join(seen[reset + 1:]) == text
+    assert read(path) == text
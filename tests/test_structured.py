@@ -0,0 +1,131 @@
+# tests/test_structured.py
+import copy
+
+import pytest
+
+from utils.structured import (
+    SCHEMAS, StructuredOutputError, StructuredOutputMixin, cost_summary, cost_table, gantt_chart, parse_json, validate,
+)
+
+COSTS = {
+    "currency": "OMR",
+    "items": [
+        {"category": "personnel", "item": "Cloud Architect", "quantity": 20, "unit": "days", "unit_cost": 400,
+         "total_cost": 9000, "phase": "Design"},
+        {"category": "software", "item": "Monitoring licence", "quantity": 2, "unit_cost": 1250.5},
+        {"category": "personnel", "item": "Engineer", "quantity": 10, "unit_cost": 300, "phase": "Build"},
+    ],
+}
+
+PHASES = {
+    "phases": [
+        {"name": "Design", "start": "2025-01-06", "end": "2025-02-14",
+         "resources": [{"role": "Architect", "count": 1, "days": 20}],
+         "milestones": [{"name": "Design sign-off", "date": "2025-02-14"}]},
+        {"name": "Build", "start": "2025-02-17", "end": "2025-05-30", "depends_on": ["Design", "Procurement"],
+         "resources": [{"role": "Engineer", "count": 2, "days": 60}]},
+    ],
+}
+
+
+class Extractor(StructuredOutputMixin):
+    """Answers extraction calls from a queue of canned outputs and records the errors it was sent."""
+
+    agent_name = "Delivery Lead"
+    model_name = "gemini-pro"
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.errors = []
+
+    def _structured_call(self, kind, response, errors):
+        self.errors.append(list(errors))
+        return self.outputs.pop(0)
+
+
+class StubExtractor(StructuredOutputMixin):
+    agent_name = "Delivery Lead"
+    model_name = "gemini-pro"
+
+
+def test_validate_reports_each_mismatch_with_its_path():
+    schema = SCHEMAS["cost_items"].schema
+    errors = validate({"currency": "OMR", "items": [{"category": "catering", "item": 3, "quantity": "two"}]}, schema)
+    assert errors == [
+        "$.items[0].unit_cost is required",
+        "$.items[0].category must be one of personnel, software, infrastructure, services, travel, contingency",
+        "$.items[0].item must be a string",
+        "$.items[0].quantity must be a number",
+    ]
+    assert validate({"currency": "OMR", "items": "none"}, schema) == ["$.items must be an array"]
+    assert validate([], schema) == ["$ must be an object"]
+    assert validate({"items": []}, schema) == ["$.currency is required"]
+    assert validate({"currency": "OMR", "items": []}, schema) == []
+
+
+def test_booleans_are_not_numbers():
+    assert validate(True, {"type": "number"}) == ["$ must be a number"]
+    assert validate(True, {"type": "integer"}) == ["$ must be an integer"]
+    assert validate(3, {"type": "integer"}) == []
+
+
+def test_cost_totals_are_recomputed():
+    costs = SCHEMAS["cost_items"].validate(copy.deepcopy(COSTS))
+    assert [item["total_cost"] for item in costs["items"]] == [8000, 2501.0, 3000]
+    summary = cost_summary(costs)
+    assert summary["by_category"] == {"personnel": 11000, "software": 2501.0}
+    assert summary["by_phase"] == {"Design": 8000, "unphased": 2501.0, "Build": 3000}
+    assert summary["total"] == 13501.0
+    table = cost_table(costs)
+    assert "| **Personnel subtotal** | | | | **11,000.00** |" in table
+    assert table.endswith("| **Total** | | | | **13,501.00** |")
+
+
+def test_negative_costs_are_rejected():
+    costs = copy.deepcopy(COSTS)
+    costs["items"][1]["unit_cost"] = -5
+    with pytest.raises(StructuredOutputError) as error:
+        SCHEMAS["cost_items"].validate(costs)
+    assert error.value.errors == ["$.items[1] has a negative quantity or unit cost"]
+
+
+def test_phase_repairs_drop_unknown_dependencies_and_reject_bad_dates():
+    phases = SCHEMAS["phases"].validate(copy.deepcopy(PHASES))
+    assert phases["phases"][1]["depends_on"] == ["Design"]
+    assert ":p1, 2025-01-06, 2025-02-14" in gantt_chart(phases)
+
+    backwards = copy.deepcopy(PHASES)
+    backwards["phases"][0]["end"] = "2024-12-31"
+    backwards["phases"][1]["milestones"] = [{"name": "Go-live", "date": "June"}]
+    with pytest.raises(StructuredOutputError) as error:
+        SCHEMAS["phases"].validate(backwards)
+    assert error.value.errors == ["$.phases[0] ends before it starts",
+                                  "$.phases[1] milestone 'Go-live' needs a YYYY-MM-DD date"]
+
+
+def test_parse_json_tolerates_code_fences():
+    assert parse_json('```json\n{"slas": []}\n```') == {"slas": []}
+    assert parse_json("no json here") is None
+    assert parse_json("{not json}") is None
+    assert parse_json(None) is None
+
+
+def test_invalid_output_is_retried_with_its_errors():
+    extractor = Extractor(['{"slas": [{"service": "Portal"}]}',
+                           '{"slas": [{"service": "Portal", "metric": "availability", "target": "99.9%"}]}'])
+    value = extractor.extract_structured("slas", "The portal is available 99.9% of the time.")
+    assert value == {"slas": [{"service": "Portal", "metric": "availability", "target": "99.9%"}]}
+    assert extractor.errors == [[], ["$.slas[0].metric is required", "$.slas[0].target is required"]]
+
+
+def test_output_still_invalid_after_the_last_attempt_gives_none():
+    extractor = Extractor(["not json", '{"slas": "none"}'])
+    assert extractor.extract_structured("slas", "No SLAs.") is None
+    assert extractor.errors == [[], ["the output is not a JSON object"]]
+
+
+@pytest.mark.parametrize("kind", sorted(SCHEMAS))
+def test_stub_backend_output_passes_validation(stub_backend, kind):
+    value = StubExtractor().extract_structured(kind, "A response restated as structured data.")
+    assert value is not None
+    assert validate(value, SCHEMAS[kind].schema) == []
@@ -0,0 +1,127 @@
+# tests/test_text_store.py
+import hashlib
+import random
+
+import pytest
+
+from utils.checkpoint import hash_value
+from utils.chunking import split_sections
+from utils.pdf_utils import ExtractedDocument
+from utils.text_store import MappedDocument, TextStore
+
+PAGES = [
+    "1. Introduction\nThe Ministry invites proposals for a cloud migration.",
+    "2. Scope\nData must stay in Muscat — Oman (سلطنة عُمان), with 99.9% availability.",
+    "",
+    "3. Timeline\nGo-live by Q3; budget in OMR ¥€ and 🚀 emoji.",
+    "4. Evaluation\nPlain ASCII page.",
+]
+TEXT = "\n".join(PAGES)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TextStore.write(str(tmp_path / "rfp.txt"), iter(PAGES))
+    yield store
+    store.close()
+
+
+def test_length_and_text_match_the_joined_pages(store):
+    assert len(store) == len(TEXT)
+    assert str(store) == TEXT
+    assert store.ascii_pages == [True, False, True, False, True]
+
+
+def test_slices_match_str_slicing(store):
+    rng = random.Random(0)
+    for _ in range(2000):
+        start, end = rng.randint(-10, len(TEXT) + 10), rng.randint(-10, len(TEXT) + 10)
+        assert store[start:end] == TEXT[start:end]
+    assert store[:] == TEXT
+    assert store[-5:] == TEXT[-5:]
+    assert store[10:10] == ""
+
+
+def test_every_slice_boundary_maps_to_a_character_boundary(store):
+    for start in range(len(TEXT)):
+        assert store[start:start + 3] == TEXT[start:start + 3]
+
+
+def test_integer_indexing_matches_str(store):
+    for index in (0, 1, TEXT.index("—"), TEXT.index("🚀"), len(TEXT) - 1, -1, -len(TEXT)):
+        assert store[index] == TEXT[index]
+    for index in (len(TEXT), -len(TEXT) - 1):
+        with pytest.raises(IndexError):
+            store[index]
+    with pytest.raises(TypeError):
+        store["1"]
+
+
+def test_stepped_slices_are_rejected(store):
+    with pytest.raises(ValueError):
+        store[::2]
+
+
+def test_pages_and_page_views(store):
+    document = ExtractedDocument(PAGES)
+    assert [offset for offset, _ in store.pages()] == document.page_offsets
+    assert [page for _, page in store.pages()] == PAGES
+    assert bytes(store.page_view(1)) == PAGES[1].encode("utf-8")
+    assert bytes(store.page_view(2)) == b""
+
+
+def test_find_and_rfind_use_character_offsets(store):
+    for sub in ("Muscat", "\n", "🚀", "Plain", "missing"):
+        assert store.find(sub) == TEXT.find(sub)
+        assert store.rfind(sub) == TEXT.rfind(sub)
+    assert store.find("a", 100, 150) == TEXT.find("a", 100, 150)
+
+
+@pytest.mark.parametrize("start, end", [(-40, None), (-40, -5), (-10**6, 60), (5, -10**6), (10**6, None), (30, 20)])
+def test_find_and_rfind_normalize_bounds_like_str(store, start, end):
+    for sub in ("a", "\n", "🚀", ""):
+        assert store.find(sub, start, end) == TEXT.find(sub, start, end)
+        assert store.rfind(sub, start, end) == TEXT.rfind(sub, start, end)
+
+
+def test_hashes_match_those_of_the_text(store):
+    assert store.json_hash() == hash_value(TEXT)
+    assert hash_value(store) == hash_value(TEXT)
+    assert store.sha256() == hashlib.sha256(TEXT.encode("utf-8")).hexdigest()
+
+
+def test_reopened_store_reads_the_same_text(store):
+    reopened = TextStore(store.path)
+    try:
+        assert str(reopened) == TEXT
+    finally:
+        reopened.close()
+
+
+def test_empty_document(tmp_path):
+    store = TextStore.write(str(tmp_path / "empty.txt"), iter([]))
+    try:
+        assert len(store) == 0
+        assert str(store) == ""
+        assert store[0:10] == ""
+        assert store.json_hash() == hash_value("")
+    finally:
+        store.close()
+
+
+def test_mapped_document_matches_the_in_memory_document(store):
+    document = ExtractedDocument(PAGES)
+    mapped = MappedDocument(store)
+    assert len(mapped) == len(document)
+    assert [mapped.page_text(page) for page in range(len(PAGES))] == PAGES
+    assert mapped.page_hashes() == document.page_hashes()
+    assert mapped.page_at(TEXT.index("Timeline")) == 3
+    assert [(section.title, section.start, section.end) for section in split_sections(store)] == \
+        [(section.title, section.start, section.end) for section in split_sections(TEXT)]
+
+
+def test_shingles_match_those_of_the_text(store):
+    np = pytest.importorskip("numpy")
+    from utils.semantic_cache import shingles
+
+    assert np.array_equal(shingles(store), shingles(TEXT))
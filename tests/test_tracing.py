@@ -0,0 +1,27 @@
+# tests/test_tracing.py
+from agents.presale_manager import PresaleManager
+from utils.api_utils import get_model
+from utils.quality_gate import Gap
+from utils.tracing import aggregate, get_tracer
+
+
+class Agent:
+    """The parts of an agent the Presale Manager uses when it sends a follow-up to the agent's model."""
+
+    def __init__(self):
+        self.model = get_model("gemini-pro")
+
+    def relevant_passages(self, query, k=5):
+        return []
+
+
+def test_follow_ups_are_recorded_against_the_agent_whose_model_answers(stub_backend):
+    tracer = get_tracer()
+    manager = PresaleManager(rfp_summary="A cloud migration for the Ministry.")
+    with tracer.span("run", stage="quality_gate") as run:
+        manager.request_missing_parts(Agent(), "Tech Lead", "## Approach\nLift and shift.",
+                                      [Gap("Architecture diagram", "Add a Mermaid architecture diagram.")])
+    spans = tracer.pop_trace(run.trace_id)
+    method = next(span for span in spans if span.name == "Presale Manager.request_missing_parts")
+    assert method.attributes["agent"] == "Tech Lead"
+    assert list(aggregate(spans)) == [("Tech Lead", "quality_gate")]
@@ -0,0 +1,118 @@
+# utils/api_utils.py
+import json
+import logging
+import threading
+
+from utils.backends import get_backend
+from utils.rate_limiter import RateLimitedModel, get_rate_limiter
+from utils.response_cache import CachedModel, cached_content_key, get_response_cache
+from utils.streaming import StreamingModel
+from utils.tracing import TracedModel
+
+
+class LazyModel:
+    """
+    Defers creating the backend model, and so importing and configuring its SDK, until the first
+    call that needs it. Agents built for a run whose stages are all restored never touch the API.
+    """
+
+    def __init__(self, backend, model_name, generation_config=None, cached_content=None):
+        self.backend = backend
+        self.model_name = model_name
+        self._generation_config = dict(generation_config or {})
+        self.cached_content = cached_content
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                self._model = self.backend.create_model(self.model_name, generation_config=self._generation_config or None,
+                                                        cached_content=self.cached_content)
+            return self._model
+
+    def generate_content(self, prompt, **kwargs):
+        return self.model.generate_content(prompt, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class ModelRegistry:
+    """
+    Hands out one shared model per backend, model name, generation config and cached context.
+    Every layer of the returned model is safe to call from many threads, so all agents of all
+    documents borrow the same few objects and only the first document pays for creating them.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def get(self, key, factory):
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._models[key] = factory()
+                self.created += 1
+                logging.info(f"ModelRegistry: Created shared model for {key[1]}.")
+            else:
+                self.reused += 1
+            return model
+
+    def stats(self):
+        with self._lock:
+            return {"models": len(self._models), "created": self.created, "reused": self.reused}
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry():
+    return _registry
+
+
+def model_namespace(model_name, backend=None):
+    """
+    Names a model as the caches key it: Gemini models by name, other backends' prefixed with the
+    backend, so answers from the offline stub are never served to a real run.
+    """
+    backend = backend or get_backend()
+    return model_name if backend.name == "gemini" else f"{backend.name}:{model_name}"
+
+
+def _build_model(backend, model_name, generation_config, cached_content):
+    model = LazyModel(backend, model_name, generation_config=generation_config, cached_content=cached_content)
+    if cached_content is not None:
+        model_name = f"{model_name}@{cached_content_key(cached_content)}"
+    cache_name = model_namespace(model_name, backend)
+    cached = CachedModel(RateLimitedModel(model, get_rate_limiter()), cache_name, get_response_cache())
+    return TracedModel(StreamingModel(cached), model_name)
+
+
+def get_model(model_name, generation_config=None, cached_content=None):
+    """
+    Returns a model from the configured backend (Gemini, or the offline stub) whose generate_content
+    calls go through the shared response cache and, on a cache miss, the process-wide rate limiter.
+    Models are borrowed from the process-wide ModelRegistry, so agents asking for the same model and
+    config share one client, and all Gemini models share the SDK's default client and connection.
+    Calls made inside utils.streaming.stream_to() are streamed to disk as they arrive,
+    and every call is recorded as a tracing span.
+    When a cached-content handle is given, the model answers with that context attached.
+    The backend model itself is only created on the first call.
+    """
+    backend = get_backend()
+    key = (
+        id(backend),
+        model_name,
+        json.dumps(generation_config or {}, sort_keys=True, default=str),
+        getattr(cached_content, "name", None),
+    )
+    return _registry.get(key, lambda: _build_model(backend, model_name, generation_config, cached_content))
@@ -0,0 +1,263 @@
+# utils/backends.py
+import datetime
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from utils.chunking import estimate_tokens
+
+STUB_WORDS = (
+    "cloud migration managed services availability security compliance oman data residency platform "
+    "integration monitoring resilience governance delivery phase milestone resource licence support "
+    "incident escalation testing acceptance performance architecture network storage backup recovery"
+).split()
+
+
+class GeminiBackend:
+    """The Google Gemini API. The client is configured on first use rather than at import time."""
+
+    name = "gemini"
+
+    def __init__(self):
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def configure(self):
+        import google.generativeai as genai
+
+        with self._lock:
+            if not self._configured:
+                # grpc (the SDK default) keeps one long-lived HTTP/2 channel per process; RFP_GEMINI_TRANSPORT=rest
+                # switches to a keep-alive HTTP session instead.
+                genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"),
+                                transport=os.environ.get("RFP_GEMINI_TRANSPORT") or None)
+                self._configured = True
+                logging.info("Google Generative AI configured.")
+        return genai
+
+    def create_model(self, model_name, generation_config=None, cached_content=None):
+        genai = self.configure()
+        if cached_content is not None:
+            return genai.GenerativeModel.from_cached_content(cached_content, generation_config=generation_config)
+        return genai.GenerativeModel(model_name, generation_config=generation_config)
+
+    def create_cached_content(self, model_name, contents, ttl):
+        self.configure()
+        from google.generativeai import caching
+
+        name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        return caching.CachedContent.create(model=name, contents=contents, ttl=ttl, display_name="rfp-content")
+
+
+class StubAPIError(Exception):
+    """Injected API failure carrying an HTTP status `code`, like google.api_core exceptions."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class StubUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class StubResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class StubStream:
+    """Yields a stub response in chunks, paced to the configured token throughput."""
+
+    def __init__(self, text, usage_metadata, chunk_delay, chunk_chars=400):
+        self.text = text
+        self.usage_metadata = usage_metadata
+        self.chunk_delay = chunk_delay
+        self.chunk_chars = chunk_chars
+
+    def __iter__(self):
+        for start in range(0, len(self.text), self.chunk_chars):
+            time.sleep(self.chunk_delay)
+            yield StubResponse(self.text[start:start + self.chunk_chars])
+
+
+def stub_json(schema, rng):
+    """Returns a deterministic value matching a response schema; dates are increasing, so phases are in order."""
+    day = [datetime.date(2025, 1, 6)]
+
+    def sample(schema):
+        kind = schema.get("type")
+        if kind == "object":
+            return {name: sample(subschema) for name, subschema in schema.get("properties", {}).items()}
+        if kind == "array":
+            return [sample(schema["items"]) for _ in range(rng.randint(2, 4))]
+        if kind == "string":
+            if "enum" in schema:
+                return rng.choice(schema["enum"])
+            if "YYYY-MM-DD" in schema.get("description", ""):
+                day[0] += datetime.timedelta(days=rng.randint(7, 30))
+                return day[0].isoformat()
+            return " ".join(rng.choice(STUB_WORDS) for _ in range(rng.randint(1, 4)))
+        if kind == "integer":
+            return rng.randint(1, 10)
+        if kind == "number":
+            return float(rng.randint(1, 2000))
+        if kind == "boolean":
+            return rng.random() < 0.5
+        return None
+
+    return sample(schema)
+
+
+class StubModel:
+    """
+    Offline stand-in for GenerativeModel. Responses are deterministic for a given prompt; latency,
+    throughput and failures follow the backend's configuration. A model created with a
+    response_schema answers with JSON matching it.
+    """
+
+    def __init__(self, backend, model_name):
+        self.backend = backend
+        self.model_name = model_name
+        self._generation_config = {}
+
+    def _text(self, prompt):
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "little")
+        rng = random.Random(seed)
+        schema = self._generation_config.get("response_schema")
+        if schema is not None:
+            return json.dumps(stub_json(schema, rng))
+        words = " ".join(rng.choice(STUB_WORDS) for _ in range(self.backend.output_tokens))
+        return (
+            f"## Stub response ({self.model_name})\n\n{words}\n\n"
+            "| Item | Description | Quantity | Unit Cost | Total Cost |\n"
+            "|------|-------------|----------|-----------|------------|\n"
+            f"| Cloud Architect | Design | 1 | {rng.randint(800, 1500)} | {rng.randint(20000, 90000)} |\n\n"
+            "```mermaid\ngraph TD\n    A[Client] --> B[Landing Zone]\n    B --> C[Workloads]\n```\n"
+        )
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        prompt_text = prompt if isinstance(prompt, str) else str(prompt)
+        self.backend.record_call()
+        first_token = self.backend.sample_latency()
+        error = self.backend.sample_error()
+        if error is not None:
+            time.sleep(first_token)
+            raise error
+        text = self._text(prompt_text)
+        completion_tokens = estimate_tokens(text)
+        usage = StubUsage(estimate_tokens(prompt_text), completion_tokens)
+        generation_time = completion_tokens / self.backend.tokens_per_second * self.backend.time_scale
+        time.sleep(first_token)
+        if stream:
+            chunks = max(1, (len(text) + 399) // 400)
+            return StubStream(text, usage, generation_time / chunks)
+        time.sleep(generation_time)
+        return StubResponse(text, usage)
+
+
+class StubBackend:
+    """
+    In-process fake model backend for offline runs and load tests.
+
+    latency: "<distribution>:<params>" for time to first token in seconds, where distribution is
+    fixed:<s>, uniform:<low>,<high>, normal:<mean>,<stddev> or lognormal:<mu>,<sigma>.
+    error_rate: probability that a call fails with one of `error_codes` (HTTP statuses).
+    time_scale: multiplies every delay, so 0.01 runs a realistic profile a hundred times faster.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency="fixed:0.5", tokens_per_second=150.0, output_tokens=600, error_rate=0.0,
+                 error_codes=(429, 503), time_scale=1.0, seed=0):
+        self.distribution, _, params = latency.partition(":")
+        self.params = [float(value) for value in params.split(",") if value]
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.error_codes = list(error_codes)
+        self.time_scale = time_scale
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        logging.info(f"StubBackend initialized: latency={latency}, {tokens_per_second} tokens/s, "
+                     f"error_rate={error_rate}, time_scale={time_scale}")
+
+    def record_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def sample_latency(self):
+        with self._lock:
+            if self.distribution == "uniform":
+                value = self._rng.uniform(*self.params)
+            elif self.distribution == "normal":
+                value = self._rng.gauss(*self.params)
+            elif self.distribution == "lognormal":
+                value = self._rng.lognormvariate(*self.params)
+            else:
+                value = self.params[0] if self.params else 0.0
+        return max(0.0, value) * self.time_scale
+
+    def sample_error(self):
+        with self._lock:
+            if self.error_rate <= 0 or self._rng.random() >= self.error_rate:
+                return None
+            code = self._rng.choice(self.error_codes)
+        message = "Resource has been exhausted (e.g. check quota). Please retry in 1s" if code == 429 else "Injected failure"
+        return StubAPIError(code, message)
+
+    def create_model(self, model_name, generation_config=None, cached_content=None):
+        model = StubModel(self, model_name)
+        model._generation_config = dict(generation_config or {})
+        return model
+
+    def create_cached_content(self, model_name, contents, ttl):
+        raise NotImplementedError("The stub backend does not support cached context.")
+
+    @classmethod
+    def from_env(cls):
+        codes = os.environ.get("RFP_STUB_ERROR_CODES", "429,503")
+        return cls(
+            latency=os.environ.get("RFP_STUB_LATENCY", "fixed:0.5"),
+            tokens_per_second=float(os.environ.get("RFP_STUB_TOKENS_PER_SECOND", 150)),
+            output_tokens=int(os.environ.get("RFP_STUB_OUTPUT_TOKENS", 600)),
+            error_rate=float(os.environ.get("RFP_STUB_ERROR_RATE", 0)),
+            error_codes=[int(code) for code in codes.split(",") if code],
+            time_scale=float(os.environ.get("RFP_STUB_TIME_SCALE", 1)),
+            seed=int(os.environ.get("RFP_STUB_SEED", 0)),
+        )
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def set_backend(backend):
+    """Replaces the process-wide backend, e.g. with a StubBackend configured by a benchmark."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def get_backend():
+    """Returns the process-wide model backend selected by RFP_MODEL_BACKEND ("gemini" or "stub")."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = os.environ.get("RFP_MODEL_BACKEND", "gemini")
+            if name == "stub":
+                _backend = StubBackend.from_env()
+            elif name == "gemini":
+                _backend = GeminiBackend()
+            else:
+                raise ValueError(f"Unknown model backend: {name}")
+        return _backend
@@ -0,0 +1,99 @@
+# utils/batch.py
+import glob
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def resolve_inputs(pattern):
+    """Expands a directory (all PDFs inside it) or a glob pattern into a sorted list of PDF paths."""
+    if os.path.isdir(pattern):
+        # Every file, so that upper-case .PDF extensions are kept by the filter below.
+        pattern = os.path.join(pattern, "*")
+    return sorted(path for path in glob.glob(pattern, recursive=True) if path.lower().endswith(".pdf"))
+
+
+def batch_root(rfp_paths):
+    """Returns the deepest directory that contains every RFP of a batch."""
+    if not rfp_paths:
+        return "."
+    return os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in rfp_paths])
+
+
+def document_name(rfp_path, root=None):
+    """
+    Names an RFP by its path relative to the batch root, without the extension, so that `a/rfp.pdf`
+    and `b/rfp.pdf` found by a recursive glob do not share a proposal or a state directory. For the
+    files of a single directory this is just the file stem.
+    """
+    if root is None:
+        return os.path.splitext(os.path.basename(rfp_path))[0]
+    return os.path.splitext(os.path.relpath(os.path.abspath(rfp_path), root))[0]
+
+
+def output_path_for(rfp_path, output_dir, root=None):
+    return os.path.join(output_dir, f"{document_name(rfp_path, root)}_technical_proposal.md")
+
+
+class BatchRunner:
+    """
+    Runs a pipeline over many RFPs at once. Documents overlap up to `max_documents` at a time;
+    model calls from every document share the process-wide rate limiter and response cache.
+    The pipeline is called as pipeline(rfp_path, output_path, name), where `name` is unique within
+    the batch (see document_name) and can key per-document state.
+    """
+
+    def __init__(self, pipeline, output_dir="temp", max_documents=2):
+        self.pipeline = pipeline
+        self.output_dir = output_dir
+        self.max_documents = max_documents
+        self.root = None
+        self.completed = 0
+        self.failed = []
+        self._lock = threading.Lock()
+
+    def _run_one(self, rfp_path, position, total):
+        logging.info(f"Batch [{position}/{total}]: Starting {rfp_path}")
+        start = time.perf_counter()
+        self.pipeline(rfp_path, output_path_for(rfp_path, self.output_dir, self.root), document_name(rfp_path, self.root))
+        return time.perf_counter() - start
+
+    def run(self, rfp_paths):
+        """Processes every path and returns a summary with per-document timings and throughput."""
+        total = len(rfp_paths)
+        self.root = batch_root(rfp_paths)
+        durations = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_documents) as executor:
+            futures = {
+                executor.submit(self._run_one, path, position, total): path
+                for position, path in enumerate(rfp_paths, start=1)
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                with self._lock:
+                    try:
+                        durations[path] = future.result()
+                        self.completed += 1
+                        logging.info(f"Batch: Finished {path} in {durations[path]:.1f}s "
+                                     f"({self.completed + len(self.failed)}/{total} done).")
+                    except Exception as e:
+                        self.failed.append(path)
+                        logging.error(f"Batch: Failed {path}: {e} ({self.completed + len(self.failed)}/{total} done).")
+                    elapsed = time.perf_counter() - start
+                    logging.info(f"Batch: Throughput {self.completed * 3600 / elapsed:.1f} documents/hour.")
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            "documents": total,
+            "completed": self.completed,
+            "failed": list(self.failed),
+            "seconds": elapsed,
+            "documents_per_hour": self.completed * 3600 / elapsed if elapsed else 0.0,
+            "durations": durations,
+        }
+        logging.info(f"Batch complete: {self.completed}/{total} documents in {elapsed:.1f}s "
+                     f"({summary['documents_per_hour']:.1f} documents/hour).")
+        return summary
@@ -0,0 +1,102 @@
+# utils/checkpoint.py
+import difflib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+# Bump when stage outputs change shape so old checkpoints are ignored.
+STATE_VERSION = 1
+MISSING = object()
+
+
+def hash_value(value):
+    """Returns a stable hash of a JSON-serialisable value."""
+    if hasattr(value, "json_hash"):
+        # A TextStore hashes itself a page at a time instead of being decoded whole.
+        return value.json_hash()
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def atomic_write(path, data):
+    """Writes text to `path` so readers only ever see the old or the complete new file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class RunState:
+    """
+    Per-run state directory holding each pipeline stage's output together with the hash of the
+    inputs that produced it. With `resume` set, stages whose input hash is unchanged are loaded
+    from disk instead of being recomputed.
+    """
+
+    def __init__(self, state_dir, fingerprint=None, resume=False):
+        self.state_dir = state_dir
+        self.fingerprint = fingerprint or {}
+        self.resume = resume
+        os.makedirs(state_dir, exist_ok=True)
+        logging.info(f"RunState: Using {state_dir} (resume={resume}).")
+
+    def _path(self, stage):
+        return os.path.join(self.state_dir, f"{stage}.json")
+
+    def input_hash(self, stage, inputs):
+        """Hashes a stage's name and inputs together with the run fingerprint and state version."""
+        return hash_value({"version": STATE_VERSION, "stage": stage, "run": self.fingerprint, "inputs": inputs})
+
+    def load(self, stage, input_hash):
+        """Returns the saved output of a stage if it was produced from the same inputs, else MISSING."""
+        if not self.resume:
+            return MISSING
+        try:
+            with open(self._path(stage)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return MISSING
+        if record.get("input_hash") != input_hash:
+            logging.info(f"RunState: Inputs of '{stage}' changed; recomputing.")
+            return MISSING
+        return record["value"]
+
+    def record_revision(self, page_hashes):
+        """
+        Stores the page hashes of the document being processed and returns the zero-based numbers of
+        its pages that are new or changed since the previously recorded revision, or None if there is
+        none. Pages are aligned by content, so an inserted page does not mark every later page as changed.
+        """
+        path = os.path.join(self.state_dir, "pages.json")
+        try:
+            with open(path) as f:
+                previous = json.load(f)["pages"]
+        except (OSError, ValueError, KeyError):
+            previous = None
+        atomic_write(path, json.dumps({"pages": page_hashes}))
+        if previous is None:
+            return None
+        changed, removed = [], 0
+        for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, previous, page_hashes, autojunk=False).get_opcodes():
+            if tag != "equal":
+                changed.extend(range(j1, j2))
+                removed += max(0, (i2 - i1) - (j2 - j1))
+        logging.info(f"RunState: {len(changed)} of {len(page_hashes)} pages new or changed since the last revision"
+                     f"{f', {removed} removed' if removed else ''}.")
+        return changed
+
+    def save(self, stage, input_hash, value):
+        record = {"stage": stage, "input_hash": input_hash, "saved_at": time.time(), "value": value}
+        atomic_write(self._path(stage), json.dumps(record, separators=(",", ":")))
@@ -0,0 +1,101 @@
+# utils/chunking.py
+import re
+
+# Rough ratio for English prose with the Gemini tokenizer; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+# Characters read from the start of a section to find its title.
+TITLE_WINDOW_CHARS = 1000
+
+HEADING_PATTERN = re.compile(
+    r"^[ \t]*("
+    r"#{1,6}[ \t]+\S.*"
+    r"|\d+(?:\.\d+)*\.?[ \t]+[A-Z][^\n]{0,80}"
+    r"|(?:SECTION|Section|PART|Part|ANNEX|Annex|APPENDIX|Appendix|SCHEDULE|Schedule)[ \t]+[\w.-]+[^\n]{0,80}"
+    r")[ \t]*$",
+    re.MULTILINE,
+)
+
+
+def estimate_tokens(text):
+    """Returns an approximate token count for `text`."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class Section:
+    """
+    A heading-delimited span of a document, addressed by character offsets. Its text is sliced from
+    the document when asked for, so a list of sections does not hold a second copy of the document.
+    """
+
+    def __init__(self, title, start, end, source):
+        self.title = title
+        self.start = start
+        self.end = end
+        self.source = source
+
+    @property
+    def text(self):
+        return self.source[self.start:self.end]
+
+    def __repr__(self):
+        return f"Section({self.title!r}, {self.start}, {self.end})"
+
+
+def _heading_starts(text):
+    if isinstance(text, str):
+        return [match.start() for match in HEADING_PATTERN.finditer(text)]
+    # A TextStore is scanned a page at a time. Headings are single lines and pages are joined by a
+    # newline, so no heading spans two pages and the result is the same as scanning the whole text.
+    return [offset + match.start() for offset, page in text.pages() for match in HEADING_PATTERN.finditer(page)]
+
+
+def split_sections(text):
+    """Splits a document (a string or a TextStore) into sections at lines that look like headings."""
+    starts = _heading_starts(text)
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = []
+    for index, start in enumerate(starts):
+        end = starts[index + 1] if index + 1 < len(starts) else len(text)
+        if end <= start:
+            continue
+        # Headings are at most a line of ~100 characters, so the title never needs the whole body.
+        head = text[start:min(end, start + TITLE_WINDOW_CHARS)]
+        title = head.strip().split("\n", 1)[0][:100] if index or HEADING_PATTERN.match(head) else "Preamble"
+        sections.append(Section(title, start, end, text))
+    return sections
+
+
+def _split_oversized(text, start, end, max_chars):
+    """Splits the span of `text` from `start` to `end` at paragraph, then line, then word boundaries within the budget."""
+    pieces = []
+    while end - start > max_chars:
+        window = text[start:start + max_chars]
+        # The first kind of boundary found in the second half of the window wins.
+        cuts = [window.rfind(boundary) + len(boundary) for boundary in ("\n\n", "\n", " ")]
+        cut = next((cut for cut in cuts if cut > max_chars // 2), max_chars)
+        pieces.append((start, start + cut))
+        start += cut
+    if end > start:
+        pieces.append((start, end))
+    return pieces
+
+
+def chunk_spans(text, max_tokens):
+    """
+    Packs consecutive sections into spans of at most `max_tokens` tokens so that chunk boundaries
+    fall on section boundaries wherever possible. Returns (start, end) offsets; the pieces of a
+    chunk are consecutive, so each chunk is one span of the document.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    spans, current = [], None
+    for section in split_sections(text):
+        for start, end in _split_oversized(text, section.start, section.end, max_chars):
+            if current and end - current[0] > max_chars:
+                spans.append(current)
+                current = None
+            current = (current[0] if current else start, end)
+    if current:
+        spans.append(current)
+    return spans
+
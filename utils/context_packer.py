@@ -0,0 +1,134 @@
+# utils/context_packer.py
+import datetime
+import logging
+import re
+
+from utils.backends import get_backend
+from utils.chunking import estimate_tokens, split_sections
+from utils.response_cache import register_cached_content
+
+DEFAULT_BUDGET_TOKENS = 20000
+CACHED_CONTEXT_TTL = datetime.timedelta(hours=1)
+CACHED_CONTEXT_NOTE = "The full RFP text is attached to this conversation as cached context; refer to it directly."
+OMITTED_MARKER = "\n[...]\n"
+
+# Terms that make an RFP section relevant to each agent. Matched as word prefixes, case-insensitively.
+AGENT_PROFILES = {
+    "Delivery Lead": [
+        "timeline", "schedule", "phase", "milestone", "deliverable", "plan", "resource", "staff", "governance",
+        "project management", "transition", "migration", "duration", "kick-off", "dependenc",
+    ],
+    "Tech Lead": [
+        "architecture", "technical", "technology", "platform", "integration", "api", "cloud", "infrastructure",
+        "network", "security", "database", "application", "interface", "hosting", "scalab", "migration",
+    ],
+    "BD Manager": [
+        "price", "pricing", "cost", "commercial", "payment", "budget", "licen", "fee", "rate", "invoice",
+        "penalt", "financial", "contract", "quotation", "bill of quantities", "boq", "tax", "currency",
+    ],
+    "SRE Lead": [
+        "sla", "service level", "availability", "uptime", "support", "incident", "monitor", "backup",
+        "recovery", "disaster", "maintenance", "escalation", "response time", "resolution", "patch", "24x7",
+    ],
+    "Test Lead": [
+        "test", "acceptance", "uat", "quality", "defect", "performance", "load", "penetration", "validation",
+        "verification", "sign-off", "criteria",
+    ],
+    "Internet Researcher": [
+        "client", "ministry", "authority", "organization", "organisation", "background", "regulat", "compliance",
+        "law", "local", "partner", "oman", "sector", "industry", "vision",
+    ],
+    "Presale Manager": [
+        "scope", "requirement", "objective", "evaluation", "criteria", "deliverable", "submission", "proposal",
+        "mandatory", "weighting", "background",
+    ],
+}
+
+
+def _keyword_pattern(keywords):
+    return re.compile(r"\b(?:" + "|".join(re.escape(keyword) for keyword in keywords) + r")", re.IGNORECASE)
+
+
+class ContextPacker:
+    """
+    Builds the "RFP Content" block for each agent. In "packed" mode each agent receives only the
+    sections most relevant to its role, kept in document order, within a per-agent token budget.
+    When a retrieval index is supplied, its BM25 ranking over passages replaces keyword density.
+    In "cached" mode the full text is uploaded once as a Gemini cached-context handle and prompts
+    refer to it instead of repeating it. "full" mode reproduces the original behaviour.
+    """
+
+    def __init__(self, rfp_content, mode="packed", budgets=None, model_name=None, index=None):
+        self.rfp_content = rfp_content
+        self.mode = mode
+        self.budgets = budgets or {}
+        self.index = index
+        self.sections = split_sections(rfp_content)
+        self.cached_content = None
+        self._patterns = {agent: _keyword_pattern(keywords) for agent, keywords in AGENT_PROFILES.items()}
+        if mode == "cached":
+            self.cached_content = create_cached_context(model_name, str(rfp_content))
+            if self.cached_content is None:
+                logging.warning("ContextPacker: Cached context unavailable, falling back to packed mode.")
+                self.mode = "packed"
+        logging.info(f"ContextPacker initialized in {self.mode} mode with {len(self.sections)} sections.")
+
+    def score(self, section, agent_name):
+        """Scores a section's relevance to an agent by keyword density, weighting matches in the title."""
+        pattern = self._patterns.get(agent_name)
+        if pattern is None:
+            return 0.0
+        body_hits = len(pattern.findall(section.text))
+        title_hits = len(pattern.findall(section.title))
+        return 5.0 * title_hits + 1000.0 * body_hits / (section.end - section.start + 500)
+
+    def pack(self, agent_name, budget_tokens=None):
+        """Returns the most relevant sections for an agent, in document order, within its token budget."""
+        budget = budget_tokens or self.budgets.get(agent_name, DEFAULT_BUDGET_TOKENS)
+        if estimate_tokens(self.rfp_content) <= budget:
+            return self.rfp_content
+        if self.index is not None:
+            query = " ".join(AGENT_PROFILES.get(agent_name, []))
+            spans = [(passage.start, passage.end) for passage in self.index.search(query, k=len(self.index.spans))]
+        else:
+            ranked = sorted(self.sections, key=lambda section: self.score(section, agent_name), reverse=True)
+            spans = [(section.start, section.end) for section in ranked]
+        selected, used = [], 0
+        for start, end in spans:
+            tokens = estimate_tokens(self.rfp_content[start:end])
+            if used + tokens > budget:
+                continue
+            selected.append((start, end))
+            used += tokens
+        selected.sort()
+        packed, previous_end = [], None
+        for start, end in selected:
+            if previous_end is not None and start != previous_end:
+                packed.append(OMITTED_MARKER)
+            packed.append(self.rfp_content[start:end])
+            previous_end = end
+        logging.info(f"ContextPacker: {agent_name} receives {len(selected)} spans (~{used} tokens).")
+        return "".join(packed)
+
+    def context_for(self, agent_name):
+        """Returns the text to use as an agent's "RFP Content"."""
+        if self.mode == "cached":
+            return CACHED_CONTEXT_NOTE
+        if self.mode == "full":
+            return self.rfp_content
+        return self.pack(agent_name)
+
+
+def create_cached_context(model_name, rfp_content, ttl=CACHED_CONTEXT_TTL):
+    """
+    Uploads the RFP once as a Gemini cached-content handle. Returns None when the model or API
+    does not support context caching (for example when the document is below the minimum size).
+    """
+    try:
+        cached_content = get_backend().create_cached_content(model_name, [rfp_content], ttl)
+        logging.info(f"ContextPacker: Created cached context {cached_content.name}.")
+        register_cached_content(cached_content, rfp_content)
+        return cached_content
+    except Exception as e:
+        logging.warning(f"ContextPacker: Could not create cached context: {e}")
+        return None
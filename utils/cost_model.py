@@ -0,0 +1,199 @@
+# utils/cost_model.py
+import datetime
+import json
+import logging
+import os
+
+try:
+    import numpy as np
+except ImportError:  # Without NumPy, costs come from the model as before.
+    np = None
+
+DEFAULT_RATE_CARD = os.path.join("data", "rate_card.json")
+# Average calendar days in a month, for phases given as start and end dates.
+CALENDAR_DAYS_PER_MONTH = 30.44
+DEFAULT_SCENARIOS = 5000
+PERCENTILES = (10, 50, 90)
+
+
+class RateCard:
+    """
+    Day rates per role, monthly infrastructure and licence costs, and the contingency percentage,
+    loaded from a local JSON file (see data/rate_card.json). Free-text role names from a delivery
+    plan are mapped to a rate card role by the first role whose `match` terms appear in the name.
+    """
+
+    def __init__(self, currency, roles, default_day_rate, infrastructure=None, licences=None, contingency_percent=10):
+        self.currency = currency
+        self.roles = roles
+        self.default_day_rate = default_day_rate
+        self.infrastructure = infrastructure or []
+        self.licences = licences or []
+        self.contingency_percent = contingency_percent
+        # One rate per rate card role, plus the default rate for roles that match none of them.
+        self.role_names = [role["name"] for role in roles] + ["Other"]
+        self.day_rates = np.array([role["day_rate"] for role in roles] + [default_day_rate], dtype=float)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            card = json.load(f)
+        return cls(card["currency"], card["roles"], card["default_day_rate"], card.get("infrastructure"),
+                   card.get("licences"), card.get("contingency_percent", 10))
+
+    def to_dict(self):
+        return {"currency": self.currency, "roles": self.roles, "default_day_rate": self.default_day_rate,
+                "infrastructure": self.infrastructure, "licences": self.licences,
+                "contingency_percent": self.contingency_percent}
+
+    def role_index(self, role):
+        name = role.lower()
+        for index, card_role in enumerate(self.roles):
+            if card_role["name"].lower() in name or any(term in name for term in card_role.get("match", [])):
+                return index
+        return len(self.roles)
+
+
+def load_rate_card(path=None):
+    """Returns the rate card named by `path` or RFP_RATE_CARD (default data/rate_card.json), or None if there is none."""
+    path = path or os.environ.get("RFP_RATE_CARD", DEFAULT_RATE_CARD)
+    if np is None:
+        logging.info("CostModel: NumPy is not installed; costs will come from the model.")
+        return None
+    if not os.path.exists(path):
+        logging.info(f"CostModel: No rate card at {path}; costs will come from the model.")
+        return None
+    return RateCard.load(path)
+
+
+class CostModel:
+    """
+    Prices the phases of a structured delivery plan (utils.structured "phases") against a rate card:
+    personnel from each phase's resources (people x days x day rate), infrastructure and licences
+    by phase duration, and contingency as a percentage of the rest.
+
+    All arithmetic is on arrays with a leading scenario axis, so `evaluate` prices one scenario or
+    thousands of rate and scope variations in the same few vector operations.
+    """
+
+    def __init__(self, rate_card, phases):
+        self.rate_card = rate_card
+        self.phases = phases["phases"]
+        self.phase_names = [phase["name"] for phase in self.phases]
+        # Rounded as they are quoted in the cost items, so the items add up to the evaluated totals.
+        self.months = np.round([max(self._days(phase), 1) / CALENDAR_DAYS_PER_MONTH for phase in self.phases], 2)
+        resources = [(index, resource) for index, phase in enumerate(self.phases) for resource in phase.get("resources") or []]
+        self.resource_roles = [resource["role"] for _, resource in resources]
+        self.resource_phase = np.array([index for index, _ in resources], dtype=int)
+        self.resource_role = np.array([rate_card.role_index(role) for role in self.resource_roles], dtype=int)
+        self.resource_people = np.array([resource.get("count", 1) for _, resource in resources], dtype=float)
+        self.person_days = self.resource_people * np.array([resource.get("days", 0) for _, resource in resources], dtype=float)
+        # Maps resources to their phase, so personnel cost per phase is one matrix product.
+        self.phase_matrix = np.zeros((len(resources), len(self.phases)))
+        self.phase_matrix[np.arange(len(resources)), self.resource_phase] = 1.0
+        self.people = self.resource_people @ self.phase_matrix
+        self.infrastructure_monthly = sum(item.get("monthly", 0) for item in rate_card.infrastructure)
+        self.licences_monthly = sum(item.get("monthly", 0) for item in rate_card.licences)
+        self.licences_per_person = sum(item.get("monthly_per_person", 0) for item in rate_card.licences)
+
+    @staticmethod
+    def _days(phase):
+        return (datetime.date.fromisoformat(phase["end"]) - datetime.date.fromisoformat(phase["start"])).days
+
+    def evaluate(self, rate_factors=None, scope_factors=None, infrastructure_factors=None, contingency_percent=None):
+        """
+        Prices S scenarios at once. `rate_factors` (S x roles) scales day rates, `scope_factors`
+        (S x phases) scales effort and duration per phase, `infrastructure_factors` (S) scales
+        infrastructure and licences, and `contingency_percent` (S) replaces the rate card's. Any
+        argument left out is the rate card as written. Returns S x phases arrays per category and
+        the S totals.
+        """
+        sizes = [len(factor) for factor in (rate_factors, scope_factors, infrastructure_factors, contingency_percent)
+                 if factor is not None]
+        count = sizes[0] if sizes else 1
+        rates = self.rate_card.day_rates * (np.ones((count, 1)) if rate_factors is None else np.asarray(rate_factors))
+        scope = np.ones((count, len(self.phases))) if scope_factors is None else np.asarray(scope_factors)
+        infrastructure = np.ones(count) if infrastructure_factors is None else np.asarray(infrastructure_factors)
+        contingency = np.full(count, float(self.rate_card.contingency_percent)) if contingency_percent is None \
+            else np.asarray(contingency_percent, dtype=float)
+
+        personnel = (rates[:, self.resource_role] * self.person_days) @ self.phase_matrix * scope
+        months = self.months * scope
+        infra = months * self.infrastructure_monthly * infrastructure[:, None]
+        licences = months * (self.licences_monthly + self.licences_per_person * self.people) * infrastructure[:, None]
+        subtotal = personnel + infra + licences
+        contingency_cost = subtotal * contingency[:, None] / 100
+        return {
+            "personnel": personnel,
+            "infrastructure": infra,
+            "licences": licences,
+            "contingency": contingency_cost,
+            "total": (subtotal + contingency_cost).sum(axis=1),
+        }
+
+    def breakdown(self):
+        """Per-phase and overall totals for the rate card as written."""
+        result = self.evaluate()
+        categories = ["personnel", "infrastructure", "licences", "contingency"]
+        phases = [{"phase": name, **{category: round(float(result[category][0, index]), 2) for category in categories}}
+                  for index, name in enumerate(self.phase_names)]
+        for phase in phases:
+            phase["total"] = round(sum(phase[category] for category in categories), 2)
+        return {"currency": self.rate_card.currency, "phases": phases, "total": round(float(result["total"][0]), 2)}
+
+    def cost_items(self):
+        """Returns the priced plan as a utils.structured "cost_items" record, one line per role and item per phase."""
+        card = self.rate_card
+        items = []
+        for index, phase in enumerate(self.phases):
+            name = phase["name"]
+            in_phase = self.resource_phase == index
+            for role in np.unique(self.resource_role[in_phase]):
+                selected = in_phase & (self.resource_role == role)
+                roles = sorted({self.resource_roles[position] for position in np.flatnonzero(selected)})
+                items.append({"category": "personnel", "item": card.role_names[role], "description": f"{name}: {', '.join(roles)}",
+                              "quantity": round(float(self.person_days[selected].sum()), 2), "unit": "person-day",
+                              "unit_cost": float(card.day_rates[role]), "phase": name})
+            months = float(self.months[index])
+            for item in card.infrastructure:
+                items.append({"category": "infrastructure", "item": item["item"], "description": name,
+                              "quantity": months, "unit": "month", "unit_cost": float(item["monthly"]), "phase": name})
+            for item in card.licences:
+                monthly = item.get("monthly", 0) + item.get("monthly_per_person", 0) * float(self.people[index])
+                items.append({"category": "software", "item": item["item"], "description": name,
+                              "quantity": months, "unit": "month", "unit_cost": round(monthly, 2), "phase": name})
+        for item in items:
+            item["total_cost"] = round(item["quantity"] * item["unit_cost"], 2)
+        by_phase = {}
+        for item in items:
+            by_phase[item["phase"]] = by_phase.get(item["phase"], 0) + item["total_cost"]
+        for name in self.phase_names:
+            amount = round(by_phase.get(name, 0) * card.contingency_percent / 100, 2)
+            items.append({"category": "contingency", "item": "Contingency",
+                          "description": f"{name}: {card.contingency_percent:g}% of phase costs", "quantity": 1,
+                          "unit": "lump sum", "unit_cost": amount, "total_cost": amount, "phase": name})
+        return {"currency": card.currency, "items": items}
+
+    def what_if(self, scenarios=DEFAULT_SCENARIOS, rate_spread=0.1, scope_spread=0.2, infrastructure_spread=0.15,
+                contingency_range=(5, 20), seed=0):
+        """
+        Prices `scenarios` random variations: each role's rate within ±rate_spread, each phase's scope
+        within ±scope_spread, infrastructure within ±infrastructure_spread and contingency uniformly
+        in `contingency_range`. Returns the total's percentiles and its sensitivity to each factor.
+        """
+        rng = np.random.default_rng(seed)
+        rate_factors = rng.uniform(1 - rate_spread, 1 + rate_spread, (scenarios, len(self.rate_card.day_rates)))
+        scope_factors = rng.uniform(1 - scope_spread, 1 + scope_spread, (scenarios, len(self.phases)))
+        infrastructure_factors = rng.uniform(1 - infrastructure_spread, 1 + infrastructure_spread, scenarios)
+        contingency = rng.uniform(*contingency_range, scenarios)
+        totals = self.evaluate(rate_factors, scope_factors, infrastructure_factors, contingency)["total"]
+        factors = {"rates": rate_factors.mean(axis=1), "scope": scope_factors.mean(axis=1),
+                   "infrastructure": infrastructure_factors, "contingency": contingency}
+        return {
+            "scenarios": scenarios,
+            "currency": self.rate_card.currency,
+            "base": self.breakdown()["total"],
+            "percentiles": {f"p{q}": round(float(value), 2) for q, value in zip(PERCENTILES, np.percentile(totals, PERCENTILES))},
+            # Correlation of each factor with the total: which assumption moves the price most.
+            "sensitivity": {name: round(float(np.corrcoef(values, totals)[0, 1]), 3) for name, values in factors.items()},
+        }
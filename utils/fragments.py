@@ -0,0 +1,397 @@
+# utils/fragments.py
+import datetime
+import logging
+import re
+import textwrap
+
+from utils.tracing import annotate
+
+FENCE_PATTERN = re.compile(r"^[ \t]*```[ \t]*([\w-]*)[ \t]*\n(.*?)^[ \t]*```[ \t]*$", re.MULTILINE | re.DOTALL)
+SEPARATOR_PATTERN = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+CELL_PATTERN = re.compile(r"(?<!\\)\|")
+CODE_SPAN_PATTERN = re.compile(r"`[^`\n]*`")
+
+# Mermaid diagram keywords, lower-cased, with the spelling Mermaid expects.
+DIAGRAM_TYPES = {name.lower(): name for name in [
+    "graph", "flowchart", "sequenceDiagram", "classDiagram", "stateDiagram", "stateDiagram-v2", "erDiagram", "gantt",
+    "pie", "journey", "gitGraph", "mindmap", "timeline", "quadrantChart", "requirementDiagram", "C4Context",
+    "C4Container", "C4Component", "C4Dynamic", "C4Deployment", "block-beta", "architecture-beta", "sankey-beta",
+    "xychart-beta"]}
+FLOWCHART_DIRECTIONS = ["TB", "TD", "BT", "RL", "LR"]
+# Statements that open a block closed by `end`.
+BLOCK_KEYWORDS = {
+    "flowchart": ["subgraph"],
+    "sequence": ["loop", "alt", "opt", "par", "critical", "break", "rect", "box"],
+}
+GANTT_KEYWORDS = ["title", "dateformat", "axisformat", "tickinterval", "section", "excludes", "includes", "todaymarker",
+                  "weekday", "displaymode", "inclusiveenddates", "topaxis", "accTitle", "accDescr"]
+
+# Flowchart node shapes, longest opening first, e.g. A[Label], B(Label), C{Label}, D[(Label)].
+NODE_SHAPES = [("[[", "]]"), ("[(", ")]"), ("((", "))"), ("{{", "}}"), ("[", "]"), ("(", ")"), ("{", "}")]
+NODE_ID = re.compile(r"\b[A-Za-z_][\w-]*(?=[\[({])")
+LABEL_SPECIALS = set("()[]{}\";")
+SINGLE_DASH_ARROW = re.compile(r"(?<![-.=<])->(?![>-])")
+SEQUENCE_MESSAGE = re.compile(r"^[^:]*?(--?>>|--?>|--?x|--?\))")
+GANTT_DATE = re.compile(r"^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})$")
+GANTT_DURATION = re.compile(r"^\d+(\.\d+)?(ms|s|m|h|d|w|M|y)$")
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+# Broken fragments sent back to the model per response, at most.
+MAX_REGENERATIONS = 3
+
+
+class Fragment:
+    """A Mermaid block or Markdown table found in a response, with its span in the response text."""
+
+    def __init__(self, kind, start, end, text):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.text = text
+
+    @property
+    def label(self):
+        return "Mermaid diagram" if self.kind == "mermaid" else "Markdown table"
+
+    def render(self, text=None):
+        text = self.text if text is None else text
+        return f"```mermaid\n{text}\n```" if self.kind == "mermaid" else text
+
+    def __repr__(self):
+        return f"Fragment({self.kind!r}, {self.start}, {self.end})"
+
+
+def _is_mermaid(language, body):
+    if language.lower() == "mermaid":
+        return True
+    # An unlabelled fence that starts with a diagram keyword is a Mermaid block missing its language.
+    first = body.strip().split(None, 1)
+    return not language and bool(first) and first[0].lower() in DIAGRAM_TYPES
+
+
+def extract_fragments(text):
+    """Returns the Mermaid blocks and Markdown tables in `text`, in order. Tables inside code fences are skipped."""
+    fragments, fences = [], []
+    for match in FENCE_PATTERN.finditer(text):
+        fences.append((match.start(), match.end()))
+        if _is_mermaid(match.group(1), match.group(2)):
+            fragments.append(Fragment("mermaid", match.start(), match.end(), match.group(2).rstrip("\n")))
+    run, offset = [], 0
+    for line in text.splitlines(keepends=True):
+        inside = any(start <= offset < end for start, end in fences)
+        if "|" in line and line.strip() and not inside:
+            run.append((offset, line))
+        else:
+            fragments += _table(run)
+            run = []
+        offset += len(line)
+    fragments += _table(run)
+    return sorted(fragments, key=lambda fragment: fragment.start)
+
+
+def _table(run):
+    # A run of lines with pipes is a table if it starts with a pipe or has a separator row.
+    lines = [line.rstrip("\n") for _, line in run]
+    if len(lines) < 2 or not (lines[0].lstrip().startswith("|") or any(SEPARATOR_PATTERN.match(line) for line in lines)):
+        return []
+    start = run[0][0]
+    end = run[-1][0] + len(lines[-1])
+    return [Fragment("table", start, end, "\n".join(lines))]
+
+
+def split_cells(row):
+    # Pipes inside inline code do not separate cells.
+    row = CODE_SPAN_PATTERN.sub(lambda match: match.group(0).replace("|", "\0"), row.strip())
+    if row.startswith("|"):
+        row = row[1:]
+    if row.endswith("|") and not row.endswith("\\|"):
+        row = row[:-1]
+    return [cell.strip().replace("\0", "|") for cell in CELL_PATTERN.split(row)]
+
+
+def validate_table(text):
+    """Returns the problems with a Markdown table: a missing separator row or rows with the wrong number of cells."""
+    lines = text.splitlines()
+    columns = len(split_cells(lines[0]))
+    if len(lines) < 2 or not SEPARATOR_PATTERN.match(lines[1]):
+        return ["the header row is not followed by a separator row such as |---|---|"]
+    errors = []
+    if len(split_cells(lines[1])) != columns:
+        errors.append(f"the separator row has {len(split_cells(lines[1]))} columns, the header {columns}")
+    for number, line in enumerate(lines[2:], start=3):
+        if SEPARATOR_PATTERN.match(line):
+            errors.append(f"row {number} is a second separator row")
+        elif len(split_cells(line)) != columns:
+            errors.append(f"row {number} has {len(split_cells(line))} cells, the header {columns}")
+    return errors
+
+
+def repair_table(text):
+    """Adds missing outer pipes and separator row, pads short rows and drops empty trailing cells."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    rows = [split_cells(line) for line in lines]
+    columns = len(rows[0])
+    repaired = [rows[0]]
+    if len(rows) < 2 or not SEPARATOR_PATTERN.match(lines[1]):
+        rows.insert(1, ["---"] * columns)
+        lines.insert(1, "")
+    separator = [cell if re.fullmatch(r":?-+:?", cell) else "---" for cell in rows[1]][:columns]
+    repaired.append(separator + ["---"] * (columns - len(separator)))
+    for line, cells in zip(lines[2:], rows[2:]):
+        if SEPARATOR_PATTERN.match(line):
+            continue
+        while len(cells) > columns and not cells[-1]:
+            cells.pop()
+        repaired.append(cells + [""] * (columns - len(cells)))
+    return "\n".join(f"| {' | '.join(cells)} |" for cells in repaired)
+
+
+def _diagram(lines):
+    words = lines[0].split() if lines else [""]
+    keyword = words[0].lower()
+    if keyword in ("graph", "flowchart"):
+        return "flowchart", words
+    if keyword == "sequencediagram":
+        return "sequence", words
+    return keyword, words
+
+
+def _statements(text):
+    # Diagram statements without blank lines, comments or front matter.
+    lines = [line.strip() for line in text.splitlines()]
+    if lines and lines[0] == "---":
+        lines = lines[lines.index("---", 1) + 1:] if "---" in lines[1:] else lines
+    return [line for line in lines if line and not line.startswith("%%")]
+
+
+def _unclosed_blocks(kind, lines):
+    depth = 0
+    for line in lines[1:]:
+        word = line.split()[0].lower()
+        if word in BLOCK_KEYWORDS.get(kind, []):
+            depth += 1
+        elif word == "end":
+            depth -= 1
+    return depth
+
+
+def _gantt_task(line):
+    if ":" not in line or line.split()[0].lower() in [keyword.lower() for keyword in GANTT_KEYWORDS]:
+        return None
+    name, _, metadata = line.rpartition(":")
+    return name, [item.strip() for item in metadata.split(",")]
+
+
+def validate_mermaid(text):
+    """Returns the problems a lightweight parse of a Mermaid diagram finds, or [] if it looks valid."""
+    if "```" in text:
+        return ["the block contains a nested code fence"]
+    lines = _statements(text)
+    if not lines:
+        return ["the diagram is empty"]
+    kind, words = _diagram(lines)
+    if words[0].lower() not in DIAGRAM_TYPES:
+        return [f"'{words[0]}' is not a Mermaid diagram type"]
+    errors = []
+    if words[0] != DIAGRAM_TYPES[words[0].lower()]:
+        errors.append(f"the diagram type must be written '{DIAGRAM_TYPES[words[0].lower()]}'")
+    unclosed = _unclosed_blocks(kind, lines)
+    if unclosed > 0:
+        errors.append(f"{unclosed} block(s) are not closed with 'end'")
+    elif unclosed < 0:
+        errors.append(f"{-unclosed} 'end' statement(s) close nothing")
+    for number, line in enumerate(lines[1:], start=2):
+        if line.count('"') % 2:
+            errors.append(f"line {number} has an unbalanced double quote: {line}")
+    if kind == "flowchart":
+        if len(words) < 2 or words[1] not in FLOWCHART_DIRECTIONS:
+            errors.append(f"'{words[0]}' must be followed by a direction ({', '.join(FLOWCHART_DIRECTIONS)})")
+        for number, line in enumerate(lines[1:], start=2):
+            if SINGLE_DASH_ARROW.search(line):
+                errors.append(f"line {number} uses '->' instead of '-->': {line}")
+            for start, end, opening, label, closing in _node_labels(line):
+                if set(label) & LABEL_SPECIALS:
+                    errors.append(f"line {number} has a label with special characters that needs quotes: {line[start:end]}")
+    elif kind == "sequence":
+        for number, line in enumerate(lines[1:], start=2):
+            if SEQUENCE_MESSAGE.match(line) and ":" not in line:
+                errors.append(f"line {number} is a message without ': text': {line}")
+    elif kind == "gantt":
+        for number, line in enumerate(lines[1:], start=2):
+            task = _gantt_task(line)
+            if task is None:
+                if line.split()[0].lower() not in [keyword.lower() for keyword in GANTT_KEYWORDS]:
+                    errors.append(f"line {number} is a task without ':' and its dates: {line}")
+                continue
+            name, metadata = task
+            if ":" in name:
+                errors.append(f"line {number} has a ':' in the task name: {line}")
+            for item in metadata:
+                date = GANTT_DATE.match(item)
+                if date and not _valid_date(item, date):
+                    errors.append(f"line {number} has an invalid date '{item}' (expected YYYY-MM-DD)")
+            if not any(GANTT_DATE.match(item) or GANTT_DURATION.match(item) or item.startswith("after ")
+                       for item in metadata[-2:]):
+                errors.append(f"line {number} has no start date, 'after' dependency or duration: {line}")
+    return errors
+
+
+def _valid_date(item, date):
+    try:
+        datetime.date(*(int(part) for part in date.groups()))
+    except ValueError:
+        return False
+    return bool(re.fullmatch(r"\d{4}-\d{2}-\d{2}", item))
+
+
+def _node_labels(line):
+    """Yields (start, end, opening, label, closing) for each flowchart node in `line` with an unquoted label."""
+    position = 0
+    while True:
+        match = NODE_ID.search(line, position)
+        if match is None:
+            return
+        opening, closing = next(shape for shape in NODE_SHAPES if line.startswith(shape[0], match.end()))
+        label_start = match.end() + len(opening)
+        position = label_start
+        if line.startswith('"', label_start):
+            close = line.find('"', label_start + 1)
+            position = close + 1 if close != -1 else len(line)
+            continue
+        # The label ends at the first closing bracket that is not matched by an opening one inside it.
+        depth = 0
+        for index in range(label_start, len(line)):
+            if depth == 0 and line.startswith(closing, index):
+                yield match.start(), index + len(closing), opening, line[label_start:index], closing
+                position = index + len(closing)
+                break
+            if line[index] == opening[-1]:
+                depth += 1
+            elif line[index] == closing[0]:
+                depth -= 1
+
+
+def _quote_labels(line):
+    for start, end, opening, label, closing in reversed(list(_node_labels(line))):
+        if set(label) & LABEL_SPECIALS:
+            node = line[start:end - len(closing) - len(label) - len(opening)]
+            line = f'{line[:start]}{node}{opening}"{label.replace(chr(34), "#quot;")}"{closing}{line[end:]}'
+    return line
+
+
+def repair_mermaid(text):
+    """
+    Fixes the common deterministic mistakes: smart quotes, the diagram keyword's case, a flowchart
+    without a direction, '->' arrows, unquoted labels with special characters, unclosed blocks,
+    and Gantt dates written with '/' or '.' or without zero padding.
+    """
+    lines = textwrap.dedent(text.translate(SMART_QUOTES)).strip("\n").splitlines()
+    lines = [line.rstrip() for line in lines]
+    statements = _statements("\n".join(lines))
+    if not statements:
+        return text
+    first = next(index for index, line in enumerate(lines) if line.strip() == statements[0])
+    words = lines[first].split()
+    keyword = DIAGRAM_TYPES.get(words[0].lower(), words[0])
+    kind, _ = _diagram([keyword])
+    if kind == "flowchart":
+        direction = words[1].upper() if len(words) > 1 and words[1].upper() in FLOWCHART_DIRECTIONS else "TD"
+        words = [keyword, direction] + words[2 if len(words) > 1 and words[1].upper() in FLOWCHART_DIRECTIONS else 1:]
+    else:
+        words = [keyword] + words[1:]
+    lines[first] = " ".join(words)
+    for index in range(first + 1, len(lines)):
+        line = lines[index]
+        if kind == "flowchart":
+            line = SINGLE_DASH_ARROW.sub("-->", line)
+            line = _quote_labels(line)
+        elif kind == "gantt":
+            task = _gantt_task(line.strip())
+            if task is not None:
+                name, metadata = task
+                metadata = [_pad_date(item) for item in metadata]
+                indent = line[:len(line) - len(line.lstrip())]
+                line = f"{indent}{name.strip().replace(':', ' -')} :{', '.join(metadata)}"
+        lines[index] = line
+    unclosed = _unclosed_blocks(kind, _statements("\n".join(lines)))
+    lines += ["end"] * max(unclosed, 0)
+    return "\n".join(lines)
+
+
+def _pad_date(item):
+    date = GANTT_DATE.match(item)
+    if not date:
+        return item
+    year, month, day = date.groups()
+    return f"{year}-{int(month):02d}-{int(day):02d}"
+
+
+def validate(fragment, text=None):
+    text = fragment.text if text is None else text
+    return validate_mermaid(text) if fragment.kind == "mermaid" else validate_table(text)
+
+
+def repair(fragment, text=None):
+    text = fragment.text if text is None else text
+    return repair_mermaid(text) if fragment.kind == "mermaid" else repair_table(text)
+
+
+def check_fragments(text):
+    """Returns (fragment, errors) for every Mermaid block and Markdown table in `text` that does not validate."""
+    return [(fragment, errors) for fragment in extract_fragments(text) for errors in [validate(fragment)] if errors]
+
+
+def repair_fragments(text, regenerate=None, source="response", max_regenerations=MAX_REGENERATIONS):
+    """
+    Validates every Mermaid block and Markdown table in `text` and returns the text with broken ones
+    fixed. Deterministic repairs are tried first; a fragment still broken after them is passed with
+    its errors to `regenerate(fragment, errors)`, if given, whose reply must contain the corrected
+    fragment. Anything still invalid is left as it was and logged.
+    """
+    fragments = extract_fragments(text)
+    replacements, counts = [], {"repaired": 0, "regenerated": 0, "invalid": 0}
+    for fragment in fragments:
+        errors = validate(fragment)
+        if not errors:
+            continue
+        fixed = repair(fragment)
+        remaining = validate(fragment, fixed)
+        if not remaining:
+            counts["repaired"] += 1
+            replacements.append((fragment, fixed))
+            continue
+        if regenerate is not None and counts["regenerated"] + counts["invalid"] < max_regenerations:
+            try:
+                fixed = _regenerated(fragment, regenerate(fragment, remaining))
+            except Exception as e:
+                logging.warning(f"Fragments: Regenerating a {fragment.label} for {source} failed: {e}")
+                fixed = None
+            if fixed is not None:
+                counts["regenerated"] += 1
+                replacements.append((fragment, fixed))
+                continue
+        counts["invalid"] += 1
+        logging.warning(f"Fragments: {source} has a {fragment.label} that does not validate: {'; '.join(remaining)}")
+    for fragment, fixed in reversed(replacements):
+        text = text[:fragment.start] + fragment.render(fixed) + text[fragment.end:]
+    annotate(fragments=len(fragments), fragments_repaired=counts["repaired"],
+             fragments_regenerated=counts["regenerated"], fragments_invalid=counts["invalid"])
+    if any(counts.values()):
+        logging.info(f"Fragments: {source}: {len(fragments)} checked, {counts['repaired']} repaired locally, "
+                     f"{counts['regenerated']} regenerated, {counts['invalid']} still invalid.")
+    return text
+
+
+def _regenerated(fragment, reply):
+    # The first fragment of the same kind in the reply, if it validates (after the local repairs).
+    # A diagram sent back without its code fence is taken as the whole reply.
+    candidates = extract_fragments(reply or "")
+    if fragment.kind == "mermaid" and not candidates and reply and reply.strip():
+        candidates = [Fragment("mermaid", 0, len(reply), reply.strip())]
+    for candidate in candidates:
+        if candidate.kind == fragment.kind:
+            if not validate(candidate):
+                return candidate.text
+            fixed = repair(candidate)
+            return fixed if not validate(candidate, fixed) else None
+    return None
@@ -0,0 +1,106 @@
+# utils/pdf_utils.py
+import bisect
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+
+# Below this many pages the cost of starting worker processes outweighs the parallel speed-up.
+PARALLEL_MIN_PAGES = 32
+PAGES_PER_BATCH = 16
+# Keeps the last line of a page from running into the first line (often a heading) of the next.
+PAGE_SEPARATOR = "\n"
+
+
+class ExtractedDocument:
+    """
+    Text of a PDF joined once, with the character offset at which each page starts so that
+    later stages can map positions back to page ranges.
+    """
+
+    def __init__(self, pages, source=None):
+        self.source = source
+        self.page_offsets = []
+        offset = 0
+        for page in pages:
+            self.page_offsets.append(offset)
+            offset += len(page) + len(PAGE_SEPARATOR)
+        self.text = PAGE_SEPARATOR.join(pages)
+
+    def __len__(self):
+        return len(self.page_offsets)
+
+    def page_span(self, page_num):
+        """Returns the (start, end) character offsets of a zero-based page number."""
+        start = self.page_offsets[page_num]
+        if page_num + 1 < len(self.page_offsets):
+            return start, self.page_offsets[page_num + 1] - len(PAGE_SEPARATOR)
+        return start, len(self.text)
+
+    def page_text(self, page_num):
+        start, end = self.page_span(page_num)
+        return self.text[start:end]
+
+    def page_at(self, offset):
+        """Returns the zero-based page number containing a character offset."""
+        return max(bisect.bisect_right(self.page_offsets, offset) - 1, 0)
+
+    def page_hashes(self):
+        """Returns a short content hash of each page's extracted text, for spotting changed pages between revisions."""
+        return [hashlib.sha256(self.page_text(page_num).encode("utf-8")).hexdigest()[:16] for page_num in range(len(self))]
+
+    def close(self):
+        """Releases the file behind a mapped document; in-memory text needs nothing."""
+
+
+def count_pages(file_path):
+    with open(file_path, 'rb') as pdf_file:
+        return len(PyPDF2.PdfReader(pdf_file).pages)
+
+
+def iter_pages(file_path, start=0, end=None):
+    """Yields the extracted text of each page in order, one page at a time."""
+    with open(file_path, 'rb') as pdf_file:
+        reader = PyPDF2.PdfReader(pdf_file)
+        end = len(reader.pages) if end is None else min(end, len(reader.pages))
+        for page_num in range(start, end):
+            yield reader.pages[page_num].extract_text() or ""
+
+
+def _extract_batch(args):
+    file_path, start, end = args
+    return list(iter_pages(file_path, start, end))
+
+
+def iter_pages_parallel(file_path, max_workers=None, batch_size=PAGES_PER_BATCH):
+    """
+    Yields page texts in order while extracting batches of pages in a process pool.
+    Small documents are extracted in-process.
+    """
+    page_count = count_pages(file_path)
+    if page_count < PARALLEL_MIN_PAGES or max_workers == 1:
+        yield from iter_pages(file_path)
+        return
+    max_workers = max_workers or os.cpu_count() or 1
+    batches = [(file_path, start, min(start + batch_size, page_count)) for start in range(0, page_count, batch_size)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for pages in executor.map(_extract_batch, batches):
+            yield from pages
+
+
+def extract_document(file_path, max_workers=None, store_path=None):
+    """
+    Extracts every page of a PDF and returns an ExtractedDocument. With `store_path`, pages are
+    streamed to a utils.text_store.TextStore at that path instead and a MappedDocument is returned.
+    """
+    logging.info(f"Extracting PDF file: {file_path}")
+    if store_path:
+        from utils.text_store import MappedDocument, TextStore
+
+        document = MappedDocument(TextStore.write(store_path, iter_pages_parallel(file_path, max_workers)), source=file_path)
+    else:
+        document = ExtractedDocument(list(iter_pages_parallel(file_path, max_workers)), source=file_path)
+    logging.info(f"PDF extracted: {len(document)} pages, {len(document.text)} characters.")
+    return document
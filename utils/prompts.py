@@ -0,0 +1,111 @@
+# utils/prompts.py
+import functools
+import logging
+import textwrap
+import threading
+from string import Formatter
+
+from utils.chunking import estimate_tokens
+from utils.tracing import annotate
+
+# Distinct shared prefixes kept rendered; one pipeline run needs one, a batch one per document in flight.
+SHARED_PREFIX_CACHE_SIZE = 16
+
+
+class PromptTemplate:
+    """
+    A prompt compiled once at import: dedented and split into literal text and named fields, so
+    rendering is a single join instead of re-parsing a large f-string on every call.
+
+    A template may start with a shared `prefix` template. The prefix is rendered once per distinct
+    set of values and the same string is reused by every template that starts with it, so the prompts
+    of different agents begin with byte-identical text and provider-side prefix caching can hit.
+    Anything that differs between agents (their role, their slice of the RFP) belongs after it.
+    """
+
+    def __init__(self, name, text, prefix=None):
+        self.name = name
+        self.text = textwrap.dedent(text).strip()
+        self.prefix = prefix
+        self._parts = [(literal, field) for literal, field, _, _ in Formatter().parse(self.text)]
+        self.fields = tuple(dict.fromkeys(field for _, field in self._parts if field))
+        self.static_tokens = estimate_tokens("".join(literal for literal, _ in self._parts))
+        self._shared = functools.lru_cache(maxsize=SHARED_PREFIX_CACHE_SIZE)(self._render_shared)
+
+    def _check(self, values):
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise KeyError(f"Prompt template '{self.name}' is missing values for: {', '.join(missing)}")
+
+    def _fill(self, values):
+        self._check(values)
+        return "".join(literal + (str(values[field]) if field else "") for literal, field in self._parts)
+
+    def _render_shared(self, values):
+        text = self._fill(dict(zip(self.fields, values)))
+        return text, estimate_tokens(text)
+
+    def shared(self, values):
+        """Returns this template rendered as a prefix, and its token count, from a cache of recent values."""
+        self._check(values)
+        return self._shared(tuple(str(values[field]) for field in self.fields))
+
+    def render(self, **values):
+        """Returns the prompt for `values`, recording its size before it is sent."""
+        body = self._fill(values)
+        prefix_tokens = 0
+        if self.prefix is not None:
+            prefix, prefix_tokens = self.prefix.shared(values)
+            body = f"{prefix}\n\n{body}"
+        tokens = estimate_tokens(body)
+        _stats.record(self.name, tokens, prefix_tokens)
+        annotate(template=self.name, prompt_tokens_estimate=tokens, shared_prefix_tokens=prefix_tokens)
+        logger = logging.getLogger()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Prompts: {self.name} (~{tokens} tokens, {prefix_tokens} shared):\n{body}")
+        return body
+
+
+class PromptStats:
+    """Per-template counts of rendered prompts and their estimated tokens, shared-prefix tokens included."""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, tokens, prefix_tokens):
+        with self._lock:
+            totals = self._totals.setdefault(name, {"prompts": 0, "tokens": 0, "shared_prefix_tokens": 0})
+            totals["prompts"] += 1
+            totals["tokens"] += tokens
+            totals["shared_prefix_tokens"] += prefix_tokens
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(totals) for name, totals in sorted(self._totals.items())}
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+
+
+_stats = PromptStats()
+
+
+def prompt_stats():
+    return _stats.stats()
+
+
+# The context every agent receives, identical across agents for one RFP, so it leads every agent prompt.
+AGENT_CONTEXT = PromptTemplate("agent_context", """
+    You are one of a team of experts preparing the response to a Request for Proposal (RFP). The RFP analysis shared by the team follows.
+
+    RFP Summary:
+    {rfp_summary}
+
+    RFP Analysis:
+    {rfp_analysis}
+
+    RFP Assumptions:
+    {rfp_assumptions}
+    """)
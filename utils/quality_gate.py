@@ -0,0 +1,176 @@
+# utils/quality_gate.py
+import json
+import logging
+import os
+import re
+
+from utils.prompts import PromptTemplate
+
+MIN_RESPONSE_CHARS = 100
+DEFAULT_RUBRIC_MIN_SCORE = 3
+RUBRIC_MAX_CHARS = 24000
+
+TABLE_PATTERN = re.compile(r"^[ \t]*\|.*\|[ \t]*\n[ \t]*\|[ \t:|-]*-[ \t:|-]*\|[ \t]*$", re.MULTILINE)
+MERMAID_PATTERN = re.compile(r"```mermaid\s*\n\s*(\w[\w-]*)", re.IGNORECASE)
+
+
+class Gap:
+    """Something a response is missing, with the instruction a targeted follow-up prompt should carry."""
+
+    def __init__(self, name, instruction, regenerate=False):
+        self.name = name
+        self.instruction = instruction
+        self.regenerate = regenerate
+
+    def __repr__(self):
+        return f"Gap({self.name!r})"
+
+
+class Requirement:
+    """
+    One structural expectation of an agent response: a Markdown table (optionally with certain header
+    words), a Mermaid block of certain diagram types, or a topic that must be mentioned.
+    """
+
+    def __init__(self, name, instruction, table_words=None, mermaid_types=None, keywords=None):
+        self.name = name
+        self.instruction = instruction
+        self.table_words = table_words
+        self.mermaid_types = mermaid_types
+        self.keywords = keywords
+
+    def satisfied_by(self, response):
+        if self.table_words is not None:
+            headers = [match.group(0).splitlines()[0].lower() for match in TABLE_PATTERN.finditer(response)]
+            if not any(all(word in header for word in self.table_words) for header in headers):
+                return False
+        if self.mermaid_types is not None:
+            types = {diagram.lower() for diagram in MERMAID_PATTERN.findall(response)}
+            if not types & set(self.mermaid_types):
+                return False
+        if self.keywords is not None:
+            if not re.search(r"\b(?:" + "|".join(self.keywords) + r")", response, re.IGNORECASE):
+                return False
+        return True
+
+
+RUBRIC = PromptTemplate("quality_gate.rubric", """
+    You are reviewing a section of a proposal written by the {agent_name} in response to an RFP.
+    Score it from 1 (unusable) to 5 (complete and specific) for completeness, specificity and internal consistency.
+    {expected}
+    Reply with JSON only: {{"score": <1-5>, "missing": ["<each missing or weak part, as a short instruction>"]}}
+
+    Response:
+    {response}
+    """)
+
+FLOWCHART_TYPES = ["graph", "flowchart", "c4context", "c4container", "architecture-beta", "block-beta"]
+
+# What each agent's prompt asks for, checked locally before any model is involved.
+AGENT_REQUIREMENTS = {
+    "Tech Lead": [
+        Requirement("architecture diagram", "A system architecture diagram as a Mermaid `graph` or `flowchart` block.",
+                    mermaid_types=FLOWCHART_TYPES),
+        Requirement("technology stack table", "The technology stack as a Markdown table with a justification column.",
+                    table_words=[]),
+    ],
+    "Delivery Lead": [
+        Requirement("gantt chart", "A Mermaid `gantt` chart of the delivery phases with start and end dates.",
+                    mermaid_types=["gantt"]),
+        Requirement("resource table", "The resources required for each phase (roles, estimated hours, tools) as a Markdown table.",
+                    table_words=[]),
+    ],
+    "BD Manager": [
+        Requirement("cost table", "The cost breakdown as a Markdown table with Item, Description, Quantity, Unit Cost "
+                    "and Total Cost columns.", table_words=["cost"]),
+        Requirement("pricing strategy", "A short competitive pricing strategy.", keywords=["pricing", "price"]),
+    ],
+    "SRE Lead": [
+        Requirement("SLAs", "Service Level Agreements for availability, performance and response times.",
+                    keywords=["sla", "service level"]),
+        Requirement("incident management", "The incident management process.", keywords=["incident"]),
+        Requirement("escalation paths", "The support team structure and escalation paths.", keywords=["escalat"]),
+        Requirement("backup and recovery", "Backup and recovery procedures with frequency and retention.",
+                    keywords=["backup", "recovery"]),
+    ],
+    "Test Lead": [
+        Requirement("test levels", "The levels of testing to be performed (unit, integration, system, acceptance).",
+                    keywords=["acceptance", "integration test"]),
+        Requirement("defect management", "The defect tracking and management process.", keywords=["defect"]),
+        Requirement("entry and exit criteria", "Entry and exit criteria for each testing phase.",
+                    keywords=["entry", "exit criteria"]),
+    ],
+    "Internet Researcher": [
+        Requirement("regulatory context", "The regulatory and compliance requirements in Oman relevant to the project.",
+                    keywords=["regulat", "compliance"]),
+    ],
+}
+
+
+def structural_gaps(agent_name, response):
+    """
+    Tier 1: a local check for the tables, Mermaid blocks and topics the agent was asked for.
+    An empty or near-empty response is reported as a single gap that needs full regeneration.
+    """
+    if not response or len(response.strip()) < MIN_RESPONSE_CHARS:
+        return [Gap("length", f"The response from {agent_name} is too short and lacks detail.", regenerate=True)]
+    return [Gap(requirement.name, requirement.instruction)
+            for requirement in AGENT_REQUIREMENTS.get(agent_name, [])
+            if not requirement.satisfied_by(response)]
+
+
+def rubric_model():
+    """
+    Returns the small model used for tier 2 rubric scoring, named by RFP_RUBRIC_MODEL, or None when
+    rubric scoring is disabled (the default).
+    """
+    name = os.environ.get("RFP_RUBRIC_MODEL")
+    if not name:
+        return None
+    from utils.api_utils import get_model
+
+    return get_model(name, generation_config={"response_mime_type": "application/json", "temperature": 0})
+
+
+def parse_rubric(text):
+    """Reads {"score": int, "missing": [str]} from a rubric response, tolerating code fences. Returns None if unreadable."""
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    if not match:
+        return None
+    try:
+        result = json.loads(match.group(0))
+        score = int(result["score"])
+    except (ValueError, KeyError, TypeError):
+        return None
+    missing = [str(item) for item in result.get("missing") or [] if str(item).strip()]
+    return score, missing
+
+
+def rubric_gaps(model, agent_name, response, min_score=None):
+    """
+    Tier 2: asks a small model to score the response from 1 to 5 against the agent's brief and to
+    list what is missing. Returns the missing items as gaps when the score is below `min_score`.
+    """
+    min_score = min_score or int(os.environ.get("RFP_RUBRIC_MIN_SCORE", DEFAULT_RUBRIC_MIN_SCORE))
+    brief = "\n".join(f"- {requirement.instruction}" for requirement in AGENT_REQUIREMENTS.get(agent_name, []))
+    expected = f"It was expected to include:\n{brief}" if brief else ""
+    prompt = RUBRIC.render(agent_name=agent_name, expected=expected, response=response[:RUBRIC_MAX_CHARS])
+    try:
+        result = parse_rubric(model.generate_content(prompt).text)
+    except Exception as e:
+        logging.warning(f"QualityGate: Rubric scoring for {agent_name} failed: {e}")
+        return []
+    if result is None:
+        logging.warning(f"QualityGate: Could not read the rubric score for {agent_name}.")
+        return []
+    score, missing = result
+    logging.info(f"QualityGate: {agent_name} rubric score {score}/5.")
+    if score >= min_score:
+        return []
+    return [Gap(f"rubric: {item[:40]}", item) for item in missing] or [
+        Gap("rubric", "Expand the weakest parts with specific, RFP-grounded detail.")]
+
+
+def append_parts(response, parts):
+    """Appends the output of a targeted follow-up to the original response."""
+    return f"{response.rstrip()}\n\n{parts.strip()}\n"
@@ -0,0 +1,158 @@
+# utils/rate_limiter.py
+import logging
+import os
+import threading
+import time
+
+from utils.chunking import estimate_tokens
+
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 1000000
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens refill continuously at `rate_per_minute` up to `capacity`;
+    acquire() blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Takes `amount` tokens, sleeping until they are available. Returns the time spent waiting."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def charge(self, amount):
+        """Removes `amount` tokens without waiting; the balance may go negative and is repaid by refill."""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+
+class RateLimiter:
+    """
+    Process-wide limiter for model calls, enforcing both requests per minute and tokens per minute.
+    When the API reports that the quota is exhausted, pause() holds back every caller at once so
+    concurrent threads do not retry into the same 429.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        """Blocks new calls from every thread for `seconds`."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        logging.warning(f"RateLimiter: Quota exhausted, pausing all model calls for {seconds:.1f}s.")
+
+    def acquire(self, tokens=1):
+        """Waits for a request slot and `tokens` tokens of quota. Returns the time spent waiting."""
+        waited = 0.0
+        delay = self.blocked_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            waited += delay
+        waited += self.requests.acquire()
+        waited += self.tokens.acquire(tokens)
+        return waited
+
+    def record(self, tokens):
+        """Charges tokens that were only known after the call (for example the completion)."""
+        self.tokens.charge(tokens)
+
+
+def usage_tokens(response):
+    """Returns (prompt_tokens, completion_tokens) from a response's usage metadata, if present."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None, None
+    return getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None)
+
+
+class MeteredStream:
+    """Passes a streamed response through chunk by chunk and calls `on_complete` with its text once it is exhausted."""
+
+    def __init__(self, response, on_complete):
+        self.response = response
+        self.on_complete = on_complete
+
+    def __iter__(self):
+        parts = []
+        for chunk in self.response:
+            parts.append(chunk.text)
+            yield chunk
+        self.on_complete("".join(parts))
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+class RateLimitedModel:
+    """Wraps a model so every generate_content call first takes request and token quota from a shared limiter."""
+
+    def __init__(self, model, limiter):
+        self.model = model
+        self.limiter = limiter
+
+    def generate_content(self, prompt, **kwargs):
+        estimated = estimate_tokens(prompt) if isinstance(prompt, str) else 1
+        waited = self.limiter.acquire(estimated)
+        if waited > 0.5:
+            logging.info(f"RateLimiter: Waited {waited:.1f}s for quota.")
+        response = self.model.generate_content(prompt, **kwargs)
+        if kwargs.get("stream"):
+            # A stream's usage is only known once it has been read to the end.
+            return MeteredStream(response, lambda text: self._record(response, estimated, text))
+        self._record(response, estimated, response.text)
+        return response
+
+    def _record(self, response, estimated, text):
+        prompt_tokens, completion_tokens = usage_tokens(response)
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(text)
+        self.limiter.record(completion_tokens + (prompt_tokens - estimated if prompt_tokens else 0))
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Returns the process-wide limiter, sized by RFP_REQUESTS_PER_MINUTE and RFP_TOKENS_PER_MINUTE.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            requests_per_minute = int(os.environ.get("RFP_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE))
+            tokens_per_minute = int(os.environ.get("RFP_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE))
+            _limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+            logging.info(f"RateLimiter initialized: {requests_per_minute} requests and "
+                         f"{tokens_per_minute} tokens per minute.")
+        return _limiter
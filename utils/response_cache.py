@@ -0,0 +1,252 @@
+# utils/response_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from utils.tracing import annotate
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "responses.sqlite3")
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+EVICT_EVERY = 50
+
+
+class CachedResponse:
+    """Minimal stand-in for a generate_content response, exposing the cached `text`."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def __iter__(self):
+        # Lets a cache hit stand in for a streamed response as a single chunk.
+        yield self
+
+
+class CachingStream:
+    """Passes a streamed response through chunk by chunk and stores the full text once it completes."""
+
+    def __init__(self, response, on_complete):
+        self.response = response
+        self.on_complete = on_complete
+        self.parts = []
+
+    def __iter__(self):
+        for chunk in self.response:
+            self.parts.append(chunk.text)
+            yield chunk
+        self.on_complete(self.text)
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+class ResponseCache:
+    """
+    Persistent, content-addressed store for model responses, backed by a local SQLite file.
+    Entries are keyed on the model name, a hash of the prompt and the generation config.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age=DEFAULT_MAX_AGE, bypass=False):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.commit()
+        logging.info(f"ResponseCache initialized at: {path} (bypass={bypass})")
+
+    @staticmethod
+    def make_key(model_name, prompt, generation_config=None):
+        """Builds the cache key for a model call."""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        payload = json.dumps(
+            {"model": model_name, "prompt": prompt_hash, "config": generation_config or {}},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached response text for `key`, or None on a miss."""
+        if self.bypass:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age and now - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ?, hit_count = hit_count + 1 WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return row[0]
+
+    def put(self, key, model_name, response):
+        """Stores a response. Writes still happen in bypass mode so a forced refresh repopulates the cache."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model_name, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, len(response.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict()
+
+    def evict(self):
+        """Removes expired entries, then the least recently used ones until size limits are met."""
+        with self._lock:
+            return self._evict()
+
+    def _evict(self):
+        removed = 0
+        if self.max_age:
+            removed += self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,)
+            ).rowcount
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count > self.max_entries or total > self.max_bytes:
+            rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall()
+            stale = []
+            for key, size in rows:
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                count -= 1
+                total -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+            removed += len(stale)
+        self._conn.commit()
+        if removed:
+            logging.info(f"ResponseCache: Evicted {removed} entries.")
+        return removed
+
+    def clear(self):
+        """Deletes every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """Returns hit/miss counters for this process along with the size of the store."""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+        }
+
+
+class CachedModel:
+    """Wraps a GenerativeModel so that generate_content answers come from the shared cache when possible."""
+
+    def __init__(self, model, model_name, cache):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+
+    def _generation_config(self, kwargs):
+        config = dict(getattr(self.model, "_generation_config", None) or {})
+        config.update({name: value for name, value in kwargs.items() if name != "stream"})
+        return config
+
+    def generate_content(self, prompt, **kwargs):
+        if not isinstance(prompt, str):
+            return self.model.generate_content(prompt, **kwargs)
+        key = self.cache.make_key(self.model_name, prompt, self._generation_config(kwargs))
+        text = self.cache.get(key)
+        if text is not None:
+            logging.info(f"ResponseCache: Hit for {self.model_name} ({key[:12]}).")
+            annotate(cache_hit=True)
+            return CachedResponse(text)
+        response = self.model.generate_content(prompt, **kwargs)
+        if kwargs.get("stream"):
+            return CachingStream(response, lambda text: self.cache.put(key, self.model_name, text))
+        self.cache.put(key, self.model_name, response.text)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+# Hash of the contents behind each cached-content handle, by handle name.
+_cached_contents = {}
+_cached_contents_lock = threading.Lock()
+
+
+def register_cached_content(cached_content, contents):
+    """Records what a cached-content handle holds, so responses made with it are keyed on the contents."""
+    digest = hashlib.sha256(contents.encode("utf-8", "surrogatepass")).hexdigest()
+    with _cached_contents_lock:
+        _cached_contents[cached_content.name] = digest
+    return digest
+
+
+def cached_content_key(cached_content):
+    """
+    Names a cached-content handle for the response cache key. Handle names are issued per upload,
+    so a rerun that uploads the same RFP again would never match; the hash of the contents does.
+    """
+    with _cached_contents_lock:
+        return _cached_contents.get(cached_content.name, cached_content.name)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Returns the process-wide response cache. The location can be set with RFP_CACHE_PATH and
+    lookups skipped with RFP_CACHE_BYPASS=1.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                path=os.environ.get("RFP_CACHE_PATH", DEFAULT_CACHE_PATH),
+                bypass=os.environ.get("RFP_CACHE_BYPASS", "").lower() in ("1", "true", "yes"),
+            )
+        return _cache
@@ -0,0 +1,246 @@
+# utils/retrieval.py
+import bisect
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+
+from utils.chunking import CHARS_PER_TOKEN, split_sections
+from utils.context_packer import AGENT_PROFILES
+
+try:
+    import numpy as np
+except ImportError:  # The vector index is optional; BM25 works without NumPy.
+    np = None
+
+INDEX_VERSION = 1
+PASSAGE_TOKENS = 400
+BM25_K1 = 1.5
+BM25_B = 0.75
+VECTOR_DIMENSIONS = 1024
+MIN_PREFIX_LENGTH = 4
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class Passage:
+    """A retrievable span of the RFP with the pages it covers."""
+
+    def __init__(self, start, end, first_page, last_page, title, text, score=0.0):
+        self.start = start
+        self.end = end
+        self.first_page = first_page
+        self.last_page = last_page
+        self.title = title
+        self.text = text
+        self.score = score
+
+    def __repr__(self):
+        return f"Passage({self.title!r}, pages {self.first_page + 1}-{self.last_page + 1}, score={self.score:.2f})"
+
+
+def build_passages(text, page_offsets=None, passage_tokens=PASSAGE_TOKENS):
+    """Splits a document into section-aligned passages of roughly `passage_tokens` tokens."""
+    page_offsets = page_offsets or [0]
+    max_chars = passage_tokens * CHARS_PER_TOKEN
+    spans = []
+    for section in split_sections(text):
+        start = section.start
+        while start < section.end:
+            end = min(start + max_chars, section.end)
+            if end < section.end:
+                cut = text.rfind("\n", start + max_chars // 2, end)
+                end = cut if cut > start else end
+            spans.append((start, end, section.title))
+            start = end
+    return [
+        (start, end, max(bisect.bisect_right(page_offsets, start) - 1, 0),
+         max(bisect.bisect_right(page_offsets, max(end - 1, start)) - 1, 0), title)
+        for start, end, title in spans
+    ]
+
+
+class RetrievalIndex:
+    """
+    In-process lexical index over RFP passages. Ranking uses BM25; when NumPy is available a
+    hashed TF-IDF vector index is also built for cosine-similarity and hybrid queries.
+    """
+
+    def __init__(self, text, spans, postings, doc_lengths, text_hash, vectors=None):
+        self.text = text
+        self.spans = spans
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.text_hash = text_hash
+        self.vectors = vectors
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        self._idf = {
+            term: math.log(1 + (len(doc_lengths) - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @staticmethod
+    def hash_text(text):
+        if hasattr(text, "sha256"):
+            return text.sha256()
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def build(cls, text, page_offsets=None, with_vectors=True):
+        start = time.perf_counter()
+        spans = build_passages(text, page_offsets)
+        postings = defaultdict(dict)
+        doc_lengths = []
+        for doc_id, (begin, end, _, _, _) in enumerate(spans):
+            counts = Counter(tokenize(text[begin:end]))
+            doc_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings[term][doc_id] = count
+        index = cls(text, spans, dict(postings), doc_lengths, cls.hash_text(text))
+        if with_vectors and np is not None:
+            index.vectors = index._build_vectors()
+        logging.info(f"RetrievalIndex: Built {len(spans)} passages, {len(postings)} terms "
+                     f"in {time.perf_counter() - start:.2f}s.")
+        return index
+
+    def _term_slot(self, term):
+        return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=4).digest(), "little") % VECTOR_DIMENSIONS
+
+    def _build_vectors(self):
+        vectors = np.zeros((len(self.spans), VECTOR_DIMENSIONS), dtype=np.float32)
+        for term, docs in self.postings.items():
+            slot, idf = self._term_slot(term), self._idf[term]
+            doc_ids = np.fromiter(docs.keys(), dtype=np.int64, count=len(docs))
+            counts = np.fromiter(docs.values(), dtype=np.float32, count=len(docs))
+            vectors[doc_ids, slot] += (1 + np.log(counts)) * idf
+        # Row norms without np.linalg.norm's squared copy of the whole matrix.
+        norms = np.sqrt(np.einsum("ij,ij->i", vectors, vectors))[:, None]
+        norms[norms == 0] = 1
+        vectors /= norms
+        return vectors
+
+    def _query_terms(self, query):
+        """Tokenizes a query, expanding terms missing from the vocabulary to vocabulary terms they prefix."""
+        terms = []
+        for term in tokenize(query):
+            if term in self.postings:
+                terms.append(term)
+            elif len(term) >= MIN_PREFIX_LENGTH:
+                terms.extend(known for known in self.postings if known.startswith(term))
+        return terms
+
+    def bm25_scores(self, query):
+        scores = defaultdict(float)
+        for term in self._query_terms(query):
+            idf = self._idf[term]
+            for doc_id, count in self.postings[term].items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] += idf * count * (BM25_K1 + 1) / (count + norm)
+        return scores
+
+    def vector_scores(self, query):
+        if self.vectors is None or not self.spans:
+            return {}
+        query_vector = np.zeros(VECTOR_DIMENSIONS, dtype=np.float32)
+        for term, count in Counter(self._query_terms(query)).items():
+            query_vector[self._term_slot(term)] += (1 + math.log(count)) * self._idf[term]
+        norm = np.linalg.norm(query_vector)
+        if norm == 0:
+            return {}
+        similarities = self.vectors @ (query_vector / norm)
+        top = np.argpartition(-similarities, min(len(similarities) - 1, 200))[:200]
+        return {int(doc_id): float(similarities[doc_id]) for doc_id in top if similarities[doc_id] > 0}
+
+    def search(self, query, k=5, mode="bm25"):
+        """Returns the top-k passages for a query. `mode` is "bm25", "vector" or "hybrid"."""
+        if mode == "vector":
+            scores = self.vector_scores(query)
+        elif mode == "hybrid":
+            scores = self.bm25_scores(query)
+            best = max(scores.values(), default=0) or 1
+            scores = {doc_id: score / best for doc_id, score in scores.items()}
+            for doc_id, similarity in self.vector_scores(query).items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + similarity
+        else:
+            scores = self.bm25_scores(query)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [self.passage(doc_id, score) for doc_id, score in ranked]
+
+    def passage(self, doc_id, score=0.0):
+        start, end, first_page, last_page, title = self.spans[doc_id]
+        return Passage(start, end, first_page, last_page, title, self.text[start:end], score)
+
+    def save(self, path):
+        """Writes the index next to its source document; vectors go to a sibling .npy file."""
+        payload = {
+            "version": INDEX_VERSION,
+            "text_hash": self.text_hash,
+            "spans": self.spans,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        if self.vectors is not None:
+            with open(f"{path}.npy.tmp", "wb") as f:
+                np.save(f, self.vectors)
+            os.replace(f"{path}.npy.tmp", f"{path}.npy")
+        logging.info(f"RetrievalIndex: Saved to {path}.")
+
+    @classmethod
+    def load(cls, path, text):
+        """Loads a saved index, returning None when it is missing, stale or from another version."""
+        try:
+            with open(path) as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get("version") != INDEX_VERSION or payload.get("text_hash") != cls.hash_text(text):
+            return None
+        postings = {term: {int(doc_id): count for doc_id, count in docs.items()}
+                    for term, docs in payload["postings"].items()}
+        vectors = None
+        if np is not None and os.path.exists(f"{path}.npy"):
+            # Mapped read-only: pages are shared between runs over the same RFP and are not private memory.
+            vectors = np.load(f"{path}.npy", mmap_mode="r")
+        index = cls(text, [tuple(span) for span in payload["spans"]], postings, payload["doc_lengths"],
+                    payload["text_hash"], vectors)
+        logging.info(f"RetrievalIndex: Loaded {len(index.spans)} passages from {path}.")
+        return index
+
+    @classmethod
+    def for_document(cls, document, pdf_path=None):
+        """Returns the index persisted next to `pdf_path` if it matches the document, building it otherwise."""
+        path = f"{pdf_path}.index.json" if pdf_path else None
+        index = cls.load(path, document.text) if path else None
+        if index is None:
+            index = cls.build(document.text, document.page_offsets)
+            if path:
+                index.save(path)
+                if index.vectors is not None:
+                    index.vectors = np.load(f"{path}.npy", mmap_mode="r")
+        return index
+
+
+class RetrievalMixin:
+    """Gives an agent top-k access to the RFP passages most relevant to its role."""
+
+    agent_name = None
+    retrieval_index = None
+
+    def relevant_passages(self, query=None, k=5, mode="bm25"):
+        """Returns the top-k passages for `query`, defaulting to the agent's role keywords."""
+        if self.retrieval_index is None:
+            return []
+        query = query or " ".join(AGENT_PROFILES.get(self.agent_name, []))
+        return self.retrieval_index.search(query, k=k, mode=mode)
@@ -0,0 +1,85 @@
+# utils/retry_utils.py
+import logging
+import random
+import re
+
+from tenacity import retry, retry_if_exception, stop_after_attempt
+
+from utils.rate_limiter import get_rate_limiter
+from utils.tracing import count
+
+MAX_ATTEMPTS = 4
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+# HTTP statuses worth retrying: timeouts, quota exhaustion and transient server errors.
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+QUOTA_STATUS_CODE = 429
+
+RETRY_HINT_PATTERNS = [
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry-after:\s*([\d.]+)", re.IGNORECASE),
+]
+
+
+def status_code(exc):
+    """Returns the HTTP status carried by a google.api_core exception, or None."""
+    code = getattr(exc, "code", None)
+    try:
+        return int(code) if code is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc):
+    """Transient API and network errors are retried; invalid requests, auth failures and blocked prompts are not."""
+    code = status_code(exc)
+    if code is not None:
+        return code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+def retry_hint(exc):
+    """Returns the server-suggested delay in seconds found in an error, or None."""
+    text = f"{exc} {getattr(exc, 'details', '')}"
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("Retry-After"):
+        text += f" retry-after: {headers['Retry-After']}"
+    for pattern in RETRY_HINT_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def quota_aware_wait(retry_state):
+    """
+    Tenacity wait strategy: honours the server's retry hint when present, otherwise backs off
+    exponentially, and adds full jitter either way. Quota errors pause the shared rate limiter so
+    every thread backs off together instead of retrying into the same limit.
+    """
+    exc = retry_state.outcome.exception()
+    backoff = min(MAX_DELAY, BASE_DELAY * 2 ** (retry_state.attempt_number - 1))
+    hint = retry_hint(exc)
+    delay = (hint if hint is not None else backoff) + random.uniform(0, backoff)
+    if status_code(exc) == QUOTA_STATUS_CODE:
+        get_rate_limiter().pause(delay)
+    return delay
+
+
+def log_retry(retry_state):
+    exc = retry_state.outcome.exception()
+    count("retries")
+    logging.warning(f"Retrying {retry_state.fn.__qualname__} after attempt {retry_state.attempt_number} "
+                    f"failed with {exc.__class__.__name__}: {exc}")
+
+
+# Shared retry policy for every agent method that calls the model.
+model_retry = retry(
+    stop=stop_after_attempt(MAX_ATTEMPTS),
+    wait=quota_aware_wait,
+    retry=retry_if_exception(is_retryable),
+    before_sleep=log_retry,
+    reraise=True,
+)
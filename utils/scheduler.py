@@ -0,0 +1,184 @@
+# utils/scheduler.py
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from utils.checkpoint import MISSING, hash_value
+from utils.tracing import get_tracer
+
+# Name of the pipeline stage the current code is running on behalf of, for attribution of model calls.
+current_stage = contextvars.ContextVar("current_stage", default=None)
+
+
+def map_with_context(executor, fn, items):
+    """
+    Like executor.map, but runs each call in a copy of the caller's context so the current stage
+    (and any other context variables) follow the work onto pool threads.
+    """
+    items = list(items)
+    contexts = [contextvars.copy_context() for _ in items]
+    return executor.map(lambda context, item: context.run(fn, item), contexts, items)
+
+
+class Task:
+    def __init__(self, name, func, deps=None, checkpoint=True, inputs=None, key_deps=None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps or [])
+        self.checkpoint = checkpoint
+        self.inputs = inputs or {}
+        self.key_deps = self.deps if key_deps is None else list(key_deps)
+
+
+class DAGScheduler:
+    """
+    Runs a graph of tasks, starting each one as soon as all of its dependencies have finished.
+    Independent tasks run concurrently on a bounded thread pool.
+    With a RunState, checkpointed task results are saved after they finish and, when resuming,
+    reused if the task's inputs are unchanged. A `listener`, if given, is called from worker threads
+    as listener(event, task_name, **details) for the "started", "finished", "restored" and "failed" events.
+    """
+
+    def __init__(self, max_workers=4, state=None, listener=None):
+        self.max_workers = max_workers
+        self.state = state
+        self.listener = listener
+        self.tasks = {}
+        self.timings = {}
+        self.keys = {}
+        self.restored = []
+
+    def add_task(self, name, func, deps=None, checkpoint=True, inputs=None, key_deps=None):
+        """
+        Registers a task. When the task runs, `func` is called with the result of each
+        dependency passed as a keyword argument named after that dependency.
+        Tasks returning values that cannot be saved as JSON must pass checkpoint=False.
+        `inputs` holds extra settings that affect the result and so belong in its checkpoint key.
+        `key_deps` limits which dependencies are part of the checkpoint key (by default all of them);
+        a change in any other dependency alone does not invalidate the saved result.
+        """
+        if name in self.tasks:
+            raise ValueError(f"Task '{name}' is already registered.")
+        self.tasks[name] = Task(name, func, deps, checkpoint, inputs, key_deps)
+        return self
+
+    def _validate(self):
+        for task in self.tasks.values():
+            for dep in task.deps:
+                if dep not in self.tasks:
+                    raise ValueError(f"Task '{task.name}' depends on unknown task '{dep}'.")
+            for dep in task.key_deps:
+                if dep not in task.deps:
+                    raise ValueError(f"Task '{task.name}' keys on '{dep}', which is not one of its dependencies.")
+
+        visiting, visited = set(), set()
+
+        def visit(name, path):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle detected: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in self.tasks[name].deps:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.tasks:
+            visit(name, [])
+
+    def _input_key(self, task, results):
+        """
+        Identifies a task's inputs: checkpointed dependencies by the hash of their result, others
+        (such as agent objects) by their own input key.
+        """
+        inputs = {
+            dep: self.keys[dep] if not self.tasks[dep].checkpoint else hash_value(results[dep])
+            for dep in task.key_deps
+        }
+        inputs.update({f"setting:{name}": value for name, value in task.inputs.items()})
+        return self.state.input_hash(task.name, inputs)
+
+    def _notify(self, event, name, **details):
+        if self.listener is not None:
+            try:
+                self.listener(event, name, **details)
+            except Exception as e:
+                logging.warning(f"Scheduler: Listener failed on {event} '{name}': {e}")
+
+    def _run_task(self, task, kwargs):
+        current_stage.set(task.name)
+        with get_tracer().span(f"stage:{task.name}", stage=task.name) as span:
+            key = self.keys.get(task.name)
+            if key is not None and task.checkpoint:
+                saved = self.state.load(task.name, key)
+                if saved is not MISSING:
+                    logging.info(f"Scheduler: Restored task '{task.name}' from checkpoint.")
+                    span.set(restored=True)
+                    self.restored.append(task.name)
+                    self.timings[task.name] = 0.0
+                    self._notify("restored", task.name)
+                    return saved
+            logging.info(f"Scheduler: Starting task '{task.name}'.")
+            self._notify("started", task.name)
+            start = time.perf_counter()
+            try:
+                result = task.func(**kwargs)
+            except Exception as e:
+                self._notify("failed", task.name, error=f"{e.__class__.__name__}: {e}")
+                raise
+            self.timings[task.name] = time.perf_counter() - start
+            logging.info(f"Scheduler: Task '{task.name}' finished in {self.timings[task.name]:.2f}s.")
+            self._notify("finished", task.name, seconds=self.timings[task.name])
+            if key is not None and task.checkpoint:
+                self.state.save(task.name, key, result)
+            return result
+
+    def _required(self, targets):
+        required, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.tasks:
+                raise ValueError(f"Unknown target task '{name}'.")
+            if name not in required:
+                required.add(name)
+                stack.extend(self.tasks[name].deps)
+        return required
+
+    def run(self, targets=None):
+        """
+        Executes all registered tasks, or only `targets` and the tasks they depend on, and returns a
+        dict mapping task names to results.
+        """
+        self._validate()
+        results = {}
+        required = self._required(targets) if targets is not None else set(self.tasks)
+        pending = {name: task for name, task in self.tasks.items() if name in required}
+        running = {}
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                ready = [task for task in pending.values() if all(dep in results for dep in task.deps)]
+                for task in ready:
+                    kwargs = {dep: results[dep] for dep in task.deps}
+                    if self.state is not None:
+                        self.keys[task.name] = self._input_key(task, results)
+                    context = contextvars.copy_context()
+                    running[executor.submit(context.run, self._run_task, task, kwargs)] = task.name
+                    del pending[task.name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception:
+                        logging.error(f"Scheduler: Task '{name}' failed; cancelling remaining tasks.")
+                        for other in running:
+                            other.cancel()
+                        raise
+
+        logging.info(f"Scheduler: All {len(results)} tasks finished in {time.perf_counter() - start:.2f}s.")
+        return results
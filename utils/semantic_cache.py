@@ -0,0 +1,269 @@
+# utils/semantic_cache.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from utils.retrieval import tokenize
+from utils.tracing import annotate
+
+try:
+    import numpy as np
+except ImportError:  # Without NumPy there is no semantic cache; every stage runs as before.
+    np = None
+
+DEFAULT_SEMANTIC_CACHE_PATH = os.path.join(".cache", "semantic.sqlite3")
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_MAX_AGE = 180 * 24 * 3600
+EVICT_EVERY = 20
+SHINGLE_WORDS = 5
+PERMUTATIONS = 128
+# 32 bands of 4 rows: inputs with a Jaccard similarity above ~0.45 are likely to share a band.
+BANDS = 32
+# Similarity at or above which a prior output is reused as it is, or offered as a starting point.
+DEFAULT_REUSE_THRESHOLD = 0.95
+DEFAULT_WARM_START_THRESHOLD = 0.6
+# A prime just below 2**32, so (a * x + b) % PRIME never overflows 64 bits.
+PRIME = 4294967291
+SEED = 1
+
+
+def _gram_hashes(grams):
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def shingles(text):
+    """
+    Returns the hashes of the overlapping SHINGLE_WORDS-word sequences in `text`. A TextStore is
+    read a page at a time, carrying the last words of each page over to the next, so the result is
+    the same as for the whole text without decoding it at once.
+    """
+    pages = (page for _, page in text.pages()) if hasattr(text, "pages") else [text]
+    hashes, carry, count = [], [], 0
+    for page in pages:
+        page_words = tokenize(page)
+        count += len(page_words)
+        words = carry + page_words
+        hashes.append(_gram_hashes([" ".join(words[index:index + SHINGLE_WORDS])
+                                    for index in range(len(words) - SHINGLE_WORDS + 1)]))
+        carry = words[-(SHINGLE_WORDS - 1):]
+    if count < SHINGLE_WORDS:
+        # Too short for a full shingle: the few words there are form the only one.
+        return np.unique(_gram_hashes([" ".join(carry)] if carry else []))
+    return np.unique(np.concatenate(hashes))
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, computed for all permutations at once."""
+
+    def __init__(self, permutations=PERMUTATIONS, seed=SEED):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, PRIME, permutations, dtype=np.uint64)[:, None]
+        self.b = rng.integers(0, PRIME, permutations, dtype=np.uint64)[:, None]
+        self.permutations = permutations
+
+    def signature(self, text):
+        hashes = shingles(text)
+        if not len(hashes):
+            return np.full(self.permutations, PRIME, dtype=np.uint32)
+        return ((self.a * hashes[None, :] + self.b) % PRIME).min(axis=1).astype(np.uint32)
+
+
+def similarity(signature, other):
+    """Estimates the Jaccard similarity of two inputs from their MinHash signatures."""
+    return float(np.mean(signature == other))
+
+
+def band_keys(signature, bands=BANDS):
+    """One LSH bucket key per band; inputs that share any key are candidate near-duplicates."""
+    rows = len(signature) // bands
+    return [int.from_bytes(hashlib.blake2b(bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes(),
+                                           digest_size=8).digest(), "big", signed=True)
+            for band in range(bands)]
+
+
+class Match:
+    """A prior output whose input is similar to the one being looked up."""
+
+    def __init__(self, entry_id, stage, output, similarity, rfp):
+        self.entry_id = entry_id
+        self.stage = stage
+        self.output = output
+        self.similarity = similarity
+        self.rfp = rfp
+
+    def __repr__(self):
+        return f"Match({self.stage!r}, {self.rfp!r}, {self.similarity:.2f})"
+
+
+class SemanticCache:
+    """
+    Persistent near-duplicate index over the inputs of past runs and the outputs they produced,
+    backed by a local SQLite file. Inputs are compared by MinHash signatures over word shingles,
+    and found through an LSH table of band hashes, so a lookup reads only the few entries that
+    share a band instead of every past input. Unlike the response cache, a hit does not need a
+    byte-identical prompt: an RFP from the same client or built from the same boilerplate matches.
+    """
+
+    def __init__(self, path=DEFAULT_SEMANTIC_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_age=DEFAULT_MAX_AGE,
+                 reuse_threshold=DEFAULT_REUSE_THRESHOLD, warm_start_threshold=DEFAULT_WARM_START_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.reuse_threshold = reuse_threshold
+        self.warm_start_threshold = warm_start_threshold
+        self.hasher = MinHasher()
+        self.counts = {"reused": 0, "warm_starts": 0, "misses": 0}
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+        if columns and "model" not in columns:
+            # Entries written before outputs were keyed on their model cannot be attributed to one; start over.
+            logging.info("SemanticCache: Dropping entries that predate per-model keys.")
+            self._conn.executescript("DROP TABLE IF EXISTS bands; DROP TABLE IF EXISTS entries;")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                stage TEXT NOT NULL,
+                model TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                output TEXT NOT NULL,
+                rfp TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (stage, model, input_hash)
+            );
+            CREATE TABLE IF NOT EXISTS bands (
+                stage TEXT NOT NULL,
+                model TEXT NOT NULL,
+                band_key INTEGER NOT NULL,
+                entry_id INTEGER NOT NULL REFERENCES entries (id) ON DELETE CASCADE
+            );
+            CREATE INDEX IF NOT EXISTS bands_lookup ON bands (stage, model, band_key);
+            CREATE INDEX IF NOT EXISTS bands_entry ON bands (entry_id);
+            """
+        )
+        self._conn.commit()
+        logging.info(f"SemanticCache initialized at: {path} (reuse >= {reuse_threshold}, "
+                     f"warm start >= {warm_start_threshold})")
+
+    def lookup(self, stage, text, model):
+        """
+        Returns the most similar prior output for `stage` written by `model` (see
+        utils.api_utils.model_namespace) at or above the warm-start threshold, or None.
+        """
+        signature = self.hasher.signature(text)
+        keys = band_keys(signature)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, output, rfp, signature, created_at FROM entries WHERE id IN ("
+                f"SELECT entry_id FROM bands WHERE stage = ? AND model = ? AND band_key IN ({', '.join('?' * len(keys))}))",
+                [stage, model] + keys,
+            ).fetchall()
+            now = time.time()
+            best = None
+            for entry_id, output, rfp, stored, created_at in rows:
+                if self.max_age and now - created_at > self.max_age:
+                    continue
+                score = similarity(signature, np.frombuffer(stored, dtype=np.uint32))
+                if score >= self.warm_start_threshold and (best is None or score > best.similarity):
+                    best = Match(entry_id, stage, output, score, rfp)
+            if best is None:
+                self.counts["misses"] += 1
+            else:
+                self._conn.execute("UPDATE entries SET accessed_at = ?, hit_count = hit_count + 1 WHERE id = ?",
+                                   (now, best.entry_id))
+                self._conn.commit()
+                self.counts["reused" if best.similarity >= self.reuse_threshold else "warm_starts"] += 1
+        annotate(semantic_candidates=len(rows), semantic_similarity=round(best.similarity, 3) if best else 0.0)
+        return best
+
+    def put(self, stage, text, output, model, rfp=None):
+        """Indexes `output`, written by `model`, under the signature of the input `text` that produced it."""
+        signature = self.hasher.signature(text)
+        input_hash = text.sha256() if hasattr(text, "sha256") else hashlib.sha256(text.encode("utf-8")).hexdigest()
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM bands WHERE entry_id IN "
+                               "(SELECT id FROM entries WHERE stage = ? AND model = ? AND input_hash = ?)",
+                               (stage, model, input_hash))
+            cursor = self._conn.execute(
+                "INSERT OR REPLACE INTO entries (stage, model, input_hash, signature, output, rfp, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (stage, model, input_hash, signature.tobytes(), output, rfp, len(output.encode("utf-8")), now, now),
+            )
+            self._conn.executemany("INSERT INTO bands (stage, model, band_key, entry_id) VALUES (?, ?, ?, ?)",
+                                   [(stage, model, key, cursor.lastrowid) for key in band_keys(signature)])
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict()
+
+    def evict(self):
+        """Removes expired entries, then the least recently used ones beyond `max_entries`."""
+        with self._lock:
+            return self._evict()
+
+    def _evict(self):
+        stale = []
+        if self.max_age:
+            stale += self._conn.execute("SELECT id FROM entries WHERE created_at < ?",
+                                        (time.time() - self.max_age,)).fetchall()
+        count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - len(stale)
+        if count > self.max_entries:
+            stale += self._conn.execute(
+                "SELECT id FROM entries WHERE created_at >= ? ORDER BY accessed_at ASC LIMIT ?",
+                (time.time() - self.max_age if self.max_age else 0, count - self.max_entries),
+            ).fetchall()
+        self._conn.executemany("DELETE FROM bands WHERE entry_id = ?", stale)
+        self._conn.executemany("DELETE FROM entries WHERE id = ?", stale)
+        self._conn.commit()
+        if stale:
+            logging.info(f"SemanticCache: Evicted {len(stale)} entries.")
+        return len(stale)
+
+    def clear(self):
+        """Deletes every indexed output."""
+        with self._lock:
+            self._conn.execute("DELETE FROM bands")
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def stats(self):
+        """Returns reuse, warm-start and miss counters for this process along with the size of the index."""
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {**self.counts, "entries": count, "bytes": total}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """
+    Returns the process-wide semantic cache, or None unless RFP_SEMANTIC_CACHE=1 (it also needs NumPy).
+    The location can be set with RFP_SEMANTIC_CACHE_PATH and the thresholds with RFP_SEMANTIC_REUSE
+    and RFP_SEMANTIC_WARM_START.
+    """
+    global _cache
+    if os.environ.get("RFP_SEMANTIC_CACHE", "0") != "1" or np is None:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticCache(
+                path=os.environ.get("RFP_SEMANTIC_CACHE_PATH", DEFAULT_SEMANTIC_CACHE_PATH),
+                reuse_threshold=float(os.environ.get("RFP_SEMANTIC_REUSE", DEFAULT_REUSE_THRESHOLD)),
+                warm_start_threshold=float(os.environ.get("RFP_SEMANTIC_WARM_START", DEFAULT_WARM_START_THRESHOLD)),
+            )
+        return _cache
@@ -0,0 +1,393 @@
+# utils/service.py
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_MAX_DOCUMENTS = 2
+DEFAULT_TENANT_LIMIT = 1
+DEFAULT_MAX_QUEUED = 32
+DEFAULT_MAX_QUEUED_PER_TENANT = 8
+DEFAULT_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+# Finished jobs, with their events, proposal and work directory, are kept this long (seconds)
+# and at most this many at once; older ones are evicted.
+DEFAULT_JOB_TTL = 3600
+DEFAULT_MAX_FINISHED = 100
+EVICT_INTERVAL_SECONDS = 60
+MAX_HEADER_BYTES = 16 * 1024
+# Seconds a client is told to wait before retrying when the queue is full.
+RETRY_AFTER_SECONDS = 30
+FINISHED_STATES = ("completed", "failed")
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 411: "Length Required", 413: "Payload Too Large", 429: "Too Many Requests",
+           500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Job:
+    """One uploaded RFP, its place in the queue and the progress events published while it runs."""
+
+    def __init__(self, tenant, priority, sequence, work_dir):
+        self.id = uuid.uuid4().hex[:12]
+        self.tenant = tenant
+        self.priority = priority
+        self.sequence = sequence
+        self.directory = os.path.join(work_dir, self.id)
+        self.rfp_path = os.path.join(self.directory, "rfp.pdf")
+        self.output_path = os.path.join(self.directory, "proposal.md")
+        self.state = "queued"
+        self.error = None
+        self.stages = {}
+        self.events = []
+        self.streamed = False
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._changed = asyncio.Condition()
+
+    def sort_key(self):
+        # Higher priority first, then first come, first served.
+        return -self.priority, self.sequence
+
+    async def publish(self, event, **data):
+        """Records an event and wakes every client streaming this job's progress."""
+        async with self._changed:
+            self.events.append({"event": event, "time": time.time(), **data})
+            self._changed.notify_all()
+
+    async def finish(self, state, **data):
+        """Moves the job to a finished state and publishes the matching event in one step."""
+        async with self._changed:
+            self.state = state
+            self.finished_at = time.time()
+            self.events.append({"event": state, "time": self.finished_at, **data})
+            self._changed.notify_all()
+
+    async def follow(self):
+        """Yields every event of the job, past and future, until it has finished."""
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.events) > position or self.state in FINISHED_STATES)
+                events = self.events[position:]
+            position += len(events)
+            for event in events:
+                yield event
+            if not events and self.state in FINISHED_STATES:
+                return
+
+    def status(self):
+        return {
+            "id": self.id,
+            "tenant": self.tenant,
+            "priority": self.priority,
+            "state": self.state,
+            "error": self.error,
+            "stages": self.stages,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class RFPService:
+    """
+    Long-running HTTP front end for the pipeline. Uploaded RFPs are queued by priority and run on a
+    thread pool inside this process, so the model registry, response cache, rate limiter and loaded
+    modules stay warm between documents.
+
+    Backpressure: uploads are refused with 429 once `max_queued` jobs (or `max_queued_per_tenant`
+    for one tenant) are waiting. At most `max_documents` jobs run at once, and at most
+    `tenant_limit` of them for the same tenant; a tenant at its limit does not block others.
+
+    Endpoints:
+      POST /jobs?tenant=<name>&priority=<int>   body: the RFP PDF           -> 202 with the job id
+      GET  /jobs/<id>                           job status and stage timings
+      GET  /jobs/<id>/events                    server-sent events: stage progress, proposal chunks
+      GET  /jobs/<id>/result                    the finished proposal (Markdown)
+      GET  /health                              queue and worker counts
+
+    Finished jobs are evicted, and their work directories deleted, `job_ttl` seconds after they
+    finish or once more than `max_finished` have finished. The uploaded PDF is deleted as soon as
+    its job finishes.
+    """
+
+    def __init__(self, pipeline, work_dir=".service", max_documents=DEFAULT_MAX_DOCUMENTS,
+                 tenant_limit=DEFAULT_TENANT_LIMIT, max_queued=DEFAULT_MAX_QUEUED,
+                 max_queued_per_tenant=DEFAULT_MAX_QUEUED_PER_TENANT, max_upload_bytes=DEFAULT_MAX_UPLOAD_BYTES,
+                 job_ttl=DEFAULT_JOB_TTL, max_finished=DEFAULT_MAX_FINISHED):
+        self.pipeline = pipeline
+        self.work_dir = work_dir
+        self.max_documents = max_documents
+        self.tenant_limit = tenant_limit
+        self.max_queued = max_queued
+        self.max_queued_per_tenant = max_queued_per_tenant
+        self.max_upload_bytes = max_upload_bytes
+        self.job_ttl = job_ttl
+        self.max_finished = max_finished
+        self.jobs = {}
+        self._pending = []
+        self._running = {}
+        self._sequence = itertools.count()
+        self._executor = ThreadPoolExecutor(max_workers=max_documents, thread_name_prefix="rfp-job")
+        self._changed = None
+        self._loop = None
+        self._server = None
+        self._background = []
+        # Running job tasks. The event loop holds only weak references to tasks, so they are kept here until done.
+        self._tasks = set()
+        self.port = None
+
+    # Queue
+
+    def _queued_for(self, tenant):
+        return sum(1 for job in self._pending if job.tenant == tenant)
+
+    async def submit(self, tenant, priority, pdf_bytes):
+        if len(self._pending) >= self.max_queued:
+            raise HTTPError(429, "The queue is full.", {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        if self._queued_for(tenant) >= self.max_queued_per_tenant:
+            raise HTTPError(429, f"Tenant '{tenant}' has too many queued jobs.", {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        job = Job(tenant, priority, next(self._sequence), self.work_dir)
+        os.makedirs(job.directory, exist_ok=True)
+        with open(job.rfp_path, "wb") as f:
+            f.write(pdf_bytes)
+        self.jobs[job.id] = job
+        await job.publish("queued", position=len(self._pending) + 1)
+        async with self._changed:
+            self._pending.append(job)
+            self._changed.notify_all()
+        logging.info(f"Service: Queued job {job.id} for tenant '{tenant}' with priority {priority}.")
+        return job
+
+    def evict(self, now=None):
+        """Forgets finished jobs past the TTL, then the oldest beyond `max_finished`, and deletes their work directories."""
+        now = time.time() if now is None else now
+        finished = sorted((job for job in self.jobs.values() if job.state in FINISHED_STATES),
+                          key=lambda job: job.finished_at)
+        expired = [job for job in finished if now - job.finished_at > self.job_ttl]
+        kept = [job for job in finished if job not in expired]
+        expired += kept[:max(0, len(kept) - self.max_finished)]
+        for job in expired:
+            del self.jobs[job.id]
+            shutil.rmtree(job.directory, ignore_errors=True)
+        if expired:
+            logging.info(f"Service: Evicted {len(expired)} finished jobs.")
+        return len(expired)
+
+    async def _evict_periodically(self):
+        while True:
+            await asyncio.sleep(EVICT_INTERVAL_SECONDS)
+            self.evict()
+
+    def _remove_upload(self, job):
+        # The PDF and the retrieval index saved beside it are not needed once the proposal is written.
+        for name in os.listdir(job.directory):
+            if name.startswith(os.path.basename(job.rfp_path)):
+                try:
+                    os.remove(os.path.join(job.directory, name))
+                except OSError as e:
+                    logging.warning(f"Service: Could not remove {name} of job {job.id}: {e}")
+
+    def _runnable_job(self):
+        """Returns the highest-priority queued job whose tenant is below its concurrency limit, if a worker is free."""
+        if sum(self._running.values()) >= self.max_documents:
+            return None
+        for job in sorted(self._pending, key=Job.sort_key):
+            if self._running.get(job.tenant, 0) < self.tenant_limit:
+                return job
+        return None
+
+    async def _dispatch(self):
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._runnable_job() is not None)
+                job = self._runnable_job()
+                self._pending.remove(job)
+                self._running[job.tenant] = self._running.get(job.tenant, 0) + 1
+            task = asyncio.create_task(self._execute(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, job):
+        job.state = "running"
+        job.started_at = time.time()
+        await job.publish("started")
+
+        def progress(event, stage, **details):
+            # Called from pipeline threads; hand the event to the event loop.
+            asyncio.run_coroutine_threadsafe(self._on_progress(job, event, stage, details), self._loop)
+
+        state = "failed"
+        try:
+            await self._loop.run_in_executor(self._executor, lambda: self.pipeline(
+                job.rfp_path, job.output_path, state_dir=os.path.join(job.directory, "state"), progress=progress))
+            if not job.streamed:
+                with open(job.output_path) as f:
+                    await job.publish("chunk", stage="final_response", text=f.read())
+            state = "completed"
+        except Exception as e:
+            logging.error(f"Service: Job {job.id} failed: {e}")
+            job.error = f"{e.__class__.__name__}: {e}"
+        finally:
+            self._remove_upload(job)
+            await job.finish(state, error=job.error, seconds=time.time() - job.started_at)
+            async with self._changed:
+                self._running[job.tenant] -= 1
+                self._changed.notify_all()
+            logging.info(f"Service: Job {job.id} {job.state} in {job.finished_at - job.started_at:.1f}s.")
+            self.evict()
+
+    async def _on_progress(self, job, event, stage, details):
+        if event == "reset":
+            # A retry restarts the proposal; clients discard the chunks they have received so far.
+            await job.publish("reset", stage=stage)
+            return
+        if event == "chunk":
+            job.streamed = True
+            await job.publish("chunk", stage=stage, text=details["text"])
+            return
+        job.stages[stage] = {"state": event, **details}
+        await job.publish(f"stage_{event}", stage=stage, **details)
+
+    # HTTP
+
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line.")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        body = b""
+        if method == "POST":
+            if "content-length" not in headers:
+                raise HTTPError(411, "Content-Length is required.")
+            length = headers["content-length"]
+            if not (length.isascii() and length.isdigit()):
+                raise HTTPError(400, "Content-Length must be a non-negative integer.")
+            length = int(length)
+            if length > self.max_upload_bytes:
+                raise HTTPError(413, f"Uploads are limited to {self.max_upload_bytes} bytes.")
+            body = await reader.readexactly(length)
+        return method, urlsplit(target), headers, body
+
+    async def _send(self, writer, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = (json.dumps(body) if content_type == "application/json" else body).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}", "Connection: close"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _stream_events(self, writer, job):
+        writer.write(("HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                      "Connection: close\r\n\r\n").encode("latin-1"))
+        async for event in job.follow():
+            writer.write(f"event: {event['event']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+            await writer.drain()
+
+    def _job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"Unknown job '{job_id}'.")
+        return job
+
+    async def _route(self, writer, method, url, body):
+        parts = [part for part in url.path.split("/") if part]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if parts == ["health"] and method == "GET":
+            return await self._send(writer, 200, {
+                "queued": len(self._pending),
+                "running": sum(self._running.values()),
+                "running_by_tenant": {tenant: count for tenant, count in self._running.items() if count},
+                "jobs": len(self.jobs),
+            })
+        if parts == ["jobs"] and method == "POST":
+            if not body.startswith(b"%PDF"):
+                raise HTTPError(400, "The request body must be a PDF document.")
+            try:
+                priority = int(query.get("priority", 0))
+            except ValueError:
+                raise HTTPError(400, "priority must be an integer.")
+            job = await self.submit(query.get("tenant", "default"), priority, body)
+            return await self._send(writer, 202, {"id": job.id, "status_url": f"/jobs/{job.id}",
+                                                  "events_url": f"/jobs/{job.id}/events",
+                                                  "result_url": f"/jobs/{job.id}/result"})
+        if len(parts) in (2, 3) and parts[0] == "jobs" and method == "GET":
+            job = self._job(parts[1])
+            if len(parts) == 2:
+                return await self._send(writer, 200, job.status())
+            if parts[2] == "events":
+                return await self._stream_events(writer, job)
+            if parts[2] == "result":
+                if job.state != "completed":
+                    raise HTTPError(409, f"Job is {job.state}.")
+                with open(job.output_path, "rb") as f:
+                    return await self._send(writer, 200, f.read(), content_type="text/markdown; charset=utf-8")
+            raise HTTPError(404, "Not found.")
+        if parts in (["health"], ["jobs"]) or (len(parts) in (2, 3) and parts[0] == "jobs"):
+            raise HTTPError(405, f"{method} is not supported here.")
+        raise HTTPError(404, "Not found.")
+
+    async def handle(self, reader, writer):
+        try:
+            method, url, _, body = await self._read_request(reader)
+            await self._route(writer, method, url, body)
+        except HTTPError as e:
+            await self._send(writer, e.status, {"error": str(e)}, headers=e.headers)
+        except asyncio.LimitOverrunError:
+            await self._send(writer, 400, {"error": "Request headers are too large."})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logging.exception("Service: Request failed.")
+            await self._send(writer, 500, {"error": str(e)})
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Starts listening and dispatching jobs, and returns the server. Port 0 picks a free port, kept in `port`."""
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Condition()
+        self._server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._background = [asyncio.create_task(self._dispatch()), asyncio.create_task(self._evict_periodically())]
+        logging.info(f"Service: Listening on http://{host}:{self.port} with {self.max_documents} workers "
+                     f"({self.tenant_limit} per tenant, up to {self.max_queued} queued).")
+        return self._server
+
+    def close(self):
+        """Stops accepting requests and dispatching jobs; jobs already running on the pool are abandoned."""
+        for task in self._background:
+            task.cancel()
+        if self._server is not None:
+            self._server.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        server = await self.start(host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
@@ -0,0 +1,129 @@
+# utils/streaming.py
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# The active stream_to() target. A context variable, so utils.scheduler.map_with_context carries it onto pool threads.
+_current_sink = contextvars.ContextVar("current_sink", default=None)
+
+
+class StreamSink:
+    """
+    Destination for a streamed response. Chunks are appended to `<path>.partial` as they arrive
+    and the file is renamed to `path` once the response is complete.
+    """
+
+    def __init__(self, path, on_chunk=None):
+        self.path = path
+        self.partial_path = f"{path}.partial"
+        self.on_chunk = on_chunk
+        self.time_to_first_token = None
+        self.chunks = 0
+        self.characters = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def claim(self):
+        """Takes the sink for one streamed call; returns False while a call on another thread is streaming into it."""
+        return self._lock.acquire(blocking=False)
+
+    def release(self):
+        self._lock.release()
+
+    def open(self):
+        """Starts (or restarts, on a retry) writing the response from the beginning."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.close()
+        self._file = open(self.partial_path, "w")
+        if self.on_chunk is not None and self.chunks:
+            # A retry starts the response over; tell the listener to discard what it has.
+            self.on_chunk(None)
+        self.time_to_first_token = None
+        self.chunks = 0
+        self.characters = 0
+
+    def write(self, text):
+        self._file.write(text)
+        self._file.flush()
+        self.chunks += 1
+        self.characters += len(text)
+        if self.on_chunk is not None:
+            self.on_chunk(text)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self):
+        self.close()
+        os.replace(self.partial_path, self.path)
+        logging.info(f"Streaming: Wrote {self.characters} characters in {self.chunks} chunks to {self.path}.")
+
+
+@contextmanager
+def stream_to(path, on_chunk=None):
+    """
+    Streams the model calls made inside the block to `path`, including those that agent methods fan
+    out to pool threads through map_with_context, e.g. `with stream_to("temp/plan.md"): lead.create_delivery_plan(...)`.
+    Each call starts the file over, so it ends up holding the last response, and while one call is
+    streaming, calls running alongside it on other threads are made without streaming.
+    `on_chunk`, if given, is also called with each chunk of text as it arrives, and with None when a
+    later call or a retry restarts the response.
+    """
+    sink = StreamSink(path, on_chunk)
+    token = _current_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _current_sink.reset(token)
+        sink.close()
+
+
+def current_sink():
+    return _current_sink.get()
+
+
+class StreamedResponse:
+    """Response assembled from a completed stream, exposing the same `text` attribute as a normal response."""
+
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class StreamingModel:
+    """
+    Wraps a model so that, when the caller's context has an active stream_to() target, responses are
+    requested with stream=True and written to disk chunk by chunk. Time to first token is logged.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def generate_content(self, prompt, **kwargs):
+        sink = current_sink()
+        if sink is None or kwargs.get("stream") or not sink.claim():
+            return self.model.generate_content(prompt, **kwargs)
+        try:
+            start = time.perf_counter()
+            sink.open()
+            response = self.model.generate_content(prompt, stream=True, **kwargs)
+            parts = []
+            for chunk in response:
+                text = chunk.text
+                if sink.time_to_first_token is None:
+                    sink.time_to_first_token = time.perf_counter() - start
+                    logging.info(f"Streaming: First token after {sink.time_to_first_token:.2f}s.")
+                sink.write(text)
+                parts.append(text)
+            sink.finish()
+        finally:
+            sink.release()
+        return StreamedResponse("".join(parts), getattr(response, "usage_metadata", None))
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
@@ -0,0 +1,324 @@
+# utils/structured.py
+import datetime
+import json
+import logging
+import os
+import re
+
+from utils.api_utils import get_model
+from utils.prompts import PromptTemplate
+from utils.retry_utils import model_retry
+from utils.tracing import traced
+
+MAX_ATTEMPTS = 2
+# A stated line total may differ from quantity x unit cost by this much before it is recomputed.
+TOTAL_TOLERANCE = 0.01
+
+STRING = {"type": "string"}
+NUMBER = {"type": "number"}
+INTEGER = {"type": "integer"}
+DATE = {"type": "string", "description": "ISO date, YYYY-MM-DD"}
+STRINGS = {"type": "array", "items": STRING}
+
+
+def _object(properties, required=None):
+    return {"type": "object", "properties": properties, "required": list(properties) if required is None else required}
+
+
+def _list(name, item):
+    return _object({name: {"type": "array", "items": item}})
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a model's JSON output cannot be parsed or does not match its schema."""
+
+    def __init__(self, kind, errors):
+        super().__init__(f"Invalid {kind}: {'; '.join(errors[:5])}")
+        self.kind = kind
+        self.errors = errors
+
+
+class OutputSchema:
+    """
+    A typed view of one agent's response: the JSON schema the model is constrained to (a subset the
+    Gemini API accepts), and the local checks and repairs applied after schema validation.
+    """
+
+    def __init__(self, kind, agent_name, description, schema, repair=None):
+        self.kind = kind
+        self.agent_name = agent_name
+        self.description = description
+        self.schema = schema
+        self.repair = repair
+
+    def validate(self, value):
+        """Returns the value with deterministic repairs applied, or raises StructuredOutputError."""
+        errors = validate(value, self.schema)
+        if not errors and self.repair is not None:
+            errors = self.repair(value)
+        if errors:
+            raise StructuredOutputError(self.kind, errors)
+        return value
+
+
+def validate(value, schema, path="$"):
+    """Checks `value` against a schema using type, properties, required, items and enum. Returns the errors."""
+    kind = schema.get("type")
+    if kind == "object":
+        if not isinstance(value, dict):
+            return [f"{path} must be an object"]
+        errors = [f"{path}.{name} is required" for name in schema.get("required", []) if value.get(name) is None]
+        for name, subschema in schema.get("properties", {}).items():
+            if value.get(name) is not None:
+                errors += validate(value[name], subschema, f"{path}.{name}")
+        return errors
+    if kind == "array":
+        if not isinstance(value, list):
+            return [f"{path} must be an array"]
+        errors = []
+        for index, item in enumerate(value):
+            errors += validate(item, schema["items"], f"{path}[{index}]")
+        return errors
+    if kind == "string":
+        if not isinstance(value, str):
+            return [f"{path} must be a string"]
+        if "enum" in schema and value not in schema["enum"]:
+            return [f"{path} must be one of {', '.join(schema['enum'])}"]
+        return []
+    if kind == "number":
+        return [] if isinstance(value, (int, float)) and not isinstance(value, bool) else [f"{path} must be a number"]
+    if kind == "integer":
+        return [] if isinstance(value, int) and not isinstance(value, bool) else [f"{path} must be an integer"]
+    if kind == "boolean":
+        return [] if isinstance(value, bool) else [f"{path} must be a boolean"]
+    return []
+
+
+def _parse_date(text):
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+def _repair_costs(value):
+    # Line totals are recomputed locally rather than trusted; only negative figures are errors.
+    errors = []
+    for index, item in enumerate(value["items"]):
+        if item["quantity"] < 0 or item["unit_cost"] < 0:
+            errors.append(f"$.items[{index}] has a negative quantity or unit cost")
+            continue
+        total = round(item["quantity"] * item["unit_cost"], 2)
+        stated = item.get("total_cost")
+        if stated is not None and abs(stated - total) > TOTAL_TOLERANCE * max(total, 1):
+            logging.info(f"Structured: Recomputed the total of '{item['item']}' ({stated} -> {total}).")
+        item["total_cost"] = total
+    return errors
+
+
+def _repair_phases(value):
+    errors = []
+    names = {phase["name"] for phase in value["phases"]}
+    for index, phase in enumerate(value["phases"]):
+        start, end = _parse_date(phase["start"]), _parse_date(phase["end"])
+        if start is None or end is None:
+            errors.append(f"$.phases[{index}] start and end must be YYYY-MM-DD dates")
+        elif end < start:
+            errors.append(f"$.phases[{index}] ends before it starts")
+        unknown = [name for name in phase.get("depends_on") or [] if name not in names]
+        if unknown:
+            logging.info(f"Structured: Dropped unknown dependencies of '{phase['name']}': {', '.join(unknown)}.")
+            phase["depends_on"] = [name for name in phase["depends_on"] if name in names]
+        for milestone in phase.get("milestones") or []:
+            if _parse_date(milestone["date"]) is None:
+                errors.append(f"$.phases[{index}] milestone '{milestone['name']}' needs a YYYY-MM-DD date")
+    return errors
+
+
+COST_CATEGORIES = ["personnel", "software", "infrastructure", "services", "travel", "contingency"]
+ASSUMPTION_CATEGORIES = ["it_environment", "technical", "regulatory", "timeline_budget", "other"]
+
+SCHEMAS = {
+    "cost_items": OutputSchema("cost_items", "BD Manager", "cost line items", _object({
+        "currency": STRING,
+        "items": {"type": "array", "items": _object({
+            "category": {"type": "string", "enum": COST_CATEGORIES},
+            "item": STRING,
+            "description": STRING,
+            "quantity": NUMBER,
+            "unit": STRING,
+            "unit_cost": NUMBER,
+            "total_cost": NUMBER,
+            "phase": STRING,
+        }, required=["category", "item", "quantity", "unit_cost"])},
+    }), repair=_repair_costs),
+    "phases": OutputSchema("phases", "Delivery Lead", "delivery phases with their dates, resources and milestones",
+                           _list("phases", _object({
+                               "name": STRING,
+                               "start": DATE,
+                               "end": DATE,
+                               "deliverables": STRINGS,
+                               "depends_on": STRINGS,
+                               "resources": {"type": "array", "items": _object({
+                                   "role": STRING, "count": INTEGER, "days": NUMBER})},
+                               "milestones": {"type": "array", "items": _object({"name": STRING, "date": DATE})},
+                           }, required=["name", "start", "end"])), repair=_repair_phases),
+    "slas": OutputSchema("slas", "SRE Lead", "service level agreements", _list("slas", _object({
+        "service": STRING,
+        "metric": STRING,
+        "target": STRING,
+        "response_time": STRING,
+        "resolution_time": STRING,
+    }, required=["service", "metric", "target"]))),
+    "test_levels": OutputSchema("test_levels", "Test Lead", "levels of testing", _list("test_levels", _object({
+        "level": STRING,
+        "scope": STRING,
+        "entry_criteria": STRINGS,
+        "exit_criteria": STRINGS,
+        "tools": STRINGS,
+    }, required=["level", "scope"]))),
+    "assumptions": OutputSchema("assumptions", "RFP Analyser", "assumptions", _list("assumptions", _object({
+        "category": {"type": "string", "enum": ASSUMPTION_CATEGORIES},
+        "assumption": STRING,
+        "impact": STRING,
+    }, required=["category", "assumption"]))),
+}
+
+EXTRACTION = PromptTemplate("structured.extraction", """
+    Restate the {description} in the {agent_name}'s response below as JSON matching the response schema.
+    Use only what the response states; leave out anything it does not mention rather than inventing it.
+    {errors}
+    Response:
+    {response}
+    """)
+
+
+def compact_json(value):
+    """Serialises structured data without insignificant whitespace, for checkpoints and prompts."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def parse_json(text):
+    """Reads the JSON object in a model response, tolerating code fences. Returns None if unreadable."""
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(0))
+    except ValueError:
+        return None
+
+
+def structured_model(model_name, kind):
+    """Returns the JSON-mode model for one schema, named by RFP_STRUCTURED_MODEL or the agent's own model."""
+    return get_model(os.environ.get("RFP_STRUCTURED_MODEL") or model_name, generation_config={
+        "response_mime_type": "application/json",
+        "response_schema": SCHEMAS[kind].schema,
+        "temperature": 0,
+    })
+
+
+class StructuredOutputMixin:
+    """Lets an agent restate its own prose response as validated, schema-constrained JSON."""
+
+    agent_name = None
+    model_name = None
+
+    @traced
+    @model_retry
+    def _structured_call(self, kind, response, errors):
+        schema = SCHEMAS[kind]
+        note = f"A previous attempt was rejected: {'; '.join(errors[:5])}.\n" if errors else ""
+        prompt = EXTRACTION.render(description=schema.description, agent_name=self.agent_name, errors=note,
+                                   response=response)
+        return structured_model(self.model_name, kind).generate_content(prompt).text
+
+    def extract_structured(self, kind, response):
+        """
+        Returns the `kind` data stated in `response`, validated and repaired locally, or None if the
+        model's output is still invalid after MAX_ATTEMPTS; downstream stages then fall back to prose.
+        """
+        schema = SCHEMAS[kind]
+        errors = []
+        for _ in range(MAX_ATTEMPTS):
+            value = parse_json(self._structured_call(kind, response, errors))
+            try:
+                if value is None:
+                    raise StructuredOutputError(kind, ["the output is not a JSON object"])
+                return schema.validate(value)
+            except StructuredOutputError as e:
+                logging.warning(f"{self.agent_name}: {e}")
+                errors = e.errors
+        return None
+
+
+def cost_summary(costs):
+    """Totals cost items per category and per phase, and overall."""
+    by_category, by_phase = {}, {}
+    for item in costs["items"]:
+        by_category[item["category"]] = by_category.get(item["category"], 0) + item["total_cost"]
+        phase = item.get("phase") or "unphased"
+        by_phase[phase] = by_phase.get(phase, 0) + item["total_cost"]
+    return {"currency": costs.get("currency") or "", "by_category": by_category, "by_phase": by_phase,
+            "total": sum(by_category.values())}
+
+
+def _money(amount):
+    return f"{amount:,.2f}"
+
+
+def cost_table(costs):
+    """Renders cost items as a Markdown table with locally computed category subtotals and grand total."""
+    summary = cost_summary(costs)
+    currency = f" ({summary['currency']})" if summary["currency"] else ""
+    lines = [f"| Cost Item | Description | Quantity | Unit Cost{currency} | Total Cost{currency} |",
+             "|-----------|-------------|----------|-----------|------------|"]
+    for category in COST_CATEGORIES:
+        items = [item for item in costs["items"] if item["category"] == category]
+        for item in items:
+            quantity = f"{item['quantity']:g} {item.get('unit') or ''}".strip()
+            lines.append(f"| {item['item']} | {item.get('description') or ''} | {quantity} | "
+                         f"{_money(item['unit_cost'])} | {_money(item['total_cost'])} |")
+        if items:
+            lines.append(f"| **{category.capitalize()} subtotal** | | | | **{_money(summary['by_category'][category])}** |")
+    lines.append(f"| **Total** | | | | **{_money(summary['total'])}** |")
+    return "\n".join(lines)
+
+
+def _mermaid_label(text):
+    return re.sub(r"[:#;]", " ", text).strip()
+
+
+def gantt_chart(phases, title="Delivery Plan"):
+    """Renders delivery phases and their milestones as a Mermaid gantt chart."""
+    lines = ["```mermaid", "gantt", f"    title {title}", "    dateFormat YYYY-MM-DD", "    section Phases"]
+    for index, phase in enumerate(phases["phases"]):
+        lines.append(f"    {_mermaid_label(phase['name'])} :p{index + 1}, {phase['start']}, {phase['end']}")
+    milestones = [milestone for phase in phases["phases"] for milestone in phase.get("milestones") or []]
+    if milestones:
+        lines.append("    section Milestones")
+        lines += [f"    {_mermaid_label(milestone['name'])} :milestone, {milestone['date']}, 0d" for milestone in milestones]
+    lines.append("```")
+    return "\n".join(lines)
+
+
+def effort_days(phases):
+    """Total person-days per role across all phases."""
+    totals = {}
+    for phase in phases["phases"]:
+        for resource in phase.get("resources") or []:
+            totals[resource["role"]] = totals.get(resource["role"], 0) + resource.get("count", 1) * resource.get("days", 0)
+    return totals
+
+
+def describe(kind, value):
+    """Returns the prompt block for one kind of structured data: computed tables where they exist, JSON otherwise."""
+    if kind == "cost_items":
+        return f"Cost Table (computed from the priced cost items; use these figures as they are):\n{cost_table(value)}"
+    if kind == "phases":
+        effort = ", ".join(f"{role}: {days:g} person-days" for role, days in effort_days(value).items())
+        return (f"Delivery Phases:\n{compact_json(value['phases'])}\n\n"
+                f"Gantt Chart (computed from the phases):\n{gantt_chart(value)}"
+                + (f"\n\nEffort by role: {effort}" if effort else ""))
+    title = {"slas": "Service Level Agreements", "test_levels": "Test Levels", "assumptions": "Assumptions"}[kind]
+    return f"{title}:\n{compact_json(value[kind])}"
@@ -0,0 +1,165 @@
+# utils/text_store.py
+import bisect
+import hashlib
+import json
+import mmap
+import operator
+import os
+
+from utils.pdf_utils import PAGE_SEPARATOR, ExtractedDocument
+
+SEPARATOR_BYTES = PAGE_SEPARATOR.encode("utf-8")
+
+
+class TextStore:
+    """
+    Document text written to a file once, as UTF-8, and memory-mapped read-only. It stands in for
+    the text string wherever the pipeline only measures or slices it: `len` counts characters and
+    `store[start:end]` decodes just that span, so callers hold the parts they use instead of a
+    private copy of the whole document. `page_view` returns a zero-copy memoryview of a page's bytes.
+
+    Character offsets are mapped to byte offsets through the page index kept next to the file;
+    on pages that are pure ASCII the two are the same and no decoding is needed to find them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(f"{path}.pages.json") as f:
+            index = json.load(f)
+        self.page_offsets = index["chars"]
+        self.byte_offsets = index["bytes"]
+        self.ascii_pages = index["ascii"]
+        self.length = index["length"]
+        self._file = open(path, "rb")
+        # mmap cannot map an empty file.
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if index["size"] else b""
+
+    @classmethod
+    def write(cls, path, pages):
+        """Writes pages one at a time, joined by the page separator, and returns the store; no page is kept in memory."""
+        chars, byte_offsets, ascii_pages = [], [], []
+        length = size = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            for page in pages:
+                if chars:
+                    f.write(SEPARATOR_BYTES)
+                    length += len(PAGE_SEPARATOR)
+                    size += len(SEPARATOR_BYTES)
+                data = page.encode("utf-8", "surrogatepass")
+                chars.append(length)
+                byte_offsets.append(size)
+                ascii_pages.append(len(data) == len(page))
+                f.write(data)
+                length += len(page)
+                size += len(data)
+        with open(f"{path}.pages.json", "w") as f:
+            json.dump({"chars": chars, "bytes": byte_offsets, "ascii": ascii_pages, "length": length, "size": size}, f)
+        os.replace(f"{path}.tmp", path)
+        return cls(path)
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return self[0:self.length]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, end, step = key.indices(self.length)
+            if step != 1:
+                raise ValueError("TextStore slices must be contiguous.")
+        else:
+            # Indexed like a str: negative positions count from the end.
+            start = operator.index(key)
+            if start < 0:
+                start += self.length
+            if not 0 <= start < self.length:
+                raise IndexError("TextStore index out of range")
+            end = start + 1
+        if end <= start:
+            return ""
+        return self._map[self._byte_offset(start):self._byte_offset(end)].decode("utf-8", "surrogatepass")
+
+    def _byte_offset(self, offset):
+        if offset >= self.length:
+            return len(self._map)
+        page = max(bisect.bisect_right(self.page_offsets, offset) - 1, 0)
+        within = offset - self.page_offsets[page]
+        if self.ascii_pages[page]:
+            return self.byte_offsets[page] + within
+        page_end = self.byte_offsets[page + 1] - len(SEPARATOR_BYTES) if page + 1 < len(self.byte_offsets) else len(self._map)
+        text = self._map[self.byte_offsets[page]:page_end].decode("utf-8", "surrogatepass")
+        return self.byte_offsets[page] + len(text[:within].encode("utf-8", "surrogatepass"))
+
+    def page_view(self, page_num):
+        """Returns a zero-copy view of a page's UTF-8 bytes."""
+        start = self.byte_offsets[page_num]
+        end = self.byte_offsets[page_num + 1] - len(SEPARATOR_BYTES) if page_num + 1 < len(self.byte_offsets) else len(self._map)
+        return memoryview(self._map)[start:end]
+
+    def pages(self):
+        """Yields (character offset, text) for each page, decoding one page at a time."""
+        for page_num, offset in enumerate(self.page_offsets):
+            yield offset, str(self.page_view(page_num), "utf-8", "surrogatepass")
+
+    def _search_window(self, start, end):
+        """Normalizes find/rfind bounds the way str does, returning None when the window is empty."""
+        if start is not None and start > self.length:
+            return None
+        start, end, _ = slice(start, end).indices(self.length)
+        return (start, end) if start <= end else None
+
+    def find(self, sub, start=0, end=None):
+        window = self._search_window(start, end)
+        if window is None:
+            return -1
+        start, end = window
+        index = self[start:end].find(sub)
+        return index + start if index != -1 else -1
+
+    def rfind(self, sub, start=0, end=None):
+        window = self._search_window(start, end)
+        if window is None:
+            return -1
+        start, end = window
+        index = self[start:end].rfind(sub)
+        return index + start if index != -1 else -1
+
+    def json_hash(self):
+        """Equal to utils.checkpoint.hash_value(str(store)), computed a page at a time."""
+        digest = hashlib.sha256(b'"')
+        for page_num, (_, page) in enumerate(self.pages()):
+            if page_num:
+                digest.update(json.dumps(PAGE_SEPARATOR)[1:-1].encode("utf-8"))
+            digest.update(json.dumps(page)[1:-1].encode("utf-8"))
+        digest.update(b'"')
+        return digest.hexdigest()
+
+    def sha256(self):
+        """The SHA-256 of the text's UTF-8 encoding, hashed straight from the mapped file."""
+        return hashlib.sha256(self._map).hexdigest()
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+
+class MappedDocument(ExtractedDocument):
+    """An ExtractedDocument whose `text` is a TextStore rather than a string held in memory."""
+
+    def __init__(self, store, source=None):
+        self.source = source
+        self.store = store
+        self.text = store
+        self.page_offsets = store.page_offsets
+
+    def page_text(self, page_num):
+        return str(self.store.page_view(page_num), "utf-8", "surrogatepass")
+
+    def page_hashes(self):
+        return [hashlib.sha256(self.store.page_view(page_num)).hexdigest()[:16] for page_num in range(len(self))]
+
+    def close(self):
+        self.store.close()
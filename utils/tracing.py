@@ -0,0 +1,261 @@
+# utils/tracing.py
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.chunking import estimate_tokens
+from utils.checkpoint import atomic_write
+from utils.rate_limiter import usage_tokens
+
+SERVICE_NAME = "rfp-pipeline"
+# Attributes a span copies from its parent, so a model call knows which run, stage and agent it belongs to.
+INHERITED_ATTRIBUTES = ("rfp", "stage", "agent")
+OTEL_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation: a pipeline run, a stage, an agent method or a single model call."""
+
+    def __init__(self, name, kind, parent, attributes):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = {}
+        if parent is not None:
+            self.attributes.update({key: parent.attributes[key] for key in INHERITED_ATTRIBUTES if key in parent.attributes})
+        self.attributes.update(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._start = time.perf_counter()
+        self.seconds = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, name, amount=1):
+        self.attributes[name] = self.attributes.get(name, 0) + amount
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+        self.end_ns = self.start_ns + int(self.seconds * 1e9)
+
+
+class Tracer:
+    """
+    Collects finished spans in memory. Spans nest through a context variable, so work handed to a
+    thread pool with a copied context (see utils.scheduler) stays attached to its parent span.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, kind="internal", **attributes):
+        span = Span(name, kind, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = f"{exc.__class__.__name__}: {exc}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            with self._lock:
+                self.spans.append(span)
+
+    def pop_trace(self, trace_id):
+        """Removes and returns every finished span of one trace, e.g. one pipeline run."""
+        with self._lock:
+            spans = [span for span in self.spans if span.trace_id == trace_id]
+            self.spans = [span for span in self.spans if span.trace_id != trace_id]
+        return spans
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    return _tracer
+
+
+def current_span():
+    return _current_span.get()
+
+
+def annotate(**attributes):
+    """Sets attributes on the active span, if there is one."""
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def count(name, amount=1):
+    """Increments a counter attribute on the active span, if there is one."""
+    span = _current_span.get()
+    if span is not None:
+        span.add(name, amount)
+
+
+def traced(func):
+    """Wraps an agent method in a span named after the agent, e.g. "Tech Lead.create_technical_approach"."""
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        agent = getattr(self, "agent_name", self.__class__.__name__)
+        with _tracer.span(f"{agent}.{func.__name__}", agent=agent, retries=0):
+            return func(self, *args, **kwargs)
+
+    return wrapper
+
+
+class TracedModel:
+    """Wraps a model so every generate_content call is recorded as a client span with its token usage."""
+
+    def __init__(self, model, model_name):
+        self.model = model
+        self.model_name = model_name
+
+    def generate_content(self, prompt, **kwargs):
+        with _tracer.span("generate_content", kind="client", model=self.model_name, cache_hit=False) as span:
+            response = self.model.generate_content(prompt, **kwargs)
+            if span.attributes["cache_hit"]:
+                span.set(prompt_tokens=0, completion_tokens=0)
+                return response
+            prompt_tokens, completion_tokens = usage_tokens(response)
+            if prompt_tokens is None:
+                prompt_tokens = estimate_tokens(prompt) if isinstance(prompt, str) else 0
+            if completion_tokens is None:
+                completion_tokens = 0 if kwargs.get("stream") else estimate_tokens(response.text)
+            span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            return response
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def _otel_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otel_json(spans):
+    """Returns spans in the OpenTelemetry OTLP/JSON trace format."""
+    records = []
+    for span in spans:
+        record = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": OTEL_KINDS.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": key, "value": _otel_value(value)} for key, value in sorted(span.attributes.items())],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            record["parentSpanId"] = span.parent_id
+        records.append(record)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "utils.tracing"}, "spans": records}],
+    }]}
+
+
+def aggregate(spans):
+    """
+    Totals model usage per (agent, stage): calls, cache hits, failed calls, retries, tokens and
+    seconds spent waiting on the model.
+    """
+    totals = {}
+
+    def row(span):
+        key = (span.attributes.get("agent", "unknown"), span.attributes.get("stage", "unknown"))
+        return totals.setdefault(key, {"calls": 0, "cache_hits": 0, "errors": 0, "retries": 0,
+                                       "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0})
+
+    for span in spans:
+        if span.kind == "client":
+            record = row(span)
+            record["calls"] += 1
+            record["cache_hits"] += int(bool(span.attributes.get("cache_hit")))
+            record["errors"] += int(span.error is not None)
+            record["prompt_tokens"] += span.attributes.get("prompt_tokens", 0)
+            record["completion_tokens"] += span.attributes.get("completion_tokens", 0)
+            record["seconds"] += span.seconds
+        elif span.attributes.get("retries"):
+            row(span)["retries"] += span.attributes["retries"]
+    return totals
+
+
+def _labels(**labels):
+    escaped = {key: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for key, value in labels.items()}
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped.items()) + "}"
+
+
+def prometheus_text(spans):
+    """Returns per-agent, per-stage model metrics and per-stage durations in the Prometheus text format."""
+    metrics = [
+        ("rfp_model_calls_total", "counter", "Model calls.", "calls"),
+        ("rfp_model_cache_hits_total", "counter", "Model calls answered from the response cache.", "cache_hits"),
+        ("rfp_model_errors_total", "counter", "Model calls that raised an error.", "errors"),
+        ("rfp_model_retries_total", "counter", "Retried agent calls.", "retries"),
+        ("rfp_model_prompt_tokens_total", "counter", "Prompt tokens sent to the model.", "prompt_tokens"),
+        ("rfp_model_completion_tokens_total", "counter", "Completion tokens received from the model.", "completion_tokens"),
+        ("rfp_model_seconds_total", "counter", "Seconds spent waiting on model calls.", "seconds"),
+    ]
+    totals = aggregate(spans)
+    lines = []
+    for name, kind, help_text, field in metrics:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for (agent, stage), record in sorted(totals.items()):
+            lines.append(f"{name}{_labels(agent=agent, stage=stage)} {record[field]:g}")
+    lines += ["# HELP rfp_stage_seconds Wall time of each pipeline stage.", "# TYPE rfp_stage_seconds gauge"]
+    for span in spans:
+        if span.name.startswith("stage:"):
+            lines.append(f"rfp_stage_seconds{_labels(stage=span.attributes['stage'])} {span.seconds:.3f}")
+    return "\n".join(lines) + "\n"
+
+
+def summary_table(spans):
+    """Returns a plain-text table of model calls, tokens and latency per agent, costliest first."""
+    agents = {}
+    for (agent, _), record in aggregate(spans).items():
+        totals = agents.setdefault(agent, dict.fromkeys(record, 0))
+        for field, value in record.items():
+            totals[field] += value
+    total_tokens = sum(record["prompt_tokens"] + record["completion_tokens"] for record in agents.values()) or 1
+    total_seconds = sum(record["seconds"] for record in agents.values()) or 1
+    lines = [f"{'agent':<20} {'calls':>6} {'cached':>7} {'retries':>8} {'in tokens':>10} {'out tokens':>11} "
+             f"{'tokens %':>9} {'model s':>8} {'time %':>7}"]
+    for agent, record in sorted(agents.items(), key=lambda item: -(item[1]["prompt_tokens"] + item[1]["completion_tokens"])):
+        tokens = record["prompt_tokens"] + record["completion_tokens"]
+        lines.append(f"{agent:<20} {record['calls']:>6} {record['cache_hits']:>7} {record['retries']:>8} "
+                     f"{record['prompt_tokens']:>10} {record['completion_tokens']:>11} {tokens / total_tokens:>9.1%} "
+                     f"{record['seconds']:>8.2f} {record['seconds'] / total_seconds:>7.1%}")
+    return "\n".join(lines)
+
+
+def export_trace(spans, directory):
+    """Writes a run's spans as trace.json (OTLP/JSON) and metrics.prom (Prometheus text) under `directory`."""
+    atomic_write(os.path.join(directory, "trace.json"), json.dumps(otel_json(spans)))
+    atomic_write(os.path.join(directory, "metrics.prom"), prometheus_text(spans))
+    logging.info(f"Tracing: Wrote {len(spans)} spans to {directory}.")